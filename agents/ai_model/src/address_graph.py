@@ -0,0 +1,361 @@
+"""
+address_graph.py
+Compact CSR representation of the address co-occurrence graph used by graph_features.
+- Addresses are integer-coded (sorted, so code order == address order, until
+  incremental_graph appends new addresses); the undirected graph is stored once as
+  symmetric CSR arrays indptr / indices / weights.
+- Built directly from the co-occurrence edge frame (addr_u, addr_v, weight), no
+  per-row Python or networkx objects.
+- Degree and weighted degree are row lengths / row sums; clustering coefficients come
+  from sparse triangle counting (the networkx weighted definition).
+- Persisted as an uncompressed .npz whose arrays AddressGraph.load memory-maps, so other
+  processes (feature workers, the centrality pool) share one copy.
+- GraphProjection builds the graph from the address x tx incidence matrix either as the
+  full co-occurrence clique projection or, for large transactions, as a star through a
+  tx node (bipartite mode keeps every tx as a node), so one 300-address batch tx adds
+  300 edges instead of ~45k. Tx nodes are stored after the address nodes.
+"""
+
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from agents.ai_model.src import storage
+from agents.ai_model.src.cooccurrence import DEFAULT_CHUNK_ROWS, CooccurrenceIndex
+
+GRAPH_PATH = storage.DATA_DIR / "address_graph.npz"
+# Budget of (row, 2-hop neighbor) products per triangle-counting chunk
+TRIANGLE_CHUNK_WORK = 20_000_000
+
+# Projection settings (GraphBuildParams.projection, clique_max_addresses, max_tx_addresses)
+PROJECTIONS = ("clique", "star", "bipartite")
+GRAPH_PROJECTION = os.getenv("GRAPH_PROJECTION", "star")
+# Transactions with more distinct addresses become a star through a tx node (star mode)
+GRAPH_CLIQUE_MAX_ADDRESSES = int(os.getenv("GRAPH_CLIQUE_MAX_ADDRESSES", "16"))
+# Transactions with more distinct addresses are left out of the graph; 0 keeps all
+GRAPH_MAX_TX_ADDRESSES = int(os.getenv("GRAPH_MAX_TX_ADDRESSES", "0"))
+
+
+class AddressGraph:
+    """
+    Undirected weighted graph over addresses in CSR form:
+
+        graph = AddressGraph.from_edges(edges_df)
+        graph.degree(), graph.weighted_degree(), graph.clustering()
+        graph.save(GRAPH_PATH); AddressGraph.load(GRAPH_PATH)
+
+    Nodes n_addresses.. (if any) are tx nodes of a star / bipartite projection;
+    addresses then holds their tx hashes.
+    """
+
+    def __init__(
+        self,
+        addresses: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        n_addresses: Optional[int] = None,
+    ):
+        self.addresses = addresses
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.n_addresses = self.n_nodes if n_addresses is None else int(n_addresses)
+
+    @classmethod
+    def from_edges(cls, edges_df: pd.DataFrame) -> "AddressGraph":
+        """
+        Build from an edge frame with addr_u, addr_v, weight (one row per undirected
+        edge; repeated pairs are summed, self-loops dropped).
+        """
+        if edges_df.empty:
+            return cls(np.array([], dtype=str), np.zeros(1, dtype=np.int64),
+                       np.array([], dtype=np.int32), np.array([], dtype=np.float64))
+        codes, addresses = pd.factorize(
+            pd.concat([edges_df["addr_u"], edges_df["addr_v"]], ignore_index=True), sort=True
+        )
+        n_edges = len(edges_df)
+        u, v = codes[:n_edges], codes[n_edges:]
+        w = edges_df["weight"].to_numpy(dtype=np.float64)
+        keep = u != v
+        u, v, w = u[keep], v[keep], w[keep]
+        n = len(addresses)
+        adjacency = sparse.csr_matrix(
+            (np.concatenate([w, w]), (np.concatenate([u, v]), np.concatenate([v, u]))), shape=(n, n)
+        )
+        adjacency.sum_duplicates()
+        return cls.from_adjacency(np.asarray(addresses, dtype=str), adjacency)
+
+    @classmethod
+    def from_adjacency(
+        cls, addresses: np.ndarray, adjacency: sparse.spmatrix, n_addresses: Optional[int] = None
+    ) -> "AddressGraph":
+        adjacency = sparse.csr_matrix(adjacency, dtype=np.float64)
+        adjacency.sort_indices()
+        return cls(
+            addresses,
+            adjacency.indptr.astype(np.int64),
+            adjacency.indices.astype(np.int32),
+            adjacency.data,
+            n_addresses,
+        )
+
+    # -------------------------------
+    # Shape and views
+    # -------------------------------
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        """
+        Undirected edge count (each edge is stored in both rows).
+        """
+        return len(self.indices) // 2
+
+    @property
+    def adjacency(self) -> sparse.csr_matrix:
+        """
+        scipy CSR view over the stored arrays (no copy).
+        """
+        n = self.n_nodes
+        return sparse.csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n), copy=False)
+
+    def edges(self) -> pd.DataFrame:
+        """
+        Back to the (addr_u < addr_v) edge frame.
+        """
+        rows = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        upper = self.indices > rows
+        return pd.DataFrame({
+            "addr_u": self.addresses[rows[upper]],
+            "addr_v": self.addresses[self.indices[upper]],
+            "weight": self.weights[upper],
+        })
+
+    # -------------------------------
+    # Metrics
+    # -------------------------------
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def weighted_degree(self) -> np.ndarray:
+        return np.asarray(self.adjacency.sum(axis=1)).ravel()
+
+    def _chunks(self, cost: np.ndarray, budget: int) -> Iterator[Tuple[int, int]]:
+        """
+        Contiguous row ranges whose summed cost stays around budget (at least one row).
+        """
+        bounds = np.searchsorted(np.cumsum(cost), np.arange(budget, cost.sum() + budget, budget), side="right")
+        start = 0
+        for end in np.unique(np.clip(np.r_[bounds, self.n_nodes], 1, self.n_nodes)):
+            if end > start:
+                yield start, int(end)
+                start = int(end)
+
+    def triangles(self, weighted: bool = True) -> np.ndarray:
+        """
+        Per-node sum over ordered neighbor pairs (j, k) with an edge j-k of
+        (ŵ_ij ŵ_jk ŵ_ki)^(1/3), ŵ = weight / max weight (plain triangle count x 2
+        when unweighted), i.e. the diagonal of M³ with M = ŵ^(1/3).
+
+        Each triangle is listed once on the degree-ordered DAG D (edge i -> j when i
+        ranks below j by degree): (D @ D) ∘ D holds, per edge (low, high), the
+        triangles through a middle node and (Dᵀ @ D) ∘ D the same triangles per edge
+        (middle, high). Work is bounded by out-degrees, which the ordering keeps
+        small, so hubs with tens of thousands of neighbors cost nothing extra.
+        """
+        A = self.adjacency
+        out = np.zeros(self.n_nodes)
+        if A.nnz == 0:
+            return out
+        degree = self.degree()
+        rank = np.empty(self.n_nodes, dtype=np.int64)
+        rank[np.argsort(degree, kind="stable")] = np.arange(self.n_nodes)
+        rows = np.repeat(np.arange(self.n_nodes), degree)
+        forward = rank[rows] < rank[self.indices]
+        data = np.cbrt(self.weights[forward] / self.weights.max()) if weighted else np.ones(int(forward.sum()))
+        D = sparse.csr_matrix((data, (rows[forward], self.indices[forward])), shape=A.shape)
+        D_t = D.T.tocsr()
+
+        out_degree = np.diff(D.indptr)
+        low_high = np.zeros(self.n_nodes)
+        middle = np.zeros(self.n_nodes)
+        high = np.zeros(self.n_nodes)
+        for product_rows, target in ((D, low_high), (D_t, middle)):
+            # Work of row i is the summed out-degree of its (out or in) neighbors
+            cost = np.asarray(product_rows.astype(bool).astype(np.int64) @ out_degree).ravel()
+            for start, end in self._chunks(cost, TRIANGLE_CHUNK_WORK):
+                closed = (product_rows[start:end] @ D).multiply(D[start:end]).tocsr()
+                target[start:end] = np.asarray(closed.sum(axis=1)).ravel()
+                if target is low_high:
+                    high += np.bincount(closed.indices, weights=closed.data, minlength=self.n_nodes)
+        # Every triangle appears twice (both neighbor orders) on the diagonal of M³
+        return 2 * (low_high + middle + high)
+
+    def clustering(self, weighted: bool = True) -> np.ndarray:
+        """
+        Local clustering coefficient (networkx.clustering, weight="weight" when weighted).
+        """
+        degree = self.degree().astype(np.float64)
+        pairs = degree * (degree - 1)
+        return np.divide(self.triangles(weighted), pairs, out=np.zeros(self.n_nodes), where=pairs > 0)
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+
+    def save(self, path: Path = GRAPH_PATH) -> Path:
+        """
+        Write an uncompressed .npz (addresses as fixed-width strings) that load can
+        memory-map.
+        """
+        return save_npz_arrays(
+            path,
+            addresses=np.asarray(self.addresses, dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+            weights=self.weights,
+            n_addresses=np.array([self.n_addresses], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path: Path = GRAPH_PATH, mmap: bool = True) -> "AddressGraph":
+        arrays = load_npz_arrays(path, mmap=mmap)
+        n_addresses = int(arrays["n_addresses"][0]) if "n_addresses" in arrays else None
+        return cls(arrays["addresses"], arrays["indptr"], arrays["indices"], arrays["weights"], n_addresses)
+
+
+class GraphProjection:
+    """
+    How transactions become edges:
+      - clique: every pair of addresses in a tx (weight = shared txs), as build_counterparty_edges
+      - star: txs with up to clique_max_addresses addresses as cliques, larger ones as a
+        tx node linked to each of its addresses (weight 1)
+      - bipartite: every tx as a tx node (the native address <-> tx graph)
+    Txs with fewer than two addresses add nothing; txs with more than max_tx_addresses
+    (when > 0) are left out as uninformative hubs.
+    """
+
+    def __init__(
+        self,
+        mode: str = GRAPH_PROJECTION,
+        clique_max_addresses: int = GRAPH_CLIQUE_MAX_ADDRESSES,
+        max_tx_addresses: int = GRAPH_MAX_TX_ADDRESSES,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    ):
+        if mode not in PROJECTIONS:
+            raise ValueError(f"Unknown graph projection '{mode}' (expected one of {', '.join(PROJECTIONS)})")
+        self.mode = mode
+        self.clique_max_addresses = int(clique_max_addresses)
+        self.max_tx_addresses = int(max_tx_addresses)
+        self.chunk_rows = max(int(chunk_rows), 1)
+
+    @classmethod
+    def from_params(cls, params, **kwargs) -> "GraphProjection":
+        """
+        Build from GraphBuildParams (or any object with the same attributes).
+        """
+        return cls(
+            mode=getattr(params, "projection", GRAPH_PROJECTION),
+            clique_max_addresses=getattr(params, "clique_max_addresses", GRAPH_CLIQUE_MAX_ADDRESSES),
+            max_tx_addresses=getattr(params, "max_tx_addresses", GRAPH_MAX_TX_ADDRESSES),
+            **kwargs,
+        )
+
+    def _clique(self, incidence: sparse.csr_matrix) -> sparse.csr_matrix:
+        """
+        Off-diagonal part of incidence @ incidence.T, one row chunk at a time.
+        """
+        incidence_t = incidence.T.tocsr()
+        rows, cols, data = [], [], []
+        for start in range(0, incidence.shape[0], self.chunk_rows):
+            co = (incidence[start:start + self.chunk_rows] @ incidence_t).tocoo()
+            row = co.row.astype(np.int64) + start
+            off = co.col != row
+            rows.append(row[off])
+            cols.append(co.col[off])
+            data.append(co.data[off].astype(np.float64))
+        n = incidence.shape[0]
+        if not rows:
+            return sparse.csr_matrix((n, n))
+        return sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+    def build(self, cooc: CooccurrenceIndex) -> AddressGraph:
+        incidence = cooc.incidence
+        tx_size = np.diff(incidence.tocsc().indptr)
+        kept = tx_size >= 2
+        if self.max_tx_addresses > 0:
+            kept &= tx_size <= self.max_tx_addresses
+        if self.mode == "clique":
+            star = np.zeros_like(kept)
+        elif self.mode == "star":
+            star = kept & (tx_size > self.clique_max_addresses)
+        else:
+            star = kept
+        clique_txs, star_txs = np.flatnonzero(kept & ~star), np.flatnonzero(star)
+
+        C = self._clique(incidence[:, clique_txs])
+        B = incidence[:, star_txs].astype(np.float64)
+        adjacency = sparse.bmat([[C, B], [B.T, None]], format="csr")
+        # Addresses only seen in dropped or single-address txs have no edges
+        n = cooc.n_addresses
+        keep = np.r_[np.diff(C.indptr) + np.diff(B.indptr) > 0, np.ones(len(star_txs), dtype=bool)]
+        adjacency = adjacency[keep][:, keep]
+        labels = np.concatenate([
+            np.asarray(cooc.addresses[keep[:n]], dtype=str),
+            np.asarray(cooc.tx_hashes[star_txs], dtype=str),
+        ])
+        return AddressGraph.from_adjacency(labels, adjacency, n_addresses=int(keep[:n].sum()))
+
+
+def save_npz_arrays(path: Path, **arrays: np.ndarray) -> Path:
+    """
+    Write arrays as an uncompressed .npz that load_npz_arrays can memory-map. The file
+    is swapped in with os.replace, so processes still mapping the previous version keep
+    reading a consistent copy.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_npz_arrays(path: Path, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Arrays of an uncompressed .npz. With mmap=True each array is a read-only np.memmap
+    over its member inside the zip file (np.load ignores mmap_mode for .npz).
+    """
+    if not mmap:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+    arrays: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as fh:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be memory-mapped")
+            # Local file header: 30 bytes + file name + extra field, then the .npy bytes
+            fh.seek(info.header_offset)
+            header = fh.read(30)
+            data_start = info.header_offset + 30 + int.from_bytes(header[26:28], "little") + int.from_bytes(header[28:30], "little")
+            fh.seek(data_start)
+            version = np.lib.format.read_magic(fh)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(fh)
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=fh.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
@@ -6,18 +6,19 @@ Exposes endpoints that the orchestrator calls for prediction and explainability.
 
 import os
 import sys
-import pandas as pd
-import numpy as np
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 
 # Add parent to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from agents.ai_model.src.inference import load_models, detect_anomaly, predict_risk, explain_prediction
-from agents.ai_model.src.utils import logger, MODEL_DIR
+from agents.ai_model.src.inference import load_models
+from agents.ai_model.src.batch_inference import BatchingInferenceEngine, EngineOverloaded
+from agents.ai_model.src.batch_endpoint import make_batch_router
+from agents.ai_model.src.explanation_engine import ExplanationEngine, plot_path, render_force_plot, top_drivers
+from agents.ai_model.src.utils import logger
 
 # ===== Models =====
 try:
@@ -27,12 +28,25 @@ except Exception as e:
     logger.error(f"❌ Failed to load AI models: {e}")
     rf_model, iso_model, explainer = None, None, None
 
+# Concurrent /predict calls are scored together in micro-batches
+engine = BatchingInferenceEngine(rf_model, iso_model)
+
+# Warm TreeExplainer + explanation cache shared by /explain and /explain/batch
+try:
+    explanation_engine = ExplanationEngine.from_explainer(explainer, model=rf_model) if explainer else None
+except Exception as e:
+    logger.error(f"❌ Failed to build explanation engine: {e}")
+    explanation_engine = None
+
 app = FastAPI(
     title="AUREV Guard AI Agent",
     version="1.0.0",
     description="AI-powered risk assessment and anomaly detection for Cardano wallets"
 )
 
+# Bulk scoring: POST /predict/batch (NDJSON or Arrow IPC)
+app.include_router(make_batch_router(lambda: engine))
+
 # ===== Request/Response Schemas =====
 class WalletFeatures(BaseModel):
     """Wallet transaction features extracted from blockchain data"""
@@ -62,6 +76,7 @@ class ExplanationResponse(BaseModel):
     feature_importance: Dict[str, float]
     top_risk_drivers: List[Dict[str, Any]]
     narrative: str
+    plot_path: Optional[str] = None
 
 class AgentResponse(BaseModel):
     """Generic agent response for orchestrator"""
@@ -83,7 +98,7 @@ def agent_health():
     }
 
 @app.post("/predict", response_model=AgentResponse)
-def predict(features: WalletFeatures) -> AgentResponse:
+async def predict(features: WalletFeatures) -> AgentResponse:
     """
     Predict risk for a wallet based on transaction features.
     Called by orchestrator for risk assessment.
@@ -105,11 +120,11 @@ def predict(features: WalletFeatures) -> AgentResponse:
         ]
         
         feature_dict = {f: getattr(features, f, 0) for f in base_features}
-        X_live = pd.DataFrame([feature_dict])
 
-        # Run predictions
-        anomaly_score, is_anomaly = detect_anomaly(iso_model, X_live)
-        y_pred, y_prob = predict_risk(rf_model, X_live)
+        # Run predictions (batched with other in-flight requests)
+        scores = await engine.score(feature_dict)
+        anomaly_score, is_anomaly = scores["anomaly_score"], scores["is_anomaly"]
+        y_pred, y_prob = scores["risk_label"], scores["risk_probability"]
 
         # Convert to risk label
         risk_label = "HIGH_RISK" if y_pred == 1 else "LOW_RISK"
@@ -133,78 +148,55 @@ def predict(features: WalletFeatures) -> AgentResponse:
 
         return AgentResponse(status="success", data=prediction_data)
 
+    except EngineOverloaded as e:
+        # A real 503 so the orchestrator's breaker sees it and the result is not cached
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Prediction failed: {e}")
         return AgentResponse(status="error", error=str(e))
 
 
+def _explanation_data(wallet_address: str, explanation: Dict[str, Any]) -> Dict[str, Any]:
+    feature_importance = {name: abs(val) for name, val in explanation["values"].items()}
+    drivers = top_drivers(explanation)
+
+    # Generate narrative
+    top_feature = drivers[0]["feature"] if drivers else "unknown"
+    narrative = (
+        f"This wallet's risk profile is primarily driven by {top_feature}. "
+        f"The model analyzed {len(feature_importance)} behavioral features to generate this assessment. "
+        f"Higher risk scores indicate more anomalous transaction patterns."
+    )
+    return {
+        "wallet_address": wallet_address,
+        "feature_importance": feature_importance,
+        "top_risk_drivers": drivers,
+        "narrative": narrative,
+    }
+
+
 @app.post("/explain", response_model=AgentResponse)
-def explain(features: WalletFeatures) -> AgentResponse:
+def explain(features: WalletFeatures, background_tasks: BackgroundTasks, plot: bool = False) -> AgentResponse:
     """
     Generate SHAP explanation for a wallet's risk assessment.
-    Returns feature importance and top risk drivers.
+    Returns feature importance and top risk drivers; ?plot=true also renders a force
+    plot in the background (plot_path is where it will appear).
     """
     try:
-        if not explainer:
+        if not explanation_engine:
             raise HTTPException(status_code=500, detail="Explainer not available")
 
-        base_features = [
-            "tx_count_24h",
-            "total_value_24h",
-            "largest_value_24h",
-            "std_value_24h",
-            "unique_counterparts_24h",
-            "entropy_of_destinations",
-            "share_of_daily_volume",
-            "relative_max_vs_global",
-        ]
-        
-        feature_dict = {f: getattr(features, f, 0) for f in base_features}
-        X_live = pd.DataFrame([feature_dict])
-
-        # Get SHAP values
-        shap_values = explainer.shap_values(X_live[base_features])
-        
-        # Handle classification output (returns list [class0, class1])
-        if isinstance(shap_values, list):
-            shap_to_use = shap_values[1][0, :]  # Class 1 (high risk)
-        else:
-            shap_to_use = shap_values[0, :]
-
-        # Build feature importance
-        feature_importance = {
-            name: float(abs(val))
-            for name, val in zip(base_features, shap_to_use)
-        }
-        
-        # Top 5 drivers
-        sorted_features = sorted(
-            feature_importance.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        top_drivers = [
-            {"feature": name, "impact": float(val), "value": float(getattr(features, name, 0))}
-            for name, val in sorted_features[:5]
-        ]
+        feature_dict = {f: getattr(features, f, 0) for f in explanation_engine.feature_names}
+        explanation = explanation_engine.explain_rows([feature_dict])[0]
+        explanation_data = _explanation_data(features.wallet_address, explanation)
 
-        # Generate narrative
-        top_feature = sorted_features[0][0] if sorted_features else "unknown"
-        narrative = (
-            f"This wallet's risk profile is primarily driven by {top_feature}. "
-            f"The model analyzed 8 behavioral features to generate this assessment. "
-            f"Higher risk scores indicate more anomalous transaction patterns."
-        )
+        if plot:
+            path = plot_path(features.wallet_address)
+            background_tasks.add_task(render_force_plot, explanation, path)
+            explanation_data["plot_path"] = path
 
         logger.info(f"💡 SHAP Explanation generated for {features.wallet_address}")
 
-        explanation_data = {
-            "wallet_address": features.wallet_address,
-            "feature_importance": feature_importance,
-            "top_risk_drivers": top_drivers,
-            "narrative": narrative,
-        }
-
         return AgentResponse(status="success", data=explanation_data)
 
     except Exception as e:
@@ -212,12 +204,34 @@ def explain(features: WalletFeatures) -> AgentResponse:
         return AgentResponse(status="error", error=str(e))
 
 
+@app.post("/explain/batch", response_model=AgentResponse)
+def explain_batch(wallets: List[WalletFeatures]) -> AgentResponse:
+    """
+    SHAP explanations for many wallets; uncached rows share one SHAP call.
+    """
+    try:
+        if not explanation_engine:
+            raise HTTPException(status_code=500, detail="Explainer not available")
+
+        rows = [{f: getattr(w, f, 0) for f in explanation_engine.feature_names} for w in wallets]
+        explanations = explanation_engine.explain_rows(rows) if rows else []
+        results = [_explanation_data(w.wallet_address, e) for w, e in zip(wallets, explanations)]
+
+        logger.info(f"💡 SHAP Explanations generated for {len(results)} wallets")
+
+        return AgentResponse(status="success", data={"explanations": results, "count": len(results)})
+
+    except Exception as e:
+        logger.error(f"❌ Batch explanation failed: {e}")
+        return AgentResponse(status="error", error=str(e))
+
+
 @app.get("/metadata")
 def metadata():
     """Return metadata about this agent"""
     return {
         "agent_name": "ai_model",
-        "capabilities": ["predict", "explain", "health"],
+        "capabilities": ["predict", "predict/batch", "explain", "explain/batch", "health"],
         "version": "1.0.0",
         "description": "AI-powered risk assessment for Cardano wallets",
         "features_expected": [
@@ -0,0 +1,196 @@
+"""
+batch_endpoint.py
+Bulk scoring route (POST /predict/batch) shared by the AI agent services.
+- Request bodies are NDJSON (one feature object per line) or an Arrow IPC stream
+  (one column per feature); results are streamed back in the same format, one chunk
+  at a time.
+- Rows are scored chunk by chunk with one predict_proba / decision_function per chunk
+  (see batch_inference.score_matrix), so thousands of rows cost a handful of model calls
+  and no per-row HTTP round trips.
+- Identifier columns (wallet_address, address, id, transaction_id) are echoed back so
+  results can be joined to their inputs.
+"""
+
+import asyncio
+import io
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from agents.ai_model.src.batch_inference import BatchingInferenceEngine, score_matrix, score_row
+from agents.ai_model.src.utils import logger
+
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ID_COLUMNS = ("wallet_address", "address", "id", "transaction_id")
+DEFAULT_CHUNK_ROWS = 1000
+MAX_CHUNK_ROWS = 50_000
+
+RESULT_SCHEMA_FIELDS = [
+    ("risk_label", pa.int64()),
+    ("risk_probability", pa.float64()),
+    ("anomaly_score", pa.float64()),
+    ("anomaly_flag", pa.int64()),
+    ("is_anomaly", pa.bool_()),
+]
+
+
+def _score(engine: BatchingInferenceEngine, X: np.ndarray) -> Dict[str, np.ndarray]:
+    return score_matrix(*engine.scorers(len(X)), X, engine.feature_names)
+
+
+# -------------------------------
+# NDJSON
+# -------------------------------
+
+def _ndjson_lines(body: bytes) -> Iterator[bytes]:
+    for line in body.split(b"\n"):
+        if line.strip():
+            yield line
+
+
+def _ndjson_row(item: Any, feature_names: List[str]) -> Tuple[dict, Optional[List[float]], Optional[str]]:
+    """
+    (ids, feature values, error) for one parsed NDJSON line; exactly one of values/error is set.
+    """
+    if not isinstance(item, dict):
+        return {}, None, f"invalid feature row: expected a JSON object, got {type(item).__name__}"
+    ids = {k: item[k] for k in ID_COLUMNS if k in item}
+    try:
+        return ids, [float(item[name]) for name in feature_names], None
+    except (KeyError, TypeError, ValueError) as e:
+        return ids, None, f"invalid feature row: {e!r}"
+
+
+async def _ndjson_results(engine: BatchingInferenceEngine, body: bytes, chunk_rows: int) -> AsyncIterator[bytes]:
+    # Parsed lines, or the decode error for lines that are not valid JSON
+    pending: List[Tuple[Any, Optional[str]]] = []
+
+    async def flush() -> AsyncIterator[bytes]:
+        parsed = [
+            ({}, None, f"invalid JSON: {error}") if error else _ndjson_row(item, engine.feature_names)
+            for item, error in pending
+        ]
+        valid = [values for _, values, _ in parsed if values is not None]
+        scores = await asyncio.to_thread(_score, engine, np.asarray(valid, dtype=np.float64)) if valid else {}
+        j = 0
+        for ids, values, error in parsed:
+            if error is not None:
+                out = {**ids, "error": error}
+            else:
+                out = {**ids, **score_row(scores, j)}
+                j += 1
+            yield (json.dumps(out) + "\n").encode("utf-8")
+        pending.clear()
+
+    for line in _ndjson_lines(body):
+        try:
+            pending.append((json.loads(line), None))
+        except json.JSONDecodeError as e:
+            pending.append((None, str(e)))
+        if len(pending) >= chunk_rows:
+            async for out in flush():
+                yield out
+    if pending:
+        async for out in flush():
+            yield out
+
+
+# -------------------------------
+# Arrow IPC
+# -------------------------------
+
+def _arrow_results(engine: BatchingInferenceEngine, body: bytes, chunk_rows: int) -> Iterator[bytes]:
+    reader = pa.ipc.open_stream(body)
+    names = reader.schema.names
+    missing = [n for n in engine.feature_names if n not in names]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing feature columns: {missing}")
+    id_fields = [reader.schema.field(n) for n in ID_COLUMNS if n in names]
+    schema = pa.schema(id_fields + [f for f in RESULT_SCHEMA_FIELDS if _has_output(engine, f[0])])
+
+    def batches() -> Iterator[bytes]:
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            yield _drain(sink)
+            for batch in reader:
+                for offset in range(0, batch.num_rows, chunk_rows):
+                    part = batch.slice(offset, chunk_rows)
+                    X = np.column_stack([
+                        part.column(n).to_numpy(zero_copy_only=False).astype(np.float64)
+                        for n in engine.feature_names
+                    ])
+                    scores = _score(engine, X)
+                    columns = [part.column(f.name) for f in id_fields]
+                    columns += [pa.array(_scores_for(scores, name), type=t)
+                                for name, t in RESULT_SCHEMA_FIELDS if _has_output(engine, name)]
+                    writer.write_batch(pa.record_batch(columns, schema=schema))
+                    yield _drain(sink)
+        yield _drain(sink)
+
+    return batches()
+
+
+def _has_output(engine: BatchingInferenceEngine, name: str) -> bool:
+    if name in ("risk_label", "risk_probability"):
+        return engine.rf_model is not None
+    return engine.iso_model is not None
+
+
+def _scores_for(scores: Dict[str, np.ndarray], name: str) -> np.ndarray:
+    if name == "is_anomaly":
+        return scores["anomaly_flag"] == -1
+    return scores[name]
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """
+    Bytes written to sink since the last drain.
+    """
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+# -------------------------------
+# Route
+# -------------------------------
+
+def make_batch_router(get_engine: Callable[[], Optional[BatchingInferenceEngine]]) -> APIRouter:
+    """
+    Router exposing POST /predict/batch for the engine returned by get_engine().
+    ?chunk_rows=N sets how many rows go into each model call.
+    """
+    router = APIRouter()
+
+    @router.post("/predict/batch")
+    async def predict_batch(request: Request, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        engine = get_engine()
+        if engine is None or not engine.ready:
+            raise HTTPException(status_code=503, detail="Models not loaded")
+        chunk_rows = min(max(int(chunk_rows), 1), MAX_CHUNK_ROWS)
+        content_type = request.headers.get("content-type", NDJSON).split(";")[0].strip()
+
+        if content_type == ARROW_STREAM:
+            body = await request.body()
+            try:
+                stream = _arrow_results(engine, body, chunk_rows)
+            except pa.ArrowInvalid as e:
+                raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC stream: {e}")
+            return StreamingResponse(stream, media_type=ARROW_STREAM)
+
+        if content_type in (NDJSON, "application/json", "application/jsonlines"):
+            # The body is read up front: StreamingResponse consumes the receive channel
+            # (disconnect detection) once the response starts
+            body = await request.body()
+            logger.info(f"Batch scoring NDJSON stream (chunk_rows={chunk_rows})")
+            return StreamingResponse(_ndjson_results(engine, body, chunk_rows), media_type=NDJSON)
+
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+    return router
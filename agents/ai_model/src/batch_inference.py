@@ -0,0 +1,269 @@
+"""
+batch_inference.py
+Micro-batching inference engine shared by the AI agent services.
+- Concurrent /predict requests are queued and scored together: a batch closes after
+  max_batch_size rows or max_wait_ms milliseconds, whichever comes first.
+- A batch is one float matrix (columns from the models' feature_names_in_), scored with a single
+  RandomForest predict_proba and a single IsolationForest decision_function; labels and
+  anomaly flags are derived from those (no separate predict() traversals).
+- With compiled_trees the models are flattened once (tree_compiler) and batches of up to
+  compiled_max_rows rows are scored from those arrays: identical outputs without sklearn's
+  per-call validation and dispatch overhead. Larger batches (bulk scoring) stay on
+  sklearn's Cython traversal, which is faster per row at that size.
+- Results are fanned back out to the waiting requests; scoring runs in a worker thread
+  so the event loop keeps accepting requests while a batch is in flight.
+Defaults come from INFERENCE_* environment variables; the orchestrator builds the
+engine from InferenceEngineParams via BatchingInferenceEngine.from_params.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agents.ai_model.src.inference import BASE_FEATURES
+from agents.ai_model.src.tree_compiler import CompiledForest, compile_or_none
+from agents.ai_model.src.utils import logger
+
+BATCH_PROCESSING = os.getenv("INFERENCE_BATCH_PROCESSING", "true").lower() == "true"
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "2"))
+MAX_QUEUE_SIZE = int(os.getenv("INFERENCE_MAX_QUEUE_SIZE", "1000"))
+COMPILED_TREES = os.getenv("INFERENCE_COMPILED_TREES", "true").lower() == "true"
+COMPILED_MAX_ROWS = int(os.getenv("INFERENCE_COMPILED_MAX_ROWS", "512"))
+
+
+class EngineOverloaded(RuntimeError):
+    """Raised when the request queue is full (callers should answer 503)."""
+
+
+# -------------------------------
+# Matrix scoring
+# -------------------------------
+
+def model_features(model) -> List[str]:
+    """
+    Columns a fitted model was trained on (feature_names_in_), else BASE_FEATURES.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    return [str(n) for n in names] if names is not None else list(BASE_FEATURES)
+
+
+def engine_features(rf_model, iso_model) -> List[str]:
+    """
+    Union of the columns needed by both models, in first-seen order.
+    """
+    names: List[str] = []
+    for model in (rf_model, iso_model):
+        if model is not None:
+            names.extend(n for n in model_features(model) if n not in names)
+    return names or list(BASE_FEATURES)
+
+
+def features_matrix(rows: Sequence[Mapping[str, Any]], feature_names: Sequence[str]) -> np.ndarray:
+    """
+    Stack feature dicts into a float matrix with columns in feature_names order.
+    Raises KeyError if a row lacks one of the features.
+    """
+    X = np.empty((len(rows), len(feature_names)), dtype=np.float64)
+    for i, row in enumerate(rows):
+        X[i] = [row[name] for name in feature_names]
+    return X
+
+
+def _model_input(model, X: np.ndarray, feature_names: Sequence[str]) -> pd.DataFrame:
+    names = model_features(model)
+    idx = [feature_names.index(n) for n in names]
+    if isinstance(model, CompiledForest):
+        return X[:, idx]
+    # Named columns keep sklearn's feature-name validation (and silence its warning)
+    return pd.DataFrame(X[:, idx], columns=names)
+
+
+def score_matrix(rf_model, iso_model, X: np.ndarray, feature_names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Score every row of X (columns in feature_names order) with one predict_proba and one
+    decision_function call. Returns arrays: risk_label (RandomForest class),
+    risk_probability (P(class 1)), anomaly_score (IsolationForest decision function) and
+    anomaly_flag (-1 anomaly, 1 normal).
+    """
+    feature_names = list(feature_names)
+    out: Dict[str, np.ndarray] = {}
+    if rf_model is not None:
+        proba = rf_model.predict_proba(_model_input(rf_model, X, feature_names))
+        classes = np.asarray(rf_model.classes_)
+        # predict() is the argmax of predict_proba, so derive it instead of re-traversing the trees
+        out["risk_label"] = classes[np.argmax(proba, axis=1)]
+        positive = np.flatnonzero(classes == 1)
+        out["risk_probability"] = proba[:, positive[0]] if len(positive) else np.zeros(len(X))
+    if iso_model is not None:
+        decision = iso_model.decision_function(_model_input(iso_model, X, feature_names))
+        out["anomaly_score"] = decision
+        # IsolationForest.predict() is exactly this threshold on decision_function
+        out["anomaly_flag"] = np.where(decision < 0, -1, 1)
+    return out
+
+
+def score_row(scores: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    row: Dict[str, Any] = {}
+    if "risk_label" in scores:
+        row["risk_label"] = int(scores["risk_label"][i])
+        row["risk_probability"] = float(scores["risk_probability"][i])
+    if "anomaly_score" in scores:
+        row["anomaly_score"] = float(scores["anomaly_score"][i])
+        row["anomaly_flag"] = int(scores["anomaly_flag"][i])
+        row["is_anomaly"] = row["anomaly_flag"] == -1
+    return row
+
+
+def score_rows(rf_model, iso_model, rows: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Synchronous bulk scoring: one result dict per feature row.
+    """
+    if not rows:
+        return []
+    feature_names = engine_features(rf_model, iso_model)
+    scores = score_matrix(rf_model, iso_model, features_matrix(rows, feature_names), feature_names)
+    return [score_row(scores, i) for i in range(len(rows))]
+
+
+# -------------------------------
+# Micro-batching engine
+# -------------------------------
+
+class BatchingInferenceEngine:
+    """
+    Queue-and-batch scorer for async endpoints:
+
+        engine = BatchingInferenceEngine(rf_model, iso_model)
+        result = await engine.score(feature_dict)
+    """
+
+    def __init__(
+        self,
+        rf_model,
+        iso_model,
+        batch_processing: bool = BATCH_PROCESSING,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait_ms: float = MAX_WAIT_MS,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+        compiled_trees: bool = COMPILED_TREES,
+        compiled_max_rows: int = COMPILED_MAX_ROWS,
+    ):
+        self.rf_model = rf_model
+        self.iso_model = iso_model
+        self.rf_compiled = compile_or_none(rf_model) if compiled_trees else None
+        self.iso_compiled = compile_or_none(iso_model) if compiled_trees else None
+        self.compiled_max_rows = compiled_max_rows
+        self.batch_processing = batch_processing
+        self.max_batch_size = max(int(max_batch_size), 1) if batch_processing else 1
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.max_queue_size = max_queue_size
+        self.feature_names = engine_features(rf_model, iso_model)
+        self.stats: Dict[str, float] = {"requests": 0, "batches": 0, "max_batch": 0, "rejected": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_params(cls, rf_model, iso_model, params) -> "BatchingInferenceEngine":
+        """
+        Build from an InferenceEngineParams-like object (batch_processing, max_batch_size,
+        max_wait_ms, max_queue_size, compiled_trees); missing attributes keep the defaults.
+        """
+        return cls(
+            rf_model,
+            iso_model,
+            batch_processing=getattr(params, "batch_processing", BATCH_PROCESSING),
+            max_batch_size=getattr(params, "max_batch_size", MAX_BATCH_SIZE),
+            max_wait_ms=getattr(params, "max_wait_ms", MAX_WAIT_MS),
+            max_queue_size=getattr(params, "max_queue_size", MAX_QUEUE_SIZE),
+            compiled_trees=getattr(params, "compiled_trees", COMPILED_TREES),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.rf_model is not None or self.iso_model is not None
+
+    def scorers(self, n_rows: int) -> Tuple[Any, Any]:
+        """
+        (rf, iso) to score an n_rows batch with: the compiled forests for small batches,
+        else the sklearn models.
+        """
+        if n_rows > self.compiled_max_rows:
+            return self.rf_model, self.iso_model
+        return self.rf_compiled or self.rf_model, self.iso_compiled or self.iso_model
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = loop.create_task(self._run())
+
+    async def score(self, features: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Score one feature row; resolves once the batch containing it has been scored.
+        """
+        # Validate here so a bad row fails alone instead of failing its whole batch
+        row = [float(features[name]) for name in self.feature_names]
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((row, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise EngineOverloaded(f"Inference queue full ({self.max_queue_size} pending requests)")
+        self.stats["requests"] += 1
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[float], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            X = np.asarray([row for row, _ in batch], dtype=np.float64)
+            try:
+                scores = await asyncio.to_thread(
+                    score_matrix, *self.scorers(len(X)), X, self.feature_names
+                )
+            except Exception as e:
+                logger.error(f"Batch inference failed ({len(batch)} rows): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(score_row(scores, i))
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
@@ -0,0 +1,481 @@
+"""
+benchmarks.py
+Micro-benchmarks for the AUREV Guard feature pipeline.
+- Generates synthetic exploded-IO frames at mainnet-like scale.
+- Times the current implementations against the reference implementations they replaced.
+- Checks that both produce the same output before reporting a speedup.
+
+Usage:
+    python -m agents.ai_model.src.benchmarks volume --sizes 1000000 10000000
+    python -m agents.ai_model.src.benchmarks trees --sizes 1 64 10000
+    python -m agents.ai_model.src.benchmarks centrality --sizes 20000 60000
+    python -m agents.ai_model.src.benchmarks graph --sizes 200000 1000000
+    python -m agents.ai_model.src.benchmarks projection --sizes 200000 1000000
+    python -m agents.ai_model.src.benchmarks projection --io-path agents/ai_model/data/io_cache.csv
+    python -m agents.ai_model.src.benchmarks communities --sizes 200000 1000000
+    python -m agents.ai_model.src.benchmarks incremental --sizes 200000 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from agents.ai_model.src import feature_engineering, graph_features, tree_compiler
+from agents.ai_model.src.address_graph import AddressGraph, GraphProjection
+from agents.ai_model.src.cooccurrence import CooccurrenceIndex
+from agents.ai_model.src.centrality import CentralityEngine
+from agents.ai_model.src.communities import CommunityDetector, connected_components, modularity
+from agents.ai_model.src.incremental_graph import IncrementalGraphStore
+from agents.ai_model.src.utils import MODEL_DIR, RANDOM_SEED
+
+
+# -------------------------------
+# Synthetic data
+# -------------------------------
+
+def make_synthetic_io(
+    n_rows: int,
+    n_addresses: int | None = None,
+    rows_per_tx: int = 4,
+    days: int = 30,
+    seed: int = RANDOM_SEED,
+) -> pd.DataFrame:
+    """
+    Build a synthetic exploded-IO frame with the same columns as feature_engineering.explode_io.
+    Address activity is Zipf-like so a few hub addresses dominate, as on mainnet.
+    """
+    rng = np.random.default_rng(seed)
+    if n_addresses is None:
+        n_addresses = max(n_rows // 20, 1)
+    n_txs = max(n_rows // rows_per_tx, 1)
+
+    pool = np.array([f"addr_synth_{i:08d}" for i in range(n_addresses)], dtype=object)
+    addr_codes = np.minimum(rng.zipf(1.3, size=n_rows) - 1, n_addresses - 1)
+    addr_codes = rng.permutation(n_addresses)[addr_codes]
+
+    tx_codes = np.sort(rng.integers(0, n_txs, size=n_rows))
+    tx_pool = np.array([f"{i:064x}" for i in range(n_txs)], dtype=object)
+
+    start = pd.Timestamp("2025-01-01", tz="UTC").value
+    tx_times = start + rng.integers(0, days * 86_400, size=n_txs) * 1_000_000_000
+    block_time = pd.to_datetime(tx_times[tx_codes], utc=True)
+
+    lovelace = rng.lognormal(mean=16.0, sigma=2.0, size=n_rows).astype(np.int64)
+
+    return pd.DataFrame({
+        "address": pool[addr_codes],
+        "direction": np.where(rng.random(n_rows) < 0.5, "in", "out"),
+        "tx_hash": tx_pool[tx_codes],
+        "block_time": block_time,
+        "date": block_time.date,
+        "lovelace": lovelace,
+        "ada": lovelace / 1_000_000,
+    })
+
+
+def add_batch_transactions(
+    io_df: pd.DataFrame,
+    n_txs: int,
+    tx_addresses: int = 300,
+    seed: int = RANDOM_SEED,
+) -> pd.DataFrame:
+    """
+    Append n_txs DEX-batch / consolidation-like transactions, each touching tx_addresses
+    distinct addresses drawn from the frame, to a make_synthetic_io frame.
+    """
+    if n_txs <= 0:
+        return io_df
+    rng = np.random.default_rng(seed)
+    pool = io_df["address"].unique()
+    size = min(tx_addresses, len(pool))
+    template = io_df.iloc[rng.integers(0, len(io_df), size=n_txs * size)].reset_index(drop=True)
+    template["address"] = np.concatenate([rng.choice(pool, size=size, replace=False) for _ in range(n_txs)])
+    template["tx_hash"] = np.repeat([f"batch_{i:060x}" for i in range(n_txs)], size)
+    return pd.concat([io_df, template], ignore_index=True)
+
+
+# -------------------------------
+# Reference implementations
+# -------------------------------
+
+def reference_aggregate_volume_features(io_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Original per-group lambda implementation of aggregate_volume_features.
+    """
+    io_df = io_df.dropna(subset=["address"])
+
+    grouped = io_df.groupby("address").agg(
+        tx_count=("tx_hash", "nunique"),
+        total_received=("ada", lambda x: x[io_df.loc[x.index, "direction"] == "out"].sum()),
+        total_sent=("ada", lambda x: x[io_df.loc[x.index, "direction"] == "in"].sum()),
+        max_tx_size=("ada", "max"),
+        avg_tx_size=("ada", "mean"),
+    ).reset_index()
+
+    grouped["net_balance_change"] = grouped["total_received"] - grouped["total_sent"]
+
+    return grouped
+
+
+def reference_graph_metrics(edges_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Original networkx construction of compute_graph_metrics (without centralities).
+    """
+    import networkx as nx
+
+    G = nx.Graph()
+    for _, row in edges_df.iterrows():
+        G.add_edge(row["addr_u"], row["addr_v"], weight=float(row["weight"]))
+    degree = dict(G.degree())
+    weighted_degree = {n: float(sum(d["weight"] for _, _, d in G.edges(n, data=True))) for n in G.nodes()}
+    clustering = nx.clustering(G, weight="weight")
+    nodes = list(G.nodes())
+    return pd.DataFrame({
+        "address": nodes,
+        "degree": [degree[n] for n in nodes],
+        "weighted_degree": [weighted_degree[n] for n in nodes],
+        "clustering_coefficient": [clustering[n] for n in nodes],
+    })
+
+
+# -------------------------------
+# Harness
+# -------------------------------
+
+def _timed(fn: Callable, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def _assert_frames_match(left: pd.DataFrame, right: pd.DataFrame, key: str = "address"):
+    left = left.sort_values(key).reset_index(drop=True)
+    right = right.sort_values(key).reset_index(drop=True)[left.columns]
+    pd.testing.assert_frame_equal(left, right, check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def bench_volume_features(
+    sizes: Sequence[int] = (1_000_000, 10_000_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+) -> pd.DataFrame:
+    """
+    Time the vectorized volume engine against the per-group lambda implementation.
+    Set reference=False to skip the (slow) reference run on very large frames.
+    """
+    rows: List[Dict[str, float]] = []
+    for n_rows in sizes:
+        io_df = make_synthetic_io(n_rows, seed=seed)
+        fast, fast_s = _timed(feature_engineering.aggregate_volume_features, io_df)
+        row = {"rows": n_rows, "addresses": len(fast), "vectorized_s": fast_s}
+        if reference:
+            slow, slow_s = _timed(reference_aggregate_volume_features, io_df)
+            _assert_frames_match(fast, slow)
+            row.update({"reference_s": slow_s, "speedup": slow_s / fast_s if fast_s else np.nan})
+        rows.append(row)
+        print(f"volume_features rows={n_rows:,}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_tree_scoring(
+    sizes: Sequence[int] = (1, 64, 10_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+    min_rows: int = 1_000,
+) -> pd.DataFrame:
+    """
+    Per-row latency of the compiled tree evaluator against sklearn's predict_proba /
+    decision_function on the shipped models, for batches of each size. Every batch size
+    is repeated until min_rows rows (at least 5 calls) have been scored.
+    """
+    import joblib
+
+    rng = np.random.default_rng(seed)
+    models = {
+        "randomforest": joblib.load(os.path.join(MODEL_DIR, "randomforest.pkl")),
+        "isolationforest": joblib.load(os.path.join(MODEL_DIR, "isolationforest.pkl")),
+    }
+    rows: List[Dict[str, float]] = []
+    for name, model in models.items():
+        compiled = tree_compiler.compile_model(model)
+        method = "predict_proba" if hasattr(model, "predict_proba") else "decision_function"
+        columns = [str(c) for c in model.feature_names_in_]
+        for n_rows in sizes:
+            X = pd.DataFrame(rng.lognormal(1.0, 2.0, size=(n_rows, len(columns))), columns=columns)
+            calls = max(min_rows // n_rows, 5)
+            # The compiled scorer takes the bare matrix, as batch_inference passes it
+            X_np = X.to_numpy()
+            fast_out, fast_s = _timed(lambda: [getattr(compiled, method)(X_np) for _ in range(calls)][-1])
+            row = {"model": name, "batch_rows": n_rows, "compiled_us_per_row": fast_s / (calls * n_rows) * 1e6}
+            if reference:
+                slow_out, slow_s = _timed(lambda: [getattr(model, method)(X) for _ in range(calls)][-1])
+                if not np.array_equal(fast_out, slow_out):
+                    raise AssertionError(f"{name}: compiled {method} differs from sklearn")
+                row.update({
+                    "sklearn_us_per_row": slow_s / (calls * n_rows) * 1e6,
+                    "speedup": slow_s / fast_s if fast_s else np.nan,
+                })
+            rows.append(row)
+            print(f"tree_scoring {name} batch={n_rows:,}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_centrality(
+    sizes: Sequence[int] = (20_000, 60_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+    ks: Sequence[int] = (25, 100, 400),
+) -> pd.DataFrame:
+    """
+    Accuracy vs time of pivot-sampled betweenness / closeness for each k, on the
+    co-occurrence graph of a synthetic IO frame of each size. Errors are measured
+    against the engine's exact mode, which is first checked against networkx
+    (reference=False skips networkx, the slow part on larger graphs).
+    """
+    import networkx as nx
+    from scipy.stats import spearmanr
+
+    rows: List[Dict[str, float]] = []
+    for n_rows in sizes:
+        edges = graph_features.build_counterparty_edges(make_synthetic_io(n_rows, seed=seed))
+        G = nx.Graph()
+        G.add_weighted_edges_from(edges[["addr_u", "addr_v", "weight"]].itertuples(index=False, name=None))
+        nodes = list(G.nodes())
+        A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight="weight", format="csr")
+        base = {"rows": n_rows, "nodes": len(nodes), "edges": G.number_of_edges()}
+
+        measures = ["betweenness", "closeness"]
+        exact, exact_s = _timed(CentralityEngine(measures, approximate=False, seed=seed).compute, A)
+        row = {**base, "k": "exact", "seconds": exact_s}
+        if reference:
+            (bc, cc), nx_s = _timed(lambda: (
+                nx.betweenness_centrality(G, normalized=True, weight="weight"),
+                nx.closeness_centrality(G, distance="weight"),
+            ))
+            for name, ref in (("betweenness", bc), ("closeness", cc)):
+                if not np.allclose(exact[f"{name}_centrality"], [ref[n] for n in nodes], rtol=1e-9, atol=1e-12):
+                    raise AssertionError(f"exact {name} differs from networkx")
+            row.update({"networkx_s": nx_s, "speedup": nx_s / exact_s if exact_s else np.nan})
+        rows.append(row)
+        print(f"centrality rows={n_rows:,} exact: {row}")
+
+        top = max(len(nodes) // 100, 1)
+        for k in ks:
+            approx, approx_s = _timed(CentralityEngine(measures, approximate=True, k=k, seed=seed).compute, A)
+            row = {**base, "k": k, "seconds": approx_s}
+            for name in measures:
+                est, ref = approx[f"{name}_centrality"], exact[f"{name}_centrality"]
+                row[f"{name}_max_abs_err"] = float(np.abs(est - ref).max())
+                row[f"{name}_spearman"] = float(spearmanr(est, ref).statistic)
+                # Share of the exact top 1% found in the estimated top 1%
+                row[f"{name}_top1pct"] = len(set(np.argsort(-est)[:top]) & set(np.argsort(-ref)[:top])) / top
+            rows.append(row)
+            print(f"centrality rows={n_rows:,} k={k}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_graph_metrics(
+    sizes: Sequence[int] = (200_000, 1_000_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+) -> pd.DataFrame:
+    """
+    Degree, weighted degree and clustering from the CSR AddressGraph against the
+    networkx iterrows construction, on the co-occurrence graph of a synthetic IO frame
+    of each size. csr_mb is the size of the persisted CSR arrays.
+    """
+    def csr_metrics(edges_df: pd.DataFrame):
+        graph = AddressGraph.from_edges(edges_df)
+        return pd.DataFrame({
+            "address": graph.addresses,
+            "degree": graph.degree(),
+            "weighted_degree": graph.weighted_degree(),
+            "clustering_coefficient": graph.clustering(),
+        }), graph
+
+    rows: List[Dict[str, float]] = []
+    for n_rows in sizes:
+        edges = graph_features.build_counterparty_edges(make_synthetic_io(n_rows, seed=seed))
+        (fast, graph), fast_s = _timed(csr_metrics, edges)
+        csr_bytes = sum(a.nbytes for a in (graph.addresses, graph.indptr, graph.indices, graph.weights))
+        row = {"rows": n_rows, "nodes": graph.n_nodes, "edges": graph.n_edges,
+               "csr_s": fast_s, "csr_mb": csr_bytes / 2**20}
+        if reference:
+            slow, slow_s = _timed(reference_graph_metrics, edges)
+            _assert_frames_match(fast, slow)
+            row.update({"networkx_s": slow_s, "speedup": slow_s / fast_s if fast_s else np.nan})
+        rows.append(row)
+        print(f"graph_metrics rows={n_rows:,}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_graph_projection(
+    sizes: Sequence[int] = (200_000, 1_000_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+    batch_txs_per_100k: int = 5,
+    io_path: str | None = None,
+) -> pd.DataFrame:
+    """
+    Edge count and graph_features runtime (build + degree / clustering / sampled
+    centralities) of each GraphProjection mode. Synthetic frames get batch_txs_per_100k
+    300-address batch transactions per 100k rows; io_path benchmarks a real exploded-IO
+    sample (.csv or .parquet) instead. reference=False skips the clique projection.
+    """
+    if io_path is not None:
+        samples = [(io_path, pd.read_parquet(io_path) if io_path.endswith(".parquet") else pd.read_csv(io_path))]
+    else:
+        samples = [
+            (n_rows, add_batch_transactions(make_synthetic_io(n_rows, seed=seed), n_rows * batch_txs_per_100k // 100_000, seed=seed))
+            for n_rows in sizes
+        ]
+    modes = ["clique", "star", "bipartite"] if reference else ["star", "bipartite"]
+
+    rows: List[Dict[str, float]] = []
+    for sample, io_df in samples:
+        cooc = CooccurrenceIndex(io_df)
+        tx_size = np.diff(cooc.incidence.tocsc().indptr)
+        base = {"sample": sample, "addresses": cooc.n_addresses, "max_tx_addresses": int(tx_size.max(initial=0))}
+        clique = None
+        for mode in modes:
+            graph, build_s = _timed(GraphProjection(mode).build, cooc)
+            features, metrics_s = _timed(graph_features.graph_metrics, graph, CentralityEngine(seed=seed))
+            row = {**base, "projection": mode, "nodes": graph.n_nodes, "edges": graph.n_edges,
+                   "build_s": build_s, "metrics_s": metrics_s}
+            if mode == "clique":
+                clique = row
+            elif clique is not None:
+                row.update({
+                    "edge_reduction": clique["edges"] / graph.n_edges if graph.n_edges else np.nan,
+                    "speedup": (clique["build_s"] + clique["metrics_s"]) / (build_s + metrics_s),
+                })
+            rows.append(row)
+            print(f"graph_projection {sample} {mode}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_communities(
+    sizes: Sequence[int] = (200_000, 1_000_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+) -> pd.DataFrame:
+    """
+    Runtime and modularity of Louvain / label propagation over the CSR co-occurrence
+    graph of a synthetic IO frame of each size, with union-find components. The
+    reference rows run networkx louvain_communities / label_propagation_communities on
+    the same graph.
+    """
+    import networkx as nx
+
+    rows: List[Dict[str, float]] = []
+    for n_rows in sizes:
+        graph = AddressGraph.from_edges(graph_features.build_counterparty_edges(make_synthetic_io(n_rows, seed=seed)))
+        A = graph.adjacency
+        base = {"rows": n_rows, "nodes": graph.n_nodes, "edges": graph.n_edges}
+        components, components_s = _timed(connected_components, A)
+        print(f"communities rows={n_rows:,} components: {len(np.unique(components))} in {components_s:.3f}s")
+        G = nx.from_scipy_sparse_array(A) if reference else None
+        for algorithm in ("louvain", "label_propagation"):
+            labels, seconds = _timed(CommunityDetector(algorithm=algorithm, seed=seed).communities, A)
+            row = {**base, "algorithm": algorithm, "seconds": seconds, "components_s": components_s,
+                   "communities": int(labels.max()) + 1, "modularity": modularity(A, labels)}
+            if reference:
+                if algorithm == "louvain":
+                    parts, nx_s = _timed(nx.community.louvain_communities, G, seed=seed)
+                else:
+                    parts, nx_s = _timed(lambda: list(nx.community.label_propagation_communities(G)))
+                row.update({
+                    "networkx_s": nx_s,
+                    "networkx_modularity": nx.community.modularity(G, parts),
+                    "speedup": nx_s / seconds if seconds else np.nan,
+                })
+            rows.append(row)
+            print(f"communities rows={n_rows:,} {algorithm}: {row}")
+    return pd.DataFrame(rows)
+
+
+def bench_incremental_graph(
+    sizes: Sequence[int] = (200_000, 1_000_000),
+    reference: bool = True,
+    seed: int = RANDOM_SEED,
+    batches: int = 5,
+    batch_share: float = 0.01,
+) -> pd.DataFrame:
+    """
+    Per-pull cost of IncrementalGraphStore.apply (load state, absorb the new txs, save,
+    assemble graph_features) for batches of batch_share of the transactions each, on
+    top of a graph built from the rest. The reference rebuilds the graph and every
+    metric from all transactions so far, as build_and_save_graph_features does; the
+    last batch checks degree, weighted degree, clustering and component sizes match.
+    """
+    rows: List[Dict[str, float]] = []
+    for n_rows in sizes:
+        io_df = add_batch_transactions(make_synthetic_io(n_rows, seed=seed), n_rows * 5 // 100_000, seed=seed)
+        txs = np.random.default_rng(seed).permutation(io_df["tx_hash"].unique())
+        n_batch = max(int(len(txs) * batch_share), 1)
+        seen = set(txs[:len(txs) - batches * n_batch])
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            store = IncrementalGraphStore(tmp / "address_graph.npz", tmp / "address_graph_state.npz", tmp,
+                                          centrality=CentralityEngine(seed=seed))
+            _, rebuild_s = _timed(store.rebuild, io_df[io_df["tx_hash"].isin(seen)])
+            for i in range(batches):
+                batch = set(txs[len(txs) - (batches - i) * n_batch:][:n_batch])
+                seen |= batch
+                features, seconds = _timed(store.apply, io_df[io_df["tx_hash"].isin(batch)])
+                row = {"rows": n_rows, "batch": i, "batch_txs": n_batch, "addresses": len(features),
+                       "seconds": seconds, "rebuild_s": rebuild_s}
+                if reference:
+                    full, full_s = _timed(
+                        graph_features.graph_metrics,
+                        graph_features.build_address_graph(io_df[io_df["tx_hash"].isin(seen)]),
+                        CentralityEngine(seed=seed),
+                    )
+                    row.update({"full_s": full_s, "speedup": full_s / seconds if seconds else np.nan})
+                    if i == batches - 1:
+                        columns = ["degree", "weighted_degree", "clustering_coefficient", "component_size"]
+                        _assert_frames_match(features[["address", *columns]], full[["address", *columns]])
+                rows.append(row)
+                print(f"incremental_graph rows={n_rows:,} batch={i}: {row}")
+    return pd.DataFrame(rows)
+
+
+BENCHMARKS: Dict[str, Callable[..., pd.DataFrame]] = {
+    "volume": bench_volume_features,
+    "trees": bench_tree_scoring,
+    "centrality": bench_centrality,
+    "graph": bench_graph_metrics,
+    "projection": bench_graph_projection,
+    "communities": bench_communities,
+    "incremental": bench_incremental_graph,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AUREV Guard feature pipeline benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help="Synthetic IO row counts (volume, centrality, graph, projection, communities, incremental) or rows per scoring call (trees)")
+    parser.add_argument("--no-reference", action="store_true",
+                        help="Skip the reference implementation")
+    parser.add_argument("--io-path", default=None,
+                        help="Exploded-IO sample (.csv / .parquet) to benchmark instead of synthetic data (projection)")
+    args = parser.parse_args()
+
+    kwargs = {"reference": not args.no_reference}
+    if args.sizes:
+        kwargs["sizes"] = args.sizes
+    if args.io_path:
+        kwargs["io_path"] = args.io_path
+    result = BENCHMARKS[args.benchmark](**kwargs)
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
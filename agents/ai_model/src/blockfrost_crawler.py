@@ -0,0 +1,366 @@
+"""
+blockfrost_crawler.py
+Concurrent Blockfrost block crawler used by live_pipeline.
+- One pooled httpx.AsyncClient (keep-alive connections reused across all requests).
+- Bounded concurrency (semaphore) plus a token bucket matching Blockfrost quotas
+  (10 requests/second sustained, bursts of up to 500).
+- Retries 429 and 5xx responses (and transport errors) with exponential backoff,
+  honouring Retry-After when the server sends it.
+- Block heights are enumerated from /blocks/latest, so blocks are fetched in parallel
+  instead of walking previous_block hashes one round trip at a time.
+The base URL and httpx transport are injectable, so the crawler can run against a
+local fake Blockfrost server.
+"""
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from agents.ai_model.src.tx_cache import DETAILS, UTXOS, TxCache
+from agents.ai_model.src.utils import logger
+
+BLOCKFROST_API_KEY = os.getenv("BLOCKFROST_API_KEY", "")
+BLOCKFROST_PROJECT = os.getenv("BLOCKFROST_PROJECT", "mainnet")
+BASE_URL = f"https://cardano-{BLOCKFROST_PROJECT}.blockfrost.io/api/v0"
+
+# Blockfrost limits: 10 req/s per IP with a 500-request burst bucket
+DEFAULT_RATE_PER_SECOND = 10.0
+DEFAULT_BURST = 500
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_TIMEOUT_SECONDS = 30.0
+PAGE_SIZE = 100
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, holding at most `capacity` tokens.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1.0
+
+
+class BlockfrostCrawler:
+    """
+    Async Blockfrost client. Use as an async context manager:
+
+        async with BlockfrostCrawler(project_id=key) as crawler:
+            txs = await crawler.crawl(max_blocks=500)
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        project_id: str = BLOCKFROST_API_KEY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        tx_cache: Optional[TxCache] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.project_id = project_id
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.transport = transport
+        self.tx_cache = tx_cache
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.requests_sent = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "BlockfrostCrawler":
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"project_id": self.project_id},
+            limits=limits,
+            timeout=self.timeout_seconds,
+            transport=self.transport,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # -------------------------------
+    # HTTP with rate limiting and retries
+    # -------------------------------
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET a Blockfrost path and return the decoded JSON body.
+        Raises httpx.HTTPStatusError for non-retryable errors or once retries are exhausted.
+        """
+        if self._client is None:
+            raise RuntimeError("BlockfrostCrawler must be used as an async context manager")
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            async with self._semaphore:
+                await self.bucket.acquire()
+                self.requests_sent += 1
+                try:
+                    response = await self._client.get(path, params=params)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    logger.warning(f"Blockfrost {path} transport error ({e}); retrying")
+                else:
+                    if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                        response.raise_for_status()
+                        return response.json()
+                    logger.warning(f"Blockfrost {path} returned {response.status_code}; retrying")
+            # Sleep outside the semaphore so other requests keep flowing
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    # -------------------------------
+    # Endpoints
+    # -------------------------------
+
+    async def latest_block(self) -> dict:
+        return await self.get("/blocks/latest")
+
+    async def block_transactions(self, hash_or_height) -> List[str]:
+        """
+        All tx hashes of a block, following Blockfrost pagination.
+        """
+        hashes: List[str] = []
+        page = 1
+        while True:
+            batch = await self.get(f"/blocks/{hash_or_height}/txs", params={"count": PAGE_SIZE, "page": page})
+            hashes.extend(batch)
+            if len(batch) < PAGE_SIZE:
+                return hashes
+            page += 1
+
+    async def _cached(self, kind: str, tx_hash: str, path: str) -> Any:
+        if self.tx_cache is not None:
+            body = self.tx_cache.get(kind, tx_hash)
+            if body is not None:
+                return body
+        body = await self.get(path)
+        if self.tx_cache is not None:
+            self.tx_cache.put(kind, tx_hash, body)
+        return body
+
+    async def transaction(self, tx_hash: str) -> dict:
+        """
+        Transaction record in the shape stored by live_pipeline (details + UTXOs).
+        Served from tx_cache without network calls when the transaction is already known.
+        """
+        details, utxos = await asyncio.gather(
+            self._cached(DETAILS, tx_hash, f"/txs/{tx_hash}"),
+            self._cached(UTXOS, tx_hash, f"/txs/{tx_hash}/utxos"),
+        )
+        return {
+            "tx_hash": tx_hash,
+            "block_time": datetime.fromtimestamp(details["block_time"], timezone.utc).isoformat(),
+            "block_height": details.get("block_height"),
+            "inputs": utxos.get("inputs", []),
+            "outputs": utxos.get("outputs", []),
+            "fees": details.get("fees"),
+            "size": details.get("size"),
+        }
+
+    async def block(self, height: int) -> List[dict]:
+        tx_hashes = await self.block_transactions(height)
+        return list(await asyncio.gather(*(self.transaction(h) for h in tx_hashes)))
+
+    async def address_transactions(self, address: str, max_transactions: int = 100) -> List[str]:
+        """
+        Up to max_transactions tx hashes of an address, following pagination.
+        """
+        hashes: List[str] = []
+        # Page size must stay fixed across pages for Blockfrost page offsets to line up
+        count = max(min(PAGE_SIZE, max_transactions), 1)
+        page = 1
+        while len(hashes) < max_transactions:
+            batch = await self.get(
+                f"/addresses/{address}/transactions",
+                params={"count": count, "page": page},
+            )
+            hashes.extend(ref if isinstance(ref, str) else ref.get("tx_hash", "") for ref in batch)
+            if len(batch) < count:
+                break
+            page += 1
+        return [h for h in hashes if h][:max_transactions]
+
+    # -------------------------------
+    # Wallet scans
+    # -------------------------------
+
+    async def scan_addresses(
+        self, addresses: Sequence[str], max_transactions: int = 100
+    ) -> Tuple[List[dict], Dict[str, List[str]], Dict[str, httpx.HTTPError]]:
+        """
+        Fetch the tx lists of many addresses concurrently, then each distinct transaction once.
+        Returns (tx records, address -> tx hashes, address -> error). A transaction shared by
+        several scanned addresses appears once in the records. An address gets an error when
+        its listing fails (it then maps to []) or when none of its transactions could be
+        fetched; single failed transactions are only logged and left out.
+        """
+        addresses = list(dict.fromkeys(addresses))
+        errors: Dict[str, httpx.HTTPError] = {}
+        failed: Dict[str, httpx.HTTPError] = {}
+
+        async def listing(address: str) -> List[str]:
+            try:
+                return await self.address_transactions(address, max_transactions)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to list transactions for {address}: {e}")
+                errors[address] = e
+                return []
+
+        listings = await asyncio.gather(*(listing(a) for a in addresses))
+        by_address = dict(zip(addresses, listings))
+        unique = list(dict.fromkeys(h for hashes in listings for h in hashes))
+
+        async def record(tx_hash: str) -> Optional[dict]:
+            try:
+                return await self.transaction(tx_hash)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to fetch details for tx {tx_hash}: {e}")
+                failed[tx_hash] = e
+                return None
+
+        records = [r for r in await asyncio.gather(*(record(h) for h in unique)) if r is not None]
+        fetched = {r["tx_hash"] for r in records}
+        for address, hashes in by_address.items():
+            if hashes and all(h in failed for h in hashes):
+                errors[address] = failed[hashes[0]]
+        by_address = {a: [h for h in hashes if h in fetched] for a, hashes in by_address.items()}
+        logger.info(f"Scanned {len(addresses)} addresses: {len(records)} distinct transactions "
+                    f"({self.requests_sent} requests, {len(errors)} addresses failed)")
+        return records, by_address, errors
+
+    # -------------------------------
+    # Crawling
+    # -------------------------------
+
+    async def crawl_heights(
+        self,
+        heights: Sequence[int],
+        on_block: Optional[Callable[[int, List[dict]], Optional[Awaitable[None]]]] = None,
+    ) -> List[dict]:
+        """
+        Fetch the given block heights concurrently (newest first in the result).
+        on_block(height, txs) is called as each block completes, in completion order.
+        """
+        results: Dict[int, List[dict]] = {}
+        # Only a bounded window of blocks is in flight; per-request concurrency is
+        # capped separately by the semaphore.
+        window = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(height: int):
+            async with window:
+                txs = await self.block(height)
+            results[height] = txs
+            logger.info(f"Fetched block {height}: {len(txs)} transactions")
+            if on_block is not None:
+                ret = on_block(height, txs)
+                if asyncio.iscoroutine(ret):
+                    await ret
+
+        await asyncio.gather(*(run(h) for h in heights))
+        return [tx for h in sorted(results, reverse=True) for tx in results[h]]
+
+    async def crawl(
+        self,
+        max_blocks: int = 500,
+        select_heights: Optional[Callable[[int, int], List[int]]] = None,
+        **kwargs,
+    ) -> List[dict]:
+        """
+        Pull transactions from the latest `max_blocks` blocks.
+        select_heights(tip, max_blocks) can narrow the heights to fetch
+        (e.g. IngestionJournal.missing_heights to skip blocks already stored).
+        """
+        tip = await self.latest_block()
+        top = int(tip["height"])
+        if select_heights is not None:
+            heights = select_heights(top, max_blocks)
+        else:
+            heights = list(range(top, max(top - max_blocks, 0), -1))
+        txs = await self.crawl_heights(heights, **kwargs)
+        logger.info(f"Total collected transactions: {len(txs)} from {len(heights)} blocks "
+                    f"({self.requests_sent} requests)")
+        return txs
+
+
+def crawl_latest_blocks(
+    max_blocks: int = 500,
+    select_heights: Optional[Callable[[int, int], List[int]]] = None,
+    on_block: Optional[Callable[[int, List[dict]], Optional[Awaitable[None]]]] = None,
+    **crawler_kwargs,
+) -> List[dict]:
+    """
+    Synchronous entry point: crawl the latest `max_blocks` blocks and return tx records.
+    """
+    async def _run():
+        async with BlockfrostCrawler(**crawler_kwargs) as crawler:
+            return await crawler.crawl(max_blocks=max_blocks, select_heights=select_heights, on_block=on_block)
+
+    return asyncio.run(_run())
+
+
+def scan_wallets(
+    addresses: Sequence[str],
+    max_transactions: int = 100,
+    **crawler_kwargs,
+) -> Tuple[List[dict], Dict[str, List[str]], Dict[str, httpx.HTTPError]]:
+    """
+    Synchronous entry point: scan many wallet addresses in one pass (see scan_addresses).
+    """
+    async def _run():
+        async with BlockfrostCrawler(**crawler_kwargs) as crawler:
+            return await crawler.scan_addresses(addresses, max_transactions=max_transactions)
+
+    return asyncio.run(_run())
@@ -0,0 +1,347 @@
+"""
+centrality.py
+Scalable centralities for the address co-occurrence graph (graph_features).
+- Betweenness: Brandes dependencies from sampled pivot sources. Components with at most
+  k nodes use every node as a source (exact); larger components sample k pivots and
+  rescale by size / k. Path counts and dependencies are two sparse triangular solves
+  over each source's shortest-path DAG; small components are solved for all their
+  sources at once on dense blocks.
+- Closeness: distances from the same sources (Eppstein-Wang estimate in sampled
+  components), matching networkx's Wasserman-Faust closeness when exact.
+- Eigenvector: sparse power iteration with networkx's update and stopping rule.
+Sources are split into chunks across a process pool. Edge weights are path lengths,
+as in the networkx calls these replace (weighted=False counts hops).
+
+Settings mirror GraphMetricsParams (compute_centrality, centrality_approximation,
+k_neighbors_for_approximation); CentralityEngine.from_params reads them.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import spsolve_triangular
+
+from agents.ai_model.src.utils import RANDOM_SEED, logger
+
+CENTRALITY_MEASURES = [m.strip() for m in os.getenv("GRAPH_CENTRALITY", "betweenness,closeness,eigenvector").split(",") if m.strip()]
+CENTRALITY_APPROXIMATION = os.getenv("GRAPH_CENTRALITY_APPROXIMATION", "true").lower() == "true"
+CENTRALITY_K = int(os.getenv("GRAPH_CENTRALITY_K", "100"))
+CENTRALITY_JOBS = int(os.getenv("GRAPH_CENTRALITY_JOBS", str(os.cpu_count() or 1)))
+CENTRALITY_WEIGHTED = os.getenv("GRAPH_CENTRALITY_WEIGHTED", "true").lower() == "true"
+
+# Components up to this size are solved for all sources at once on dense blocks
+DENSE_NODES = 256
+# Cap on (sources x block edges) cells per dense step, bounding its memory
+DENSE_CELLS = 4_000_000
+# Below this many edge visits (sources x block edges) the pool costs more than it saves
+PARALLEL_MIN_WORK = 5_000_000
+
+MEASURES = ("betweenness", "closeness", "eigenvector")
+
+
+# -------------------------------
+# Shortest-path passes
+# -------------------------------
+
+def _block_edges(block: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+    return rows, block.indices, block.data
+
+
+def _single_source(
+    block: sparse.csr_matrix,
+    edges: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    source: int,
+    weighted: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distances from source and Brandes dependencies delta(source, v) within one block.
+    """
+    m = block.shape[0]
+    dist = csgraph.dijkstra(block, directed=True, indices=source, unweighted=not weighted)
+    reach = np.flatnonzero(np.isfinite(dist))
+    order = reach[np.argsort(dist[reach], kind="stable")]
+    rank = np.full(m, -1, dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    # Edges on a shortest path: dist[u] + w(u, v) == dist[v]
+    rows, cols, data = edges
+    length = data if weighted else 1.0
+    du = dist[rows]
+    on_dag = np.isfinite(du) & np.isclose(du + length, dist[cols], rtol=1e-12, atol=0.0)
+    targets, preds = rank[cols[on_dag]], rank[rows[on_dag]]
+
+    r = len(order)
+    eye = sparse.identity(r, format="csr")
+    dag = sparse.csr_matrix((np.ones(len(targets)), (targets, preds)), shape=(r, r))
+    # sigma = e_source + P sigma (P lower triangular in distance order)
+    unit = np.zeros(r)
+    unit[0] = 1.0
+    sigma = spsolve_triangular((eye - dag).tocsr(), unit, lower=True)
+    # y = 1/sigma + Pᵀ y, delta = sigma * y - 1
+    y = spsolve_triangular((eye - dag.T).tocsr(), 1.0 / sigma, lower=False)
+    delta = np.zeros(m)
+    delta[order] = sigma * y - 1.0
+    delta[source] = 0.0
+    return dist, delta
+
+
+def _dense_all_sources(block: sparse.csr_matrix, weighted: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Exact dependencies and distance sums from every node of a block of small
+    components. Path counts and dependencies are vectorized over sources: a Jacobi
+    sweep over the shortest-path DAG edges, repeated until nothing changes (DAG depth).
+    """
+    m = block.shape[0]
+    rows, cols, data = _block_edges(block)
+    n_edges = len(rows)
+    length = data if weighted else 1.0
+    dist_all = csgraph.dijkstra(block, directed=True, unweighted=not weighted)
+    edge_ids = np.arange(n_edges)
+    # Sum per-edge values into their target (into) or origin (out_of) node
+    into = sparse.csr_matrix((np.ones(n_edges), (cols, edge_ids)), shape=(m, n_edges))
+    out_of = sparse.csr_matrix((np.ones(n_edges), (rows, edge_ids)), shape=(m, n_edges))
+
+    betweenness, dist_sum, dist_count = np.zeros(m), np.zeros(m), np.zeros(m)
+    chunk = max(DENSE_CELLS // max(n_edges, 1), 1)
+    for s0 in range(0, m, chunk):
+        dist = dist_all[s0:s0 + chunk]
+        c = len(dist)
+        du = dist[:, rows]
+        on_dag = np.isfinite(du) & np.isclose(du + length, dist[:, cols], rtol=1e-12, atol=0.0)
+        unit = np.zeros((c, m))
+        unit[np.arange(c), s0 + np.arange(c)] = 1.0
+
+        sigma = unit
+        while True:
+            nxt = unit + (into @ (sigma[:, rows] * on_dag).T).T
+            if np.array_equal(nxt, sigma):
+                break
+            sigma = nxt
+        reach = np.isfinite(dist)
+        inv = np.divide(1.0, sigma, out=np.zeros_like(sigma), where=sigma > 0)
+        y = inv
+        while True:
+            nxt = inv + (out_of @ (y[:, cols] * on_dag).T).T
+            if np.array_equal(nxt, y):
+                break
+            y = nxt
+        delta = np.where(reach, sigma * y - 1.0, 0.0)
+        delta[np.arange(c), s0 + np.arange(c)] = 0.0
+        betweenness += delta.sum(axis=0)
+        reached = reach & (dist > 0)
+        dist_sum += np.where(reached, dist, 0.0).sum(axis=0)
+        dist_count += reached.sum(axis=0)
+    return betweenness, dist_sum, dist_count
+
+
+def _run_sources(
+    graph: sparse.csr_matrix,
+    start: int,
+    end: int,
+    sources: Optional[np.ndarray],
+    scale: float,
+    weighted: bool,
+) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Betweenness contributions, distance sums and distance counts for the block of
+    nodes [start, end) from the given sources (block-local ids; None = every node,
+    solved densely).
+    """
+    block = graph[start:end, start:end].tocsr()
+    if sources is None:
+        return (start, *_dense_all_sources(block, weighted))
+    edges = _block_edges(block)
+    m = end - start
+    betweenness = np.zeros(m)
+    dist_sum = np.zeros(m)
+    dist_count = np.zeros(m)
+    for source in sources:
+        dist, delta = _single_source(block, edges, int(source), weighted)
+        betweenness += delta
+        reached = np.isfinite(dist) & (dist > 0)
+        dist_sum[reached] += dist[reached]
+        dist_count[reached] += 1
+    return start, betweenness * scale, dist_sum, dist_count
+
+
+_WORKER_GRAPH: Optional[sparse.csr_matrix] = None
+
+
+def _init_worker(indptr, indices, data, shape) -> None:
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = sparse.csr_matrix((data, indices, indptr), shape=shape)
+
+
+def _run_task(task):
+    return _run_sources(_WORKER_GRAPH, *task)
+
+
+# -------------------------------
+# Eigenvector centrality
+# -------------------------------
+
+def eigenvector_centrality(adjacency: sparse.csr_matrix, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    """
+    Power iteration x <- (I + A) x, L2-normalized, stopped when the L1 change is below
+    n * tol (networkx.eigenvector_centrality). Returns the last iterate, with a warning,
+    if it has not converged after max_iter steps.
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        last = x
+        x = last + adjacency @ last
+        norm = np.linalg.norm(x)
+        x = x / norm if norm > 0 else x
+        if np.abs(x - last).sum() < n * tol:
+            return x
+    logger.warning(f"⚠️ Eigenvector centrality did not converge in {max_iter} iterations")
+    return x
+
+
+# -------------------------------
+# Engine
+# -------------------------------
+
+class CentralityEngine:
+    """
+    Centralities of an undirected weighted graph given as a symmetric CSR adjacency:
+
+        engine = CentralityEngine(k=100)
+        scores = engine.compute(adjacency)   # {"betweenness_centrality": array, ...}
+
+    approximate=False uses every node as a source (exact, O(V·E)).
+    """
+
+    def __init__(
+        self,
+        measures: Sequence[str] = CENTRALITY_MEASURES,
+        approximate: bool = CENTRALITY_APPROXIMATION,
+        k: int = CENTRALITY_K,
+        n_jobs: int = CENTRALITY_JOBS,
+        weighted: bool = CENTRALITY_WEIGHTED,
+        seed: int = RANDOM_SEED,
+        max_iter: int = 100,
+        tol: float = 1e-6,
+    ):
+        unknown = set(measures) - set(MEASURES)
+        if unknown:
+            raise ValueError(f"Unknown centrality measures {sorted(unknown)}; expected {MEASURES}")
+        self.measures = list(measures)
+        self.approximate = approximate
+        self.k = max(int(k), 1)
+        self.n_jobs = max(int(n_jobs), 1)
+        self.weighted = weighted
+        self.seed = seed
+        self.max_iter = max_iter
+        self.tol = tol
+
+    @classmethod
+    def from_params(cls, params, **kwargs) -> "CentralityEngine":
+        """
+        Build from GraphMetricsParams (or any object with the same attributes).
+        """
+        return cls(
+            measures=getattr(params, "compute_centrality", CENTRALITY_MEASURES),
+            approximate=getattr(params, "centrality_approximation", CENTRALITY_APPROXIMATION),
+            k=getattr(params, "k_neighbors_for_approximation", CENTRALITY_K),
+            **kwargs,
+        )
+
+    def _tasks(self, sizes: np.ndarray) -> List[Tuple[int, int, Optional[np.ndarray], float]]:
+        """
+        (start, end, block-local sources or None, scale) per block of the
+        component-sorted graph.
+        """
+        rng = np.random.default_rng(self.seed)
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        tasks: List[Tuple[int, int, Optional[np.ndarray], float]] = []
+        group_start = None
+        for c, size in enumerate(sizes):
+            start, end = int(bounds[c]), int(bounds[c + 1])
+            if size <= DENSE_NODES:
+                # Small components (pairs and singletons included) are grouped into dense blocks
+                group_start = start if group_start is None else group_start
+                if end - group_start >= DENSE_NODES:
+                    tasks.append((group_start, end, None, 1.0))
+                    group_start = None
+                continue
+            if group_start is not None:
+                tasks.append((group_start, start, None, 1.0))
+                group_start = None
+            if self.approximate and size > self.k:
+                sources, scale = np.sort(rng.choice(size, size=self.k, replace=False)), size / self.k
+            else:
+                sources, scale = np.arange(size), 1.0
+            # One task per chunk of sources so the pool shares a large component
+            for chunk in np.array_split(sources, min(self.n_jobs, len(sources))):
+                tasks.append((start, end, chunk, scale))
+        if group_start is not None:
+            tasks.append((group_start, int(bounds[-1]), None, 1.0))
+        return tasks
+
+    def _shortest_path_pass(self, graph: sparse.csr_matrix, sizes: np.ndarray):
+        n = graph.shape[0]
+        betweenness, dist_sum, dist_count = np.zeros(n), np.zeros(n), np.zeros(n)
+        tasks = [t + (self.weighted,) for t in self._tasks(sizes)]
+        work = sum(
+            (e - s if src is None else len(src)) * (graph.indptr[e] - graph.indptr[s])
+            for s, e, src, _, _ in tasks
+        )
+        if self.n_jobs > 1 and len(tasks) > 1 and work >= PARALLEL_MIN_WORK:
+            with ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                initializer=_init_worker,
+                initargs=(graph.indptr, graph.indices, graph.data, graph.shape),
+            ) as pool:
+                results = list(pool.map(_run_task, tasks))
+        else:
+            results = [_run_sources(graph, *task) for task in tasks]
+        for start, b, ds, dc in results:
+            end = start + len(b)
+            betweenness[start:end] += b
+            dist_sum[start:end] += ds
+            dist_count[start:end] += dc
+        return betweenness, dist_sum, dist_count
+
+    def compute(self, adjacency: sparse.spmatrix) -> Dict[str, np.ndarray]:
+        """
+        Requested centralities, one array per measure in node order, keyed
+        "<measure>_centrality". Betweenness is normalized like networkx.
+        """
+        A = sparse.csr_matrix(adjacency, dtype=np.float64)
+        n = A.shape[0]
+        out: Dict[str, np.ndarray] = {}
+
+        if {"betweenness", "closeness"} & set(self.measures):
+            # Sort nodes by connected component so every component is a contiguous block
+            _, labels = csgraph.connected_components(A, directed=False)
+            perm = np.argsort(labels, kind="stable")
+            sizes = np.bincount(labels)
+            graph = A[perm][:, perm].tocsr()
+            betweenness, dist_sum, dist_count = self._shortest_path_pass(graph, sizes)
+
+            inverse = np.empty(n, dtype=np.int64)
+            inverse[perm] = np.arange(n)
+            comp_size = sizes[labels][perm]
+
+            if "betweenness" in self.measures:
+                scale = 1.0 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+                out["betweenness_centrality"] = (betweenness * scale)[inverse]
+
+            if "closeness" in self.measures:
+                closeness = np.zeros(n)
+                ok = dist_sum > 0
+                closeness[ok] = (comp_size[ok] - 1) * dist_count[ok] / ((n - 1) * dist_sum[ok])
+                out["closeness_centrality"] = closeness[inverse]
+
+        if "eigenvector" in self.measures:
+            out["eigenvector_centrality"] = eigenvector_centrality(A, self.max_iter, self.tol)
+        return out
@@ -0,0 +1,410 @@
+"""
+communities.py
+Connected components and community detection over the CSR address graph (graph_features).
+- UnionFind: array-based disjoint sets with vectorized batch unions (min-label hooking +
+  pointer jumping), so a whole edge list is merged in a few numpy passes and new edges
+  can be absorbed later without relabeling the graph.
+- Label propagation: weighted, semi-synchronous (a random half of the nodes adopts its
+  heaviest neighbor label each round, which avoids the oscillation of synchronous updates).
+- Louvain: parallel local moving (every node picks its best modularity gain at once,
+  damped by random subsets and reverted if modularity drops), then communities are
+  collapsed into super nodes with a sparse P^T A P product and the next level runs.
+- extend_labels: places nodes added since the last run (incremental_graph) into the
+  community of their heaviest labeled neighbor until communities are recomputed.
+Settings mirror CommunityDetectionParams (use_community_detection, algorithm, resolution,
+max_iterations); CommunityDetector.from_params reads them.
+"""
+
+import os
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+
+from agents.ai_model.src.utils import RANDOM_SEED
+
+COMMUNITY_DETECTION = os.getenv("GRAPH_COMMUNITY_DETECTION", "true").lower() == "true"
+COMMUNITY_ALGORITHM = os.getenv("GRAPH_COMMUNITY_ALGORITHM", "louvain")
+COMMUNITY_RESOLUTION = float(os.getenv("GRAPH_COMMUNITY_RESOLUTION", "1.0"))
+COMMUNITY_MAX_ITERATIONS = int(os.getenv("GRAPH_COMMUNITY_MAX_ITERATIONS", "100"))
+
+# greedy_modularity is served by Louvain, the scalable greedy modularity optimizer
+ALGORITHMS = ("louvain", "greedy_modularity", "label_propagation")
+# Louvain sweeps must improve modularity by more than this to be kept
+MODULARITY_TOL = 1e-7
+MAX_LEVELS = 32
+
+
+# -------------------------------
+# Connected components
+# -------------------------------
+
+class UnionFind:
+    """
+    Disjoint sets over node ids 0..n-1. Every root is the smallest id of its set.
+    """
+
+    def __init__(self, n: int = 0):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def extend(self, n: int) -> None:
+        """
+        Grow to n nodes; the new ones start as singletons.
+        """
+        if n > len(self.parent):
+            self.parent = np.concatenate([self.parent, np.arange(len(self.parent), n, dtype=np.int64)])
+
+    def _compress(self) -> None:
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        self.parent = parent
+
+    def roots(self) -> np.ndarray:
+        """
+        Root of every node (one label per component).
+        """
+        self._compress()
+        return self.parent
+
+    def union(self, u: np.ndarray, v: np.ndarray) -> None:
+        """
+        Merge the sets of each pair (u[i], v[i]). Each round hooks every root onto the
+        smallest root it is linked to, then compresses paths, until all pairs agree.
+        """
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        while len(u):
+            roots = self.roots()
+            ru, rv = roots[u], roots[v]
+            pending = ru != rv
+            if not pending.any():
+                break
+            u, v, ru, rv = u[pending], v[pending], ru[pending], rv[pending]
+            hooked = self.parent.copy()
+            np.minimum.at(hooked, np.maximum(ru, rv), np.minimum(ru, rv))
+            self.parent = hooked
+
+    def sizes(self) -> np.ndarray:
+        """
+        Size of each node's component.
+        """
+        roots = self.roots()
+        return np.bincount(roots, minlength=len(roots))[roots]
+
+
+def connected_components(A: sparse.spmatrix) -> np.ndarray:
+    """
+    Component root (smallest node id) of every node of an undirected graph.
+    """
+    A = sparse.coo_matrix(A)
+    uf = UnionFind(A.shape[0])
+    uf.union(A.row, A.col)
+    return uf.roots()
+
+
+# -------------------------------
+# Shared helpers
+# -------------------------------
+
+def _relabel(labels: np.ndarray) -> np.ndarray:
+    """
+    Dense ids 0..K-1, largest community first (ties by smallest member).
+    """
+    _, first, inverse, counts = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+    order = np.lexsort((first, -counts))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse]
+
+
+def _off_diagonal(A: sparse.csr_matrix) -> sparse.csr_matrix:
+    A = A.tocoo()
+    off = A.row != A.col
+    return sparse.csr_matrix((A.data[off], (A.row[off], A.col[off])), shape=A.shape)
+
+
+def _label_weights(A_off: sparse.csr_matrix, labels: np.ndarray, active: np.ndarray):
+    """
+    Total edge weight from each active node to each neighboring label, as entry arrays
+    (local row, label, weight) of A[active] @ P with P the node -> label indicator, plus
+    the weight to the node's own label per active node.
+    """
+    n = A_off.shape[0]
+    P = sparse.csr_matrix((np.ones(n), labels, np.arange(n + 1)), shape=(n, n))
+    S = A_off[active] @ P
+    local_rows = np.repeat(np.arange(len(active)), np.diff(S.indptr))
+    own = S.indices == labels[active][local_rows]
+    own_weight = np.bincount(local_rows[own], weights=S.data[own], minlength=len(active))
+    return local_rows, S.indices, S.data, own, own_weight
+
+
+def _next_active(A_off: sparse.csr_matrix, moved: np.ndarray, pending: np.ndarray) -> np.ndarray:
+    """
+    Nodes to re-score next round: the moved nodes, their neighbors and the nodes whose
+    improving move was held back (sorted, no duplicates).
+    """
+    mark = np.zeros(A_off.shape[0], dtype=bool)
+    mark[moved] = True
+    mark[A_off[moved].indices] = True
+    mark[pending] = True
+    return np.flatnonzero(mark)
+
+
+def _row_best(entry_rows: np.ndarray, labels: np.ndarray, score: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Highest-scoring label per row (the first in entry order on ties); entry_rows must be
+    sorted. Rows without entries get label -1 and score -inf.
+    """
+    best_label = np.full(n, -1, dtype=np.int64)
+    best_score = np.full(n, -np.inf)
+    if len(score) == 0:
+        return best_label, best_score
+    starts = np.flatnonzero(np.r_[True, entry_rows[1:] != entry_rows[:-1]])
+    best_score[entry_rows[starts]] = np.maximum.reduceat(score, starts)
+    top = np.flatnonzero(score == best_score[entry_rows])
+    first = top[np.r_[True, entry_rows[top][1:] != entry_rows[top][:-1]]]
+    best_label[entry_rows[first]] = labels[first]
+    return best_label, best_score
+
+
+# -------------------------------
+# Label propagation
+# -------------------------------
+
+def label_propagation(A: sparse.spmatrix, max_iterations: int = COMMUNITY_MAX_ITERATIONS,
+                      seed: int = RANDOM_SEED) -> np.ndarray:
+    """
+    Community label per node. Stops when no node has a strictly heavier neighbor label
+    than its own, or after max_iterations rounds. Only nodes next to a label change are
+    re-scored; a final full pass confirms convergence.
+    """
+    A_off = _off_diagonal(sparse.csr_matrix(A, dtype=np.float64))
+    n = A_off.shape[0]
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n)
+    active, full = np.arange(n), True
+    for _ in range(max_iterations):
+        local_rows, label, weight, _, own_weight = _label_weights(A_off, labels, active)
+        # Ties are broken at random; always taking one end of the tie floods the graph
+        jitter = 1 + 1e-9 * rng.random(len(weight))
+        best, best_score = _row_best(local_rows, label, weight * jitter, len(active))
+        better = (best >= 0) & (best_score / (1 + 1e-9) > own_weight)
+        if not better.any():
+            if full:
+                break
+            active, full = np.arange(n), True
+            continue
+        update = better & (rng.random(len(active)) < 0.5)
+        changed = active[update]
+        labels[changed] = best[update]
+        active, full = _next_active(A_off, changed, active[better]), False
+    return labels
+
+
+def extend_labels(A: sparse.spmatrix, labels: np.ndarray, components: np.ndarray,
+                  max_iterations: int = COMMUNITY_MAX_ITERATIONS) -> np.ndarray:
+    """
+    Fill in the nodes labeled -1 (added since the partition was computed): each joins
+    the community it shares the most edge weight with, repeated so chains of new nodes
+    are reached. New nodes with no labeled node in reach get one new community per
+    connected component (components: root per node).
+    """
+    A = sparse.csr_matrix(A, dtype=np.float64)
+    labels = np.array(labels, dtype=np.int64)
+    for _ in range(max_iterations):
+        pending = np.flatnonzero(labels < 0)
+        if len(pending) == 0:
+            break
+        rows = A[pending].tocoo()
+        labeled = labels[rows.col] >= 0
+        if not labeled.any():
+            break
+        S = sparse.csr_matrix(
+            (rows.data[labeled], (rows.row[labeled], labels[rows.col[labeled]])),
+            shape=(len(pending), labels.max() + 1),
+        )
+        S.sum_duplicates()
+        best, _ = _row_best(np.repeat(np.arange(len(pending)), np.diff(S.indptr)), S.indices, S.data, len(pending))
+        labels[pending[best >= 0]] = best[best >= 0]
+
+    pending = labels < 0
+    if pending.any():
+        _, group = np.unique(components[pending], return_inverse=True)
+        labels[pending] = labels.max(initial=-1) + 1 + group
+    return labels
+
+
+# -------------------------------
+# Louvain
+# -------------------------------
+
+def modularity(A: sparse.spmatrix, labels: np.ndarray, resolution: float = 1.0) -> float:
+    """
+    Newman modularity of a partition (networkx.community.modularity for undirected graphs).
+    """
+    A = sparse.coo_matrix(A)
+    degree = np.asarray(A.sum(axis=1)).ravel()
+    two_m = degree.sum()
+    if two_m == 0:
+        return 0.0
+    internal = A.data[labels[A.row] == labels[A.col]].sum()
+    tot = np.bincount(labels, weights=degree)
+    return float(internal / two_m - resolution * np.square(tot / two_m).sum())
+
+
+def _louvain_level(A: sparse.csr_matrix, resolution: float, max_iterations: int,
+                   rng: np.random.Generator) -> np.ndarray:
+    """
+    Parallel local moving on one level: community label per node of A. Only nodes next
+    to a move are re-scored; the level ends when a full pass finds no improving move.
+    """
+    n = A.shape[0]
+    degree = np.asarray(A.sum(axis=1)).ravel()
+    two_m = degree.sum()
+    A_off = _off_diagonal(A)
+
+    labels = np.arange(n)
+    tot = degree.copy()
+    size = np.ones(n, dtype=np.int64)
+    internal = A.diagonal().sum()
+    current = internal / two_m - resolution * np.square(tot / two_m).sum()
+    active, full = np.arange(n), True
+    move_share = 0.5
+    for _ in range(max_iterations):
+        local_rows, label, weight, own, own_weight = _label_weights(A_off, labels, active)
+        node_degree = degree[active][local_rows]
+        # Gain of joining each neighboring community, with the node itself taken out
+        gain = weight - resolution * node_degree * (tot[label] - np.where(own, node_degree, 0.0)) / two_m
+        d = degree[active]
+        stay = own_weight - resolution * d * (tot[labels[active]] - d) / two_m
+        best, best_gain = _row_best(local_rows, label, gain, len(active))
+        improving = (best >= 0) & (best != labels[active]) & (best_gain > stay + 1e-12 * np.abs(stay))
+        # Two singletons would swap into each other's community; only the move towards
+        # the smaller label is taken
+        safe_best = np.maximum(best, 0)
+        swap = (size[labels[active]] == 1) & (size[safe_best] == 1) & (safe_best > labels[active])
+        candidates = improving & ~swap
+        if not candidates.any():
+            if full:
+                break
+            active, full = np.arange(n), True
+            continue
+        pick = candidates & (rng.random(len(active)) < move_share)
+        if not pick.any():
+            continue
+        nodes, targets = active[pick], best[pick]
+
+        # Modularity change from the edges of the moved nodes only
+        moved = labels.copy()
+        moved[nodes] = targets
+        rows = A_off[nodes]
+        row_nodes = np.repeat(nodes, np.diff(rows.indptr))
+        change = rows.data * ((moved[row_nodes] == moved[rows.indices]).astype(np.float64)
+                              - (labels[row_nodes] == labels[rows.indices]))
+        is_moved = np.zeros(n, dtype=bool)
+        is_moved[nodes] = True
+        # Edges to unmoved nodes appear once among the moved rows, so they count twice
+        moved_internal = internal + change.sum() + change[~is_moved[rows.indices]].sum()
+        moved_tot = tot.copy()
+        np.subtract.at(moved_tot, labels[nodes], degree[nodes])
+        np.add.at(moved_tot, targets, degree[nodes])
+        moved_quality = moved_internal / two_m - resolution * np.square(moved_tot / two_m).sum()
+        if moved_quality <= current + MODULARITY_TOL:
+            # Simultaneous moves interfered; retry with fewer nodes moving at once
+            move_share /= 2
+            if move_share < 1e-3:
+                break
+            continue
+        np.subtract.at(size, labels[nodes], 1)
+        np.add.at(size, targets, 1)
+        labels, tot, internal, current = moved, moved_tot, moved_internal, moved_quality
+        move_share = min(move_share * 2, 0.5)
+        active, full = _next_active(A_off, nodes, active[candidates]), False
+    return labels
+
+
+def louvain(A: sparse.spmatrix, resolution: float = 1.0, max_iterations: int = COMMUNITY_MAX_ITERATIONS,
+            seed: int = RANDOM_SEED) -> np.ndarray:
+    """
+    Community label per node from multi-level Louvain modularity optimization.
+    """
+    A = sparse.csr_matrix(A, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    membership = np.arange(A.shape[0])
+    for _ in range(MAX_LEVELS):
+        labels = _relabel(_louvain_level(A, resolution, max_iterations, rng))
+        k = labels.max() + 1 if len(labels) else 0
+        if k == A.shape[0]:
+            break
+        membership = labels[membership]
+        P = sparse.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)), shape=(len(labels), k))
+        A = (P.T @ A @ P).tocsr()
+    return membership
+
+
+# -------------------------------
+# Engine
+# -------------------------------
+
+class CommunityDetector:
+    """
+    Community and component labels for graph_features:
+
+        detector = CommunityDetector.from_params(CommunityDetectionParams())
+        community_id, component = detector.compute(graph.adjacency)
+    """
+
+    def __init__(
+        self,
+        enabled: bool = COMMUNITY_DETECTION,
+        algorithm: str = COMMUNITY_ALGORITHM,
+        resolution: float = COMMUNITY_RESOLUTION,
+        max_iterations: int = COMMUNITY_MAX_ITERATIONS,
+        seed: int = RANDOM_SEED,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown community algorithm '{algorithm}' (expected one of {', '.join(ALGORITHMS)})")
+        self.enabled = enabled
+        self.algorithm = algorithm
+        self.resolution = float(resolution)
+        self.max_iterations = max(int(max_iterations), 1)
+        self.seed = seed
+
+    @classmethod
+    def from_params(cls, params, **kwargs) -> "CommunityDetector":
+        """
+        Build from CommunityDetectionParams (or any object with the same attributes).
+        """
+        return cls(
+            enabled=getattr(params, "use_community_detection", COMMUNITY_DETECTION),
+            algorithm=getattr(params, "algorithm", COMMUNITY_ALGORITHM),
+            resolution=getattr(params, "resolution", COMMUNITY_RESOLUTION),
+            max_iterations=getattr(params, "max_iterations", COMMUNITY_MAX_ITERATIONS),
+            **kwargs,
+        )
+
+    def communities(self, A: sparse.spmatrix) -> np.ndarray:
+        """
+        Dense community ids, largest community first.
+        """
+        if A.shape[0] == 0:
+            return np.zeros(0, dtype=np.int64)
+        if self.algorithm == "label_propagation":
+            labels = label_propagation(A, self.max_iterations, self.seed)
+        else:
+            labels = louvain(A, self.resolution, self.max_iterations, self.seed)
+        return _relabel(labels)
+
+    def compute(self, A: sparse.spmatrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (community id or None when disabled, component root) per node.
+        """
+        components = connected_components(A)
+        return (self.communities(A) if self.enabled else None), components
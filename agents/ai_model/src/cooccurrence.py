@@ -0,0 +1,145 @@
+"""
+cooccurrence.py
+Sparse address/transaction co-occurrence engine shared by feature_engineering and graph_features.
+- Encodes addresses and tx hashes as integer codes (sorted, so code order == address order).
+- Builds one binary address x tx incidence matrix A with scipy.sparse.
+- Derives unique counterparties (row nnz of A·Aᵀ), top counterparties per day
+  (masked (address, day) x tx products) and co-occurrence edges (upper triangle of A·Aᵀ).
+Products are evaluated in row chunks so memory stays bounded on large blocks.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DEFAULT_CHUNK_ROWS = 20_000
+
+
+def _binary_csr(rows: np.ndarray, cols: np.ndarray, shape) -> sparse.csr_matrix:
+    m = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=shape)
+    m.sum_duplicates()
+    m.data[:] = 1
+    return m
+
+
+class CooccurrenceIndex:
+    """
+    Address x transaction incidence matrix built once from an exploded IO frame.
+    Rows without address or tx_hash are ignored, matching the feature functions it serves.
+    """
+
+    def __init__(self, io_df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self._io = io_df.dropna(subset=["address", "tx_hash"])
+
+        addr_codes, addresses = pd.factorize(self._io["address"], sort=True)
+        tx_codes, tx_hashes = pd.factorize(self._io["tx_hash"], sort=True)
+        self.addresses = np.asarray(addresses, dtype=object)
+        self.tx_hashes = np.asarray(tx_hashes, dtype=object)
+        self._addr_codes = addr_codes
+        self._tx_codes = tx_codes
+
+        self.incidence = _binary_csr(addr_codes, tx_codes, (len(self.addresses), len(self.tx_hashes)))
+        self._incidence_t = self.incidence.T.tocsr()
+
+    @property
+    def n_addresses(self) -> int:
+        return self.incidence.shape[0]
+
+    def _chunks(self, n_rows: int):
+        for start in range(0, n_rows, self.chunk_rows):
+            yield start, min(start + self.chunk_rows, n_rows)
+
+    # -----------------------------------
+    # Per-address counterparty counts
+    # -----------------------------------
+
+    def unique_counterparties(self) -> pd.DataFrame:
+        """
+        Distinct other addresses each address shares at least one transaction with.
+        """
+        counts = np.zeros(self.n_addresses, dtype=np.int64)
+        for start, end in self._chunks(self.n_addresses):
+            co = self.incidence[start:end] @ self._incidence_t
+            # Every address co-occurs with itself on the diagonal
+            counts[start:end] = np.diff(co.indptr) - 1
+        return pd.DataFrame({"address": self.addresses, "unique_counterparties": counts})
+
+    # -----------------------------------
+    # Co-occurrence edges
+    # -----------------------------------
+
+    def edges(self) -> pd.DataFrame:
+        """
+        Undirected edges between co-appearing addresses (addr_u < addr_v).
+        weight = number of transactions in which both addresses appear.
+        """
+        us, vs, ws = [], [], []
+        for start, end in self._chunks(self.n_addresses):
+            co = (self.incidence[start:end] @ self._incidence_t).tocoo()
+            rows = co.row.astype(np.int64) + start
+            upper = co.col > rows
+            us.append(rows[upper])
+            vs.append(co.col[upper].astype(np.int64))
+            ws.append(co.data[upper].astype(np.int64))
+
+        if not us or sum(len(u) for u in us) == 0:
+            return pd.DataFrame(columns=["addr_u", "addr_v", "weight"])
+
+        u = np.concatenate(us)
+        v = np.concatenate(vs)
+        return pd.DataFrame({
+            "addr_u": self.addresses[u],
+            "addr_v": self.addresses[v],
+            "weight": np.concatenate(ws),
+        })
+
+    # -----------------------------------
+    # Top counterparties per (address, day)
+    # -----------------------------------
+
+    def top_counterparties_per_day(self, top_k: int = 3) -> pd.DataFrame:
+        """
+        For each (address, date), the top_k other addresses by number of shared transactions that day.
+        Ties are broken by address order so the output is deterministic.
+        """
+        columns = ["address", "date", "top_counterparties", "top_counterparty_count"]
+        dated = self._io["date"].notna().to_numpy()
+        if not dated.any():
+            return pd.DataFrame(columns=columns)
+
+        addr_codes = self._addr_codes[dated]
+        tx_codes = self._tx_codes[dated]
+        pairs = pd.DataFrame({"addr": addr_codes, "date": self._io["date"].to_numpy()[dated]})
+        day_codes, day_keys = pd.factorize(pd.MultiIndex.from_frame(pairs))
+        day_addr = day_keys.get_level_values(0).to_numpy()
+
+        day_incidence = _binary_csr(day_codes, tx_codes, (len(day_keys), len(self.tx_hashes)))
+
+        top_lists = np.full(len(day_keys), "", dtype=object)
+        top_counts = np.zeros(len(day_keys), dtype=np.int64)
+        for start, end in self._chunks(len(day_keys)):
+            co = (day_incidence[start:end] @ self._incidence_t).tocoo()
+            rows = co.row.astype(np.int64) + start
+            others = co.col != day_addr[rows]
+            rows, cols, counts = rows[others], co.col[others], co.data[others]
+            if len(rows) == 0:
+                continue
+
+            order = np.lexsort((cols, -counts, rows))
+            rows, cols, counts = rows[order], cols[order], counts[order]
+            first = np.r_[True, rows[1:] != rows[:-1]]
+            group_start = np.maximum.accumulate(np.where(first, np.arange(len(rows)), 0))
+            keep = (np.arange(len(rows)) - group_start) < top_k
+
+            top_counts[rows[first]] = counts[first]
+            joined = pd.Series(self.addresses[cols[keep]]).groupby(rows[keep], sort=False).agg(",".join)
+            top_lists[joined.index.to_numpy()] = joined.to_numpy()
+
+        return pd.DataFrame({
+            "address": self.addresses[day_addr],
+            "date": day_keys.get_level_values(1),
+            "top_counterparties": top_lists,
+            "top_counterparty_count": top_counts,
+        }, columns=columns)
+
@@ -5,58 +5,79 @@ Fetch live Cardano transactions via Blockfrost and build features for training.
 
 import os
 import pandas as pd
-import requests
-from datetime import datetime, timedelta
 
+from agents.ai_model.src.blockfrost_crawler import scan_wallets
 from agents.ai_model.src.features.build_global_features import make_global_features
 from agents.ai_model.src.features.build_features import make_address_features
+from agents.ai_model.src.tx_cache import get_default_cache
 from agents.ai_model.src.utils import logger, ensure_dir, MODEL_DIR, DATA_DIRS
 
 # --- Blockfrost setup ---
 BLOCKFROST_API_KEY = os.getenv("BLOCKFROST_API_KEY", "")
 BLOCKFROST_PROJECT = os.getenv("BLOCKFROST_PROJECT", "preview")  # "mainnet" or "testnet"
 BASE_URL = f"https://cardano-{BLOCKFROST_PROJECT}.blockfrost.io/api/v0"
-HEADERS = {"project_id": BLOCKFROST_API_KEY}
 
+TX_COLUMNS = ["timestamp", "address", "value", "counterparty"]
 
-def fetch_transactions_for_address(address: str, count: int = 50) -> pd.DataFrame:
+
+def _address_rows(address: str, transactions: list[dict]) -> list[dict]:
     """
-    Fetch recent transactions for a given address using Blockfrost.
-    Returns a DataFrame with timestamp, address, value, counterparty.
+    Rows in the shape expected by make_global_features / make_address_features.
     """
-    url = f"{BASE_URL}/addresses/{address}/transactions?count={count}"
-    resp = requests.get(url, headers=HEADERS)
-    resp.raise_for_status()
-    txs = resp.json()
-
     rows = []
-    for tx in txs:
-        tx_hash = tx["tx_hash"]
-        details = requests.get(f"{BASE_URL}/txs/{tx_hash}", headers=HEADERS).json()
-        timestamp = datetime.utcfromtimestamp(details["block_time"])
-        value = sum(int(out["amount"][0]["quantity"]) for out in details.get("outputs", []))
-        counterparty = details.get("inputs", [{}])[0].get("address", "unknown")
+    for tx in transactions:
+        outputs = tx.get("outputs") or []
+        inputs = tx.get("inputs") or []
         rows.append({
-            "timestamp": timestamp,
+            "timestamp": pd.Timestamp(tx["block_time"]).tz_localize(None),
             "address": address,
-            "value": value,
-            "counterparty": counterparty,
+            "value": sum(int(out["amount"][0]["quantity"]) for out in outputs if out.get("amount")),
+            "counterparty": inputs[0].get("address", "unknown") if inputs else "unknown",
         })
+    return rows
 
-    return pd.DataFrame(rows)
+
+def _scan(addresses: list[str], count: int):
+    return scan_wallets(
+        addresses,
+        max_transactions=count,
+        base_url=BASE_URL,
+        project_id=BLOCKFROST_API_KEY,
+        tx_cache=get_default_cache(),
+    )
+
+
+def fetch_transactions_for_address(address: str, count: int = 50) -> pd.DataFrame:
+    """
+    Fetch recent transactions for a given address using Blockfrost.
+    Returns a DataFrame with timestamp, address, value, counterparty.
+    """
+    transactions, _, errors = _scan([address], count)
+    if address in errors:
+        raise errors[address]
+    return pd.DataFrame(_address_rows(address, transactions), columns=TX_COLUMNS)
 
 
 def build_features_from_addresses(addresses: list[str], tx_count: int = 50) -> pd.DataFrame:
     """
     Build global + per-address features from live blockchain data.
+    All addresses are scanned in one concurrent pass; a transaction shared by several
+    addresses is fetched once, and the transaction frame is built once at the end.
     """
-    all_txs = pd.DataFrame()
-    for addr in addresses:
-        try:
-            df = fetch_transactions_for_address(addr, count=tx_count)
-            all_txs = pd.concat([all_txs, df], ignore_index=True)
-            logger.info(f"Fetched {len(df)} txs for {addr}")
-        except Exception as e:
-            logger.error(f"Failed to fetch for {addr}: {e}")
-
-    if all_txs.empty
\ No newline at end of file
+    transactions, by_address, errors = _scan(addresses, tx_count)
+    for addr, e in errors.items():
+        logger.error(f"Failed to fetch for {addr}: {e}")
+    records = {tx["tx_hash"]: tx for tx in transactions}
+
+    rows = []
+    for addr, hashes in by_address.items():
+        rows.extend(_address_rows(addr, [records[h] for h in hashes]))
+        logger.info(f"Fetched {len(hashes)} txs for {addr}")
+    all_txs = pd.DataFrame(rows, columns=TX_COLUMNS)
+
+    if all_txs.empty:
+        logger.warning("No transactions fetched for the given addresses")
+        return pd.DataFrame()
+
+    global_df = make_global_features(all_txs)
+    return make_address_features(all_txs, global_df)
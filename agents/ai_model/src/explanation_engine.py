@@ -0,0 +1,245 @@
+"""
+explanation_engine.py
+SHAP explanations for the risk model, shared by the AI agent services.
+- One TreeExplainer per model, built and warmed up once at startup.
+- Rows are explained in batches: one shap_values call for every row not already cached.
+- Results are cached in an in-process LRU keyed on the model hash plus the feature
+  vector quantized to EXPLAIN_CACHE_DIGITS significant digits, so repeat checks of the
+  same wallet cost a dict lookup.
+- Force plots are never rendered on the request path: render_force_plot writes a PNG
+  (Agg backend, no plt.show) and is meant to run as a background task.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agents.ai_model.src.inference import BASE_FEATURES
+from agents.ai_model.src.utils import MODEL_DIR, ensure_dir, logger
+
+CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "10000"))
+CACHE_DIGITS = int(os.getenv("EXPLAIN_CACHE_DIGITS", "6"))
+PLOT_DIR = os.path.join(MODEL_DIR, "shap_plots")
+
+# pyplot keeps global state; background renders take turns
+_PLOT_LOCK = threading.Lock()
+
+
+def model_hash(model) -> str:
+    """
+    Short content hash of a fitted model or shap tree ensemble (changes whenever the
+    model is retrained).
+    """
+    return hashlib.sha256(pickle.dumps(model, protocol=4)).hexdigest()[:16]
+
+
+def quantize(values: Sequence[float], digits: int = CACHE_DIGITS) -> Tuple[float, ...]:
+    """
+    Round every value to `digits` significant digits (the cache key of a feature vector).
+    """
+    return tuple(float(f"{float(v):.{digits}g}") for v in values)
+
+
+class ExplanationEngine:
+    """
+    Warm, cached SHAP explainer for a tree classifier:
+
+        engine = ExplanationEngine(rf_model)
+        explanations = engine.explain_rows(feature_dicts)
+
+    Either the fitted model or an existing TreeExplainer is required; without the model,
+    features default to BASE_FEATURES and the last class is explained.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        explainer=None,
+        feature_names: Optional[Sequence[str]] = None,
+        cache_size: int = CACHE_SIZE,
+        cache_digits: int = CACHE_DIGITS,
+    ):
+        import shap
+
+        if model is None and explainer is None:
+            raise ValueError("ExplanationEngine needs a model or a TreeExplainer")
+        self.model = model
+        self.explainer = explainer if explainer is not None else shap.TreeExplainer(model)
+        names = feature_names if feature_names is not None else getattr(model, "feature_names_in_", None)
+        self.feature_names = [str(n) for n in names] if names is not None else list(BASE_FEATURES)
+        classes = list(getattr(model, "classes_", []))
+        n_outputs = len(np.atleast_1d(self.explainer.expected_value))
+        # Explain the positive (risk) class; fall back to the last class
+        self.class_index = classes.index(1) if 1 in classes else n_outputs - 1
+        self.model_hash = model_hash(model if model is not None else self.explainer.model)
+        self.cache_size = cache_size
+        self.cache_digits = cache_digits
+        self._cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._shap_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "batches": 0}
+        self._warm_up()
+
+    @classmethod
+    def from_explainer(cls, explainer, model=None, **kwargs) -> "ExplanationEngine":
+        """
+        Wrap an existing shap.TreeExplainer (e.g. the one returned by load_models);
+        pass the model it explains to pick up its feature names and classes.
+        """
+        return cls(model, explainer=explainer, **kwargs)
+
+    def _warm_up(self) -> None:
+        # The first shap_values call pays for lazy setup; do it before any request does
+        self.explainer.shap_values(pd.DataFrame([[0.0] * len(self.feature_names)], columns=self.feature_names))
+
+    # -------------------------------
+    # SHAP output normalization
+    # -------------------------------
+
+    def _positive_class(self, values) -> np.ndarray:
+        if isinstance(values, list):
+            return np.asarray(values[self.class_index])
+        values = np.asarray(values)
+        # Newer shap versions return (rows, features, classes)
+        if values.ndim == 3:
+            return values[:, :, self.class_index]
+        return values
+
+    def _base_value(self) -> float:
+        expected = np.atleast_1d(np.asarray(self.explainer.expected_value, dtype=np.float64))
+        return float(expected[self.class_index] if len(expected) > self.class_index else expected[0])
+
+    # -------------------------------
+    # Explaining
+    # -------------------------------
+
+    def _key(self, row: np.ndarray) -> Tuple:
+        return (self.model_hash, quantize(row, self.cache_digits))
+
+    def explain_matrix(self, X: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Explanations for every row of X (columns in feature_names order), each
+        {"values": {feature: shap}, "base_value", "features": {feature: value}}.
+        Uncached rows are explained together in one shap_values call.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        keys = [self._key(row) for row in X]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(X)
+        missing: Dict[Tuple, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                    self.stats["hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing:
+            first = [idx[0] for idx in missing.values()]
+            frame = pd.DataFrame(X[first], columns=self.feature_names)
+            with self._shap_lock:
+                values = self._positive_class(self.explainer.shap_values(frame))
+            base_value = self._base_value()
+            with self._lock:
+                self.stats["misses"] += len(missing)
+                self.stats["batches"] += 1
+                for j, (key, idx) in enumerate(missing.items()):
+                    explanation = {
+                        "values": {n: float(v) for n, v in zip(self.feature_names, values[j])},
+                        "base_value": base_value,
+                        "features": {n: float(v) for n, v in zip(self.feature_names, X[idx[0]])},
+                    }
+                    self._cache[key] = explanation
+                    for i in idx:
+                        results[i] = explanation
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def explain_rows(self, rows: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Explanations for feature dicts. Raises KeyError if a row lacks a model feature.
+        """
+        X = np.asarray([[float(row[n]) for n in self.feature_names] for row in rows], dtype=np.float64)
+        return self.explain_matrix(X.reshape(len(rows), len(self.feature_names)))
+
+    def explain_frame(self, features: pd.DataFrame) -> List[Dict[str, Any]]:
+        return self.explain_matrix(features[self.feature_names].to_numpy(dtype=np.float64))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_ENGINES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def engine_for(explainer, model=None) -> ExplanationEngine:
+    """
+    The ExplanationEngine wrapping a shap.TreeExplainer, created on first use and
+    reused afterwards (an ExplanationEngine is returned as is).
+    """
+    if isinstance(explainer, ExplanationEngine):
+        return explainer
+    engine = _ENGINES.get(explainer)
+    if engine is None:
+        engine = _ENGINES[explainer] = ExplanationEngine.from_explainer(explainer, model=model)
+    return engine
+
+
+# -------------------------------
+# Summaries and plots
+# -------------------------------
+
+def top_drivers(explanation: Dict[str, Any], n: int = 5) -> List[Dict[str, Any]]:
+    """
+    Features with the largest absolute SHAP contribution, largest first.
+    """
+    ranked = sorted(explanation["values"].items(), key=lambda kv: abs(kv[1]), reverse=True)
+    return [
+        {"feature": name, "impact": abs(value), "shap_value": value,
+         "value": explanation["features"].get(name)}
+        for name, value in ranked[:n]
+    ]
+
+
+def plot_path(name: str) -> str:
+    """
+    PNG path under PLOT_DIR for a wallet address or other identifier.
+    """
+    ensure_dir(PLOT_DIR)
+    return os.path.join(PLOT_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", name)[:128] + ".png")
+
+
+def render_force_plot(explanation: Dict[str, Any], save_path: str) -> str:
+    """
+    Render a SHAP force plot to save_path. Slow (hundreds of ms): run it as a
+    background task, never on the request path.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import shap
+
+    names = list(explanation["values"])
+    with _PLOT_LOCK:
+        shap.force_plot(
+            explanation["base_value"],
+            np.array([explanation["values"][n] for n in names]),
+            pd.Series([explanation["features"][n] for n in names], index=names),
+            matplotlib=True,
+            show=False,
+        )
+        plt.savefig(save_path, bbox_inches="tight")
+        plt.close("all")
+    logger.info(f"💡 SHAP force plot saved to {save_path}")
+    return save_path
@@ -7,10 +7,12 @@ from typing import Dict, List, Any, Tuple
 import numpy as np
 import pandas as pd
 
-FEATURES_PATH = Path("agents/ai_model/data/features.csv")
-DAILY_PATH = Path("agents/ai_model/data/daily_features.csv")
-ANOMALY_RESULTS_PATH = Path("agents/ai_model/data/anomaly_results.csv")
-GRAPH_FEATURES_PATH = Path("agents/ai_model/data/graph_features.csv")
+from agents.ai_model.src import io_cache, storage
+
+FEATURES_PATH = storage.artifact_path("features")
+DAILY_PATH = storage.artifact_path("daily_features")
+ANOMALY_RESULTS_PATH = storage.artifact_path("anomaly_results")
+GRAPH_FEATURES_PATH = storage.artifact_path("graph_features")
 SHAP_DIR = Path("agents/ai_model/data/shap")
 SHAP_PER_ADDRESS_PATH = SHAP_DIR / "per_address.json"
 SHAP_SUMMARY_PATH = SHAP_DIR / "shap_summary.csv"
@@ -40,10 +42,10 @@ def _safe_int(x) -> int:
         return None
 
 def load_frames() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, List[Dict[str, Any]], pd.DataFrame]:
-    features = pd.read_csv(FEATURES_PATH)
-    daily = pd.read_csv(DAILY_PATH)
-    results = pd.read_csv(ANOMALY_RESULTS_PATH) if ANOMALY_RESULTS_PATH.exists() else features.copy()
-    graph = pd.read_csv(GRAPH_FEATURES_PATH) if GRAPH_FEATURES_PATH.exists() else pd.DataFrame(columns=["address"])
+    features = storage.read_artifact("features")
+    daily = storage.read_artifact("daily_features")
+    results = storage.read_artifact("anomaly_results") if storage.artifact_exists("anomaly_results") else features.copy()
+    graph = storage.read_artifact("graph_features") if storage.artifact_exists("graph_features") else pd.DataFrame(columns=["address"])
     shap_per_addr = []
     shap_summary = pd.DataFrame(columns=["feature", "mean_abs_shap"])
     if SHAP_PER_ADDRESS_PATH.exists():
@@ -89,6 +91,11 @@ def build_address_entry(addr_row: pd.Series, model_row: pd.Series, graph_row: pd
             "weighted_degree": _safe_float(graph_row.get("weighted_degree")),
             "clustering_coefficient": _safe_float(graph_row.get("clustering_coefficient")),
             "betweenness_centrality": _safe_float(graph_row.get("betweenness_centrality")),
+            "closeness_centrality": _safe_float(graph_row.get("closeness_centrality")),
+            "eigenvector_centrality": _safe_float(graph_row.get("eigenvector_centrality")),
+            "community_id": _safe_int(graph_row.get("community_id")),
+            "community_size": _safe_int(graph_row.get("community_size")),
+            "component_size": _safe_int(graph_row.get("component_size")),
         },
         "models": {
             "IsolationForest": _safe_int(model_row.get("IsolationForest")),
@@ -160,6 +167,8 @@ def build_overview(features: pd.DataFrame, daily: pd.DataFrame, results: pd.Data
         "graph_features_csv": str(GRAPH_FEATURES_PATH) if GRAPH_FEATURES_PATH.exists() else None,
         "anomaly_results_csv": str(ANOMALY_RESULTS_PATH) if ANOMALY_RESULTS_PATH.exists() else None,
         "shap_dir": str(SHAP_DIR),
+        # Identifies the transaction partitions the exported features were built from
+        "io_cache_key": io_cache.cache_key(),
         "generated_at": pd.Timestamp.utcnow().isoformat(),
         "version": "v1.1-full-export-explain"
     }
@@ -189,7 +198,9 @@ def build_frontend_table(features: pd.DataFrame, results: pd.DataFrame, graph: p
         "unique_counterparties", "tx_per_day", "active_days", "burstiness",
         "high_value_ratio", "counterparty_diversity", "inflow_outflow_asymmetry",
         "timing_entropy", "velocity_hours", "collateral_ratio", "smart_contract_flag",
-        "degree", "weighted_degree", "clustering_coefficient", "betweenness_centrality"
+        "degree", "weighted_degree", "clustering_coefficient", "betweenness_centrality",
+        "closeness_centrality", "eigenvector_centrality",
+        "community_id", "community_size", "component_size",
     ]
     for c in cols_order:
         if c not in merged.columns:
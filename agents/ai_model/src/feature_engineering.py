@@ -1,30 +1,35 @@
-import json
 import math
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Optional, Sequence, Tuple
+
+from agents.ai_model.src import io_cache, storage
+from agents.ai_model.src.cooccurrence import CooccurrenceIndex
+from agents.ai_model.src.features.build_features import entropy
 
 # Paths
-DATA_PATH = Path("agents/ai_model/data/transactions.json")
-FEATURES_PATH = Path("agents/ai_model/data/features.csv")
-DAILY_PATH = Path("agents/ai_model/data/daily_features.csv")
+FEATURES_PATH = storage.artifact_path("features")
+DAILY_PATH = storage.artifact_path("daily_features")
 
 # -------------------------------
 # Step 1: Load and normalize data
 # -------------------------------
 
-def load_transactions(path: Path = DATA_PATH) -> pd.DataFrame:
+def load_transactions(**filters) -> pd.DataFrame:
+    """
+    Load raw transactions from the Parquet store (see storage.read_transactions for filters).
+    block_time is already a tz-aware pandas.Timestamp.
+    """
+    return storage.read_transactions(**filters)
+
+
+def load_io(columns: Optional[list] = None) -> pd.DataFrame:
     """
-    Load raw transactions from JSON and flatten top-level fields.
-    Ensures block_time is parsed to pandas.Timestamp.
+    Load the exploded IO table through the shared IO cache (see io_cache.py).
+    Same columns as explode_io, with categorical address/direction.
     """
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    df = pd.json_normalize(data, sep="_")
-    if "block_time" in df.columns:
-        df["block_time"] = pd.to_datetime(df["block_time"], errors="coerce")
-    return df
+    return io_cache.load_io(columns)
 
 
 def explode_io(df: pd.DataFrame) -> pd.DataFrame:
@@ -98,13 +103,27 @@ def explode_io(df: pd.DataFrame) -> pd.DataFrame:
 def aggregate_volume_features(io_df: pd.DataFrame) -> pd.DataFrame:
     """
     Compute core volume features per address.
+    Direction is pivoted into masked received/sent columns once, so all
+    aggregates run in a single vectorized groupby instead of per-group lambdas.
+    The result can be passed to other feature functions via their `volume` argument.
     """
     io_df = io_df.dropna(subset=["address"])
 
-    grouped = io_df.groupby("address").agg(
+    direction = io_df["direction"].to_numpy()
+    ada = io_df["ada"].to_numpy(dtype=float)
+    pivoted = pd.DataFrame({
+        "address": io_df["address"].to_numpy(),
+        "tx_hash": io_df["tx_hash"].to_numpy(),
+        "ada": ada,
+        # Outputs are funds received by the address, inputs are funds sent
+        "received": np.where(direction == "out", ada, 0.0),
+        "sent": np.where(direction == "in", ada, 0.0),
+    })
+
+    grouped = pivoted.groupby("address", observed=True).agg(
         tx_count=("tx_hash", "nunique"),
-        total_received=("ada", lambda x: x[io_df.loc[x.index, "direction"] == "out"].sum()),
-        total_sent=("ada", lambda x: x[io_df.loc[x.index, "direction"] == "in"].sum()),
+        total_received=("received", "sum"),
+        total_sent=("sent", "sum"),
         max_tx_size=("ada", "max"),
         avg_tx_size=("ada", "mean"),
     ).reset_index()
@@ -118,25 +137,14 @@ def aggregate_volume_features(io_df: pd.DataFrame) -> pd.DataFrame:
 # Step 3: Behavioral features
 # -----------------------------------
 
-def compute_unique_counterparties(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_unique_counterparties(io_df: pd.DataFrame, cooc: Optional[CooccurrenceIndex] = None) -> pd.DataFrame:
     """
     Distinct other addresses each address interacted with across transactions.
+    Counted as row nnz of the sparse address co-occurrence matrix A·Aᵀ.
     """
-    io_df = io_df.dropna(subset=["address", "tx_hash"])
-    counterparties_map: Dict[str, set] = {}
-
-    for tx_hash, sub in io_df.groupby("tx_hash"):
-        addresses = sub["address"].dropna().unique()
-        for addr in addresses:
-            others = set(addresses) - {addr}
-            if addr not in counterparties_map:
-                counterparties_map[addr] = set()
-            counterparties_map[addr].update(others)
-
-    return pd.DataFrame(
-        [(addr, len(others)) for addr, others in counterparties_map.items()],
-        columns=["address", "unique_counterparties"]
-    )
+    if cooc is None:
+        cooc = CooccurrenceIndex(io_df)
+    return cooc.unique_counterparties()
 
 
 def compute_tx_frequency(io_df: pd.DataFrame) -> pd.DataFrame:
@@ -144,31 +152,90 @@ def compute_tx_frequency(io_df: pd.DataFrame) -> pd.DataFrame:
     Average transactions per active day.
     """
     io_df = io_df.dropna(subset=["address", "date"])
-    daily_counts = io_df.groupby(["address", "date"])["tx_hash"].nunique().reset_index(name="txs_on_day")
-    active_days = daily_counts.groupby("address")["date"].nunique().reset_index(name="active_days")
-    tx_count = io_df.groupby("address")["tx_hash"].nunique().reset_index(name="tx_count")
+    daily_counts = io_df.groupby(["address", "date"], observed=True)["tx_hash"].nunique().reset_index(name="txs_on_day")
+    active_days = daily_counts.groupby("address", observed=True)["date"].nunique().reset_index(name="active_days")
+    tx_count = io_df.groupby("address", observed=True)["tx_hash"].nunique().reset_index(name="tx_count")
     freq = tx_count.merge(active_days, on="address", how="left")
     freq["tx_per_day"] = freq["tx_count"] / freq["active_days"].replace(0, np.nan)
     return freq[["address", "tx_per_day", "active_days"]]
 
 
-def compute_burstiness(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_temporal_features(io_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Variance of inter-transaction time gaps in seconds per address.
+    Single-pass kernel for the timing features of every address:
+      - burstiness: variance of inter-transaction time gaps (seconds)
+      - timing_entropy: Shannon entropy of the 24-bin hour-of-day histogram
+      - velocity_hours: mean hours from each incoming output to the next outgoing input
+    Rows are sorted by (address, block_time) once and each address is processed as a
+    contiguous NumPy slice, with group boundaries taken from np.unique.
     """
-    io_df = io_df.dropna(subset=["address", "block_time"])
-    burstiness: List[Tuple[str, float]] = []
+    tmp = io_df.dropna(subset=["address", "block_time"])
+    columns = ["address", "burstiness", "timing_entropy", "velocity_hours"]
+    if tmp.empty:
+        return pd.DataFrame(columns=columns)
+
+    codes, addresses = pd.factorize(tmp["address"], sort=True)
+    times = tmp["block_time"].values
+    hours = tmp["block_time"].dt.hour.to_numpy()
+    direction = tmp["direction"].to_numpy()
+
+    order = np.lexsort((times, codes))
+    codes = codes[order]
+    times = times[order]
+    hours = hours[order]
+    is_incoming = direction[order] == "out"   # outputs are funds received by the address
+    is_outgoing = direction[order] == "in"    # inputs are funds spent by the address
+
+    _, starts = np.unique(codes, return_index=True)
+    ends = np.append(starts[1:], len(codes))
+
+    # Hour histograms for all addresses at once
+    counts = np.bincount(codes * 24 + hours, minlength=len(addresses) * 24).reshape(-1, 24).astype(float)
+    totals = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probs = counts / totals[:, None]
+        terms = probs * np.log2(probs)
+
+    burstiness = np.zeros(len(addresses))
+    entropy = np.zeros(len(addresses))
+    velocity = np.full(len(addresses), np.nan)
+
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        t = times[start:end]
+        if end - start > 1:
+            diffs = np.diff(t).astype("timedelta64[s]").astype(int)
+            burstiness[g] = float(np.var(diffs))
+
+        nonzero = probs[g] > 0
+        entropy[g] = float(-terms[g][nonzero].sum())
+
+        incoming = t[is_incoming[start:end]]
+        outgoing = t[is_outgoing[start:end]]
+        if len(incoming) == 0 or len(outgoing) == 0:
+            continue
+        # Next outgoing strictly after each incoming
+        nxt = np.searchsorted(outgoing, incoming, side="right")
+        matched = nxt < len(outgoing)
+        if matched.any():
+            deltas = (outgoing[nxt[matched]] - incoming[matched]).astype("timedelta64[h]").astype(float)
+            velocity[g] = float(np.mean(deltas))
+
+    return pd.DataFrame({
+        "address": addresses,
+        "burstiness": burstiness,
+        "timing_entropy": entropy,
+        "velocity_hours": velocity,
+    }, columns=columns)
 
-    for addr, sub in io_df.groupby("address"):
-        times = sub["block_time"].dropna().sort_values().values
-        if len(times) > 1:
-            diffs = np.diff(times).astype("timedelta64[s]").astype(int)
-            var = float(np.var(diffs)) if len(diffs) > 0 else 0.0
-            burstiness.append((addr, var))
-        else:
-            burstiness.append((addr, 0.0))
 
-    return pd.DataFrame(burstiness, columns=["address", "burstiness"])
+def compute_burstiness(io_df: pd.DataFrame, temporal: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Variance of inter-transaction time gaps in seconds per address.
+    Reuses a precomputed compute_temporal_features frame when provided.
+    """
+    if temporal is None:
+        temporal = compute_temporal_features(io_df)
+    return temporal[["address", "burstiness"]]
 
 
 def compute_collateral_ratio(io_df: pd.DataFrame) -> pd.DataFrame:
@@ -179,7 +246,7 @@ def compute_collateral_ratio(io_df: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(columns=["address", "collateral_ratio"])
     tmp = io_df.dropna(subset=["address"])
     # Treat truthy collateral as 1, else 0
-    coll = tmp.assign(collateral_flag=tmp["collateral"].astype(float).fillna(0.0)).groupby("address")[
+    coll = tmp.assign(collateral_flag=tmp["collateral"].astype(float).fillna(0.0)).groupby("address", observed=True)[
         "collateral_flag"
     ].mean().reset_index(name="collateral_ratio")
     return coll
@@ -190,7 +257,7 @@ def compute_smart_contract_flag(io_df: pd.DataFrame) -> pd.DataFrame:
     Flag addresses with any interaction having data_hash or reference_script_hash.
     """
     tmp = io_df.dropna(subset=["address"])
-    flags = tmp.groupby("address").apply(
+    flags = tmp.groupby("address", observed=True).apply(
         lambda sub: int(sub.get("data_hash", pd.Series([None])).notna().any()
                         or sub.get("reference_script_hash", pd.Series([None])).notna().any())
     ).reset_index(name="smart_contract_flag")
@@ -209,15 +276,15 @@ def compute_daily_aggregates(io_df: pd.DataFrame) -> pd.DataFrame:
     """
     tmp = io_df.dropna(subset=["address", "date"])
 
-    daily_received = tmp[tmp["direction"] == "out"].groupby(["address", "date"])["ada"].sum().reset_index(name="daily_received")
-    daily_sent = tmp[tmp["direction"] == "in"].groupby(["address", "date"])["ada"].sum().reset_index(name="daily_sent")
+    daily_received = tmp[tmp["direction"] == "out"].groupby(["address", "date"], observed=True)["ada"].sum().reset_index(name="daily_received")
+    daily_sent = tmp[tmp["direction"] == "in"].groupby(["address", "date"], observed=True)["ada"].sum().reset_index(name="daily_sent")
 
     daily = pd.merge(daily_received, daily_sent, on=["address", "date"], how="outer").fillna(0.0)
     daily["daily_net"] = daily["daily_received"] - daily["daily_sent"]
 
     # Largest transaction per day (consider both in and out amounts)
-    daily_max_out = tmp[tmp["direction"] == "out"].groupby(["address", "date"])["ada"].max().reset_index(name="daily_max_out")
-    daily_max_in = tmp[tmp["direction"] == "in"].groupby(["address", "date"])["ada"].max().reset_index(name="daily_max_in")
+    daily_max_out = tmp[tmp["direction"] == "out"].groupby(["address", "date"], observed=True)["ada"].max().reset_index(name="daily_max_out")
+    daily_max_in = tmp[tmp["direction"] == "in"].groupby(["address", "date"], observed=True)["ada"].max().reset_index(name="daily_max_in")
 
     daily_full = daily.merge(daily_max_out, on=["address", "date"], how="left").merge(
         daily_max_in, on=["address", "date"], how="left"
@@ -248,7 +315,7 @@ def compute_rolling_features(daily_df: pd.DataFrame, window_days: int = 7) -> pd
 
     # Rolling computations per address
     rolled = []
-    for addr, sub in base.groupby("address"):
+    for addr, sub in base.groupby("address", observed=True):
         sub = sub.sort_values("date")
         # Use rolling with window size; center=False uses trailing window
         r_avg_size = sub["daily_max_tx"].rolling(window_days).mean()
@@ -274,38 +341,38 @@ def compute_high_value_ratio(io_df: pd.DataFrame, threshold_ada: float = 100_000
     """
     tmp = io_df.dropna(subset=["address"])
     tmp["is_high_value"] = (tmp["ada"] >= threshold_ada).astype(int)
-    hv = tmp.groupby("address")["is_high_value"].mean().reset_index(name="high_value_ratio")
+    hv = tmp.groupby("address", observed=True)["is_high_value"].mean().reset_index(name="high_value_ratio")
     return hv
 
 
-def compute_counterparty_diversity(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_counterparty_diversity(
+    io_df: pd.DataFrame,
+    volume: Optional[pd.DataFrame] = None,
+    unique_cp: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """
     Counterparty diversity index = unique counterparties / tx_count.
+    Reuses precomputed `volume` and `unique_cp` frames when provided.
     """
-    unique_cp = compute_unique_counterparties(io_df)
-    tx_count = io_df.dropna(subset=["address"]).groupby("address")["tx_hash"].nunique().reset_index(name="tx_count")
+    if unique_cp is None:
+        unique_cp = compute_unique_counterparties(io_df)
+    if volume is None:
+        volume = aggregate_volume_features(io_df)
+    tx_count = volume[["address", "tx_count"]]
     div = unique_cp.merge(tx_count, on="address", how="left")
     div["counterparty_diversity"] = (div["unique_counterparties"] / div["tx_count"].replace(0, np.nan)).fillna(0.0)
     return div[["address", "counterparty_diversity"]]
 
 
-def compute_timing_irregularity(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_timing_irregularity(io_df: pd.DataFrame, temporal: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Entropy of transactions over hours of day per address.
     Higher entropy => spread across hours; lower => concentrated bursts or scheduled behavior.
+    Reuses a precomputed compute_temporal_features frame when provided.
     """
-    tmp = io_df.dropna(subset=["address", "block_time"]).copy()
-    tmp["hour"] = tmp["block_time"].dt.hour
-
-    irregularity = []
-    for addr, sub in tmp.groupby("address"):
-        counts = sub["hour"].value_counts().reindex(range(24), fill_value=0).values.astype(float)
-        p = counts / counts.sum() if counts.sum() > 0 else np.zeros_like(counts)
-        # Shannon entropy
-        entropy = float(-(p[p > 0] * np.log2(p[p > 0])).sum()) if p.sum() > 0 else 0.0
-        irregularity.append((addr, entropy))
-
-    return pd.DataFrame(irregularity, columns=["address", "timing_entropy"])
+    if temporal is None:
+        temporal = compute_temporal_features(io_df)
+    return temporal[["address", "timing_entropy"]]
 
 
 def compute_spike_days(daily_df: pd.DataFrame) -> pd.DataFrame:
@@ -313,7 +380,7 @@ def compute_spike_days(daily_df: pd.DataFrame) -> pd.DataFrame:
     Count of 'spike days' where daily_max_tx is above mean + 2*std per address.
     """
     spikes = []
-    for addr, sub in daily_df.groupby("address"):
+    for addr, sub in daily_df.groupby("address", observed=True):
         vals = sub["daily_max_tx"].fillna(0.0).values
         if len(vals) == 0:
             spikes.append((addr, 0))
@@ -326,85 +393,47 @@ def compute_spike_days(daily_df: pd.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(spikes, columns=["address", "spike_day_count"])
 
 
-def compute_inflow_outflow_asymmetry(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_inflow_outflow_asymmetry(io_df: pd.DataFrame, volume: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Asymmetry index = (total_received - total_sent) / (total_received + total_sent + eps)
     Range approx [-1, 1], where -1 heavily outflow, +1 heavily inflow.
+    Reuses a precomputed `volume` frame when provided.
     """
     eps = 1e-9
-    vol = aggregate_volume_features(io_df)
+    vol = (volume if volume is not None else aggregate_volume_features(io_df)).copy()
     denom = (vol["total_received"] + vol["total_sent"]).replace(0, eps)
     vol["inflow_outflow_asymmetry"] = (vol["total_received"] - vol["total_sent"]) / denom
     return vol[["address", "inflow_outflow_asymmetry"]]
 
 
-def compute_velocity_of_funds(io_df: pd.DataFrame) -> pd.DataFrame:
+def compute_velocity_of_funds(io_df: pd.DataFrame, temporal: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Velocity: average time (in hours) between receiving funds and next send per address.
     Method:
       - For each address, collect incoming (out direction to address) and outgoing (in direction from address) times.
       - For each incoming time, find the next outgoing time after it and compute delta.
       - Average across pairs.
+    Reuses a precomputed compute_temporal_features frame when provided.
     """
-    tmp = io_df.dropna(subset=["address", "block_time"])
-    velocities = []
+    if temporal is None:
+        temporal = compute_temporal_features(io_df)
+    return temporal[["address", "velocity_hours"]]
 
-    for addr, sub in tmp.groupby("address"):
-        # Incoming funds appear as 'out' to this address (outputs received)
-        incoming = sub[sub["direction"] == "out"]["block_time"].sort_values().values
-        outgoing = sub[sub["direction"] == "in"]["block_time"].sort_values().values
 
-        if len(incoming) == 0 or len(outgoing) == 0:
-            velocities.append((addr, np.nan))
-            continue
-
-        # Two-pointer sweep to find next outgoing after each incoming
-        j = 0
-        deltas = []
-        for inc in incoming:
-            while j < len(outgoing) and outgoing[j] <= inc:
-                j += 1
-            if j < len(outgoing):
-                delta = (outgoing[j] - inc).astype("timedelta64[h]").astype(float)
-                if delta >= 0:
-                    deltas.append(delta)
-
-        vel = float(np.mean(deltas)) if len(deltas) > 0 else np.nan
-        velocities.append((addr, vel))
-
-    return pd.DataFrame(velocities, columns=["address", "velocity_hours"])
-
-
-def compute_top_counterparties_per_day(io_df: pd.DataFrame, top_k: int = 3) -> pd.DataFrame:
+def compute_top_counterparties_per_day(
+    io_df: pd.DataFrame,
+    top_k: int = 3,
+    cooc: Optional[CooccurrenceIndex] = None,
+) -> pd.DataFrame:
     """
     For each (address, date), list top_k counterparties by frequency of co-appearance in the same transaction.
     Output columns:
       - address, date, top_counterparties (comma-separated), top_counterparty_count
+    Ties in frequency are broken by address order.
     """
-    tmp = io_df.dropna(subset=["address", "tx_hash", "date"])
-    # Build a mapping: tx_hash -> set(addresses)
-    tx_to_addresses: Dict[str, set] = {}
-    for tx_hash, sub in tmp.groupby("tx_hash"):
-        tx_to_addresses[tx_hash] = set(sub["address"].dropna().unique())
-
-    # Count counterparties per (address, date)
-    rows = []
-    for (addr, date), sub in tmp.groupby(["address", "date"]):
-        cp_counts: Dict[str, int] = {}
-        for tx in sub["tx_hash"].unique():
-            others = tx_to_addresses.get(tx, set()) - {addr}
-            for o in others:
-                cp_counts[o] = cp_counts.get(o, 0) + 1
-        if len(cp_counts) == 0:
-            rows.append((addr, date, "", 0))
-            continue
-
-        sorted_cp = sorted(cp_counts.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
-        cp_list = ",".join([a for a, c in sorted_cp])
-        cp_count = sorted_cp[0][1] if len(sorted_cp) > 0 else 0
-        rows.append((addr, date, cp_list, cp_count))
-
-    return pd.DataFrame(rows, columns=["address", "date", "top_counterparties", "top_counterparty_count"])
+    if cooc is None:
+        cooc = CooccurrenceIndex(io_df)
+    return cooc.top_counterparties_per_day(top_k=top_k)
 
 
 # -----------------------------------
@@ -416,16 +445,18 @@ def assemble_address_features(io_df: pd.DataFrame) -> pd.DataFrame:
     Merge volume and behavioral features into a single per-address table.
     """
     volume = aggregate_volume_features(io_df)
-    unique_cp = compute_unique_counterparties(io_df)
+    cooc = CooccurrenceIndex(io_df)
+    unique_cp = compute_unique_counterparties(io_df, cooc=cooc)
     freq = compute_tx_frequency(io_df)
-    burst = compute_burstiness(io_df)
+    temporal = compute_temporal_features(io_df)
+    burst = compute_burstiness(io_df, temporal=temporal)
     collat = compute_collateral_ratio(io_df)
     sc_flag = compute_smart_contract_flag(io_df)
     hv_ratio = compute_high_value_ratio(io_df, threshold_ada=100_000.0)
-    diversity = compute_counterparty_diversity(io_df)
-    asym = compute_inflow_outflow_asymmetry(io_df)
-    timing = compute_timing_irregularity(io_df)
-    velocity = compute_velocity_of_funds(io_df)
+    diversity = compute_counterparty_diversity(io_df, volume=volume, unique_cp=unique_cp)
+    asym = compute_inflow_outflow_asymmetry(io_df, volume=volume)
+    timing = compute_timing_irregularity(io_df, temporal=temporal)
+    velocity = compute_velocity_of_funds(io_df, temporal=temporal)
 
     # Merge all on address
     features = volume.merge(unique_cp, on="address", how="left") \
@@ -453,7 +484,7 @@ def assemble_address_features(io_df: pd.DataFrame) -> pd.DataFrame:
     return features
 
 
-def assemble_daily_features(io_df: pd.DataFrame) -> pd.DataFrame:
+def assemble_daily_features(io_df: pd.DataFrame, cooc: Optional[CooccurrenceIndex] = None) -> pd.DataFrame:
     """
     Produce the daily feature table:
       - daily_received, daily_sent, daily_net, daily_max_tx
@@ -462,7 +493,7 @@ def assemble_daily_features(io_df: pd.DataFrame) -> pd.DataFrame:
     """
     daily = compute_daily_aggregates(io_df)
     rolled = compute_rolling_features(daily, window_days=7)
-    top_cp = compute_top_counterparties_per_day(io_df, top_k=3)
+    top_cp = compute_top_counterparties_per_day(io_df, top_k=3, cooc=cooc)
 
     daily_full = daily.merge(rolled, on=["address", "date"], how="left") \
                       .merge(top_cp, on=["address", "date"], how="left")
@@ -477,17 +508,122 @@ def assemble_daily_features(io_df: pd.DataFrame) -> pd.DataFrame:
     return daily_full
 
 
+# -----------------------------------
+# Single-wallet features (live requests)
+# -----------------------------------
+
+WALLET_WINDOW = pd.Timedelta(hours=24)
+# Model inputs produced by _model_features (inference.BASE_FEATURES)
+MODEL_INPUTS = (
+    "tx_count_24h", "total_value_24h", "largest_value_24h", "std_value_24h",
+    "unique_counterparts_24h", "entropy_of_destinations",
+    "share_of_daily_volume", "relative_max_vs_global",
+)
+# Per-address behavioural columns produced by assemble_address_features
+ADDRESS_FEATURES = (
+    "tx_count", "total_received", "total_sent", "max_tx_size", "avg_tx_size",
+    "net_balance_change", "unique_counterparties", "tx_per_day", "active_days",
+    "burstiness", "collateral_ratio", "smart_contract_flag", "high_value_ratio",
+    "counterparty_diversity", "inflow_outflow_asymmetry", "timing_entropy", "velocity_hours",
+)
+
+
+def _model_features(io_df: pd.DataFrame, address: str) -> dict:
+    """
+    The 24h model inputs (inference.BASE_FEATURES) for `address`: the window ends at the
+    wallet's latest transaction; global context is every transaction in that window.
+    Transaction value is the total of its outputs, in lovelace.
+    """
+    own = io_df["address"] == address
+    end = io_df.loc[own, "block_time"].max()
+    window = io_df[io_df["block_time"] > end - WALLET_WINDOW]
+
+    outputs = window[window["direction"] == "out"]
+    tx_value = outputs.groupby("tx_hash")["lovelace"].sum()
+    wallet_txs = window.loc[window["address"] == address, "tx_hash"].unique()
+    values = tx_value.reindex(wallet_txs, fill_value=0)
+
+    in_wallet = window[window["tx_hash"].isin(wallet_txs)]
+    counterparts = in_wallet.loc[in_wallet["address"] != address, "address"]
+    sent_txs = window.loc[(window["address"] == address) & (window["direction"] == "in"), "tx_hash"]
+    destinations = outputs.loc[outputs["tx_hash"].isin(sent_txs) & (outputs["address"] != address), "address"]
+
+    total = float(values.sum())
+    largest = float(values.max()) if len(values) else 0.0
+    std = float(values.std()) if len(values) > 1 else 0.0
+    return {
+        "tx_count_24h": int(len(wallet_txs)),
+        "total_value_24h": total,
+        "largest_value_24h": largest,
+        "std_value_24h": std,
+        "unique_counterparts_24h": int(counterparts.nunique()),
+        "entropy_of_destinations": entropy(destinations),
+        "share_of_daily_volume": total / (float(tx_value.sum()) + 1e-9),
+        "relative_max_vs_global": largest / (float(tx_value.max()) + 1e-9) if len(tx_value) else 0.0,
+    }
+
+
+def build_wallet_features(address: str, live_data: dict) -> dict:
+    """
+    Feature vector for one wallet from a live fetch (live_pipeline.fetch_wallet_transactions
+    output): the 24h model inputs plus the per-address behavioural features of
+    assemble_address_features. A wallet without transactions gets the same keys, all
+    zero except velocity_hours (None, as for any wallet that never moved funds on).
+    """
+    transactions = [tx for tx in live_data.get("transactions", []) if tx.get("tx_hash")]
+    if transactions:
+        tx_df = pd.DataFrame(transactions)
+        tx_df["block_time"] = pd.to_datetime(tx_df["block_time"], utc=True)
+        io_df = explode_io(tx_df)
+    else:
+        io_df = pd.DataFrame(columns=["address"])
+
+    own = io_df[io_df["address"] == address]
+    if own.empty:
+        features = {name: 0 for name in (*MODEL_INPUTS, *ADDRESS_FEATURES)}
+        features["velocity_hours"] = None
+        return features
+
+    # Counterparty features need the other side of the wallet's transactions too
+    wallet_io = io_df[io_df["tx_hash"].isin(own["tx_hash"].unique())]
+    behaviour = assemble_address_features(wallet_io).set_index("address").loc[address]
+    features = _model_features(io_df, address)
+    for name, value in behaviour.items():
+        features[name] = None if pd.isna(value) else value.item() if hasattr(value, "item") else value
+    return features
+
+
+def assemble_model_inputs(io_df: pd.DataFrame, addresses: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    The 24h model inputs (see _model_features) for many addresses, e.g. to rescore a stored
+    population. IO is sorted by block_time once, so each address only scans the rows of its
+    own 24h window. Addresses without stored IO are left out.
+    """
+    io_df = io_df.dropna(subset=["block_time"]).sort_values("block_time", kind="stable")
+    ends = io_df.groupby("address", observed=True)["block_time"].max()
+    if addresses is not None:
+        ends = ends[ends.index.isin(set(addresses))]
+    times = io_df["block_time"].values
+    starts = np.searchsorted(times, (ends - WALLET_WINDOW).values, side="right")
+    stops = np.searchsorted(times, ends.values, side="right")
+    rows = [
+        {"address": address, **_model_features(io_df.iloc[lo:hi], address)}
+        for address, lo, hi in zip(ends.index, starts, stops)
+    ]
+    return pd.DataFrame(rows, columns=["address", *MODEL_INPUTS])
+
+
 # -------------------------------
 # Step 4: Save structured datasets
 # -------------------------------
 
 def save_features(features: pd.DataFrame, path: Path = FEATURES_PATH):
-    features.to_csv(path, index=False)
+    storage.write_artifact(features, path.stem, path.parent)
     print(f"✅ Features saved to {path} with {len(features)} addresses")
 
 
 def save_daily_features(daily_features: pd.DataFrame, path: Path = DAILY_PATH):
-    daily_features.to_csv(path, index=False)
+    storage.write_artifact(daily_features, path.stem, path.parent)
     print(f"✅ Daily features saved to {path} with {daily_features['address'].nunique()} addresses and {len(daily_features)} rows")
 
 
@@ -496,8 +632,7 @@ def save_daily_features(daily_features: pd.DataFrame, path: Path = DAILY_PATH):
 # -------------------------------
 
 def build_all_features() -> Tuple[pd.DataFrame, pd.DataFrame]:
-    df = load_transactions()
-    io_df = explode_io(df)
+    io_df = load_io()
     addr_features = assemble_address_features(io_df)
     daily_features = assemble_daily_features(io_df)
     save_features(addr_features)
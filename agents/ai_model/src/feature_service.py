@@ -0,0 +1,108 @@
+"""
+agents/ai_model/src/feature_service.py
+Long-lived feature-engineering worker for the backend.
+Replaces the per-request `python -c` / fetch_blockfrost.py subprocesses: pandas, the
+feature code and the Blockfrost clients are imported once at startup, so a wallet
+request only pays for its own feature computation.
+
+Run with:
+    python -m uvicorn agents.ai_model.src.feature_service:app --port 8090
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+# Add parent to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from agents.ai_model.src.feature_engineering import build_wallet_features
+from agents.ai_model.src.live_pipeline import fetch_wallet_transactions, mock_wallet_transactions, scan_wallets
+from agents.ai_model.src.utils import logger
+
+FEATURE_SERVICE_PORT = int(os.getenv("FEATURE_SERVICE_PORT", "8090"))
+MAX_SCAN_ADDRESSES = int(os.getenv("SCAN_MAX_ADDRESSES", "50"))
+
+app = FastAPI(
+    title="AUREV Guard Feature Service",
+    version="1.0.0",
+    description="Warm feature-engineering worker for live wallet requests"
+)
+
+# ===== Request Schemas =====
+class WalletFeaturesRequest(BaseModel):
+    """Live data for one wallet, as returned by /wallets/fetch"""
+    wallet_address: str
+    live_data: Dict[str, Any] = Field(default_factory=dict)
+
+class WalletFetchRequest(BaseModel):
+    wallet_address: str
+    max_transactions: int = Field(default=100, ge=1, le=1000)
+
+class WalletScanRequest(BaseModel):
+    wallet_addresses: List[str]
+    max_transactions: int = Field(default=100, ge=1, le=1000)
+
+
+@app.on_event("startup")
+def warm_up():
+    """Run the feature code once so the first real request doesn't pay for lazy imports."""
+    start = time.perf_counter()
+    build_wallet_features("warmup", mock_wallet_transactions("warmup", count=2))
+    logger.info(f"✅ Feature service warm ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+
+# ===== Endpoints =====
+
+@app.get("/health")
+def health():
+    return {"status": "ready", "service": "feature_service"}
+
+
+@app.post("/features/wallet")
+def wallet_features(req: WalletFeaturesRequest):
+    """Feature vector for one wallet (see feature_engineering.build_wallet_features)"""
+    start = time.perf_counter()
+    try:
+        features = build_wallet_features(req.wallet_address, req.live_data)
+    except Exception as e:
+        logger.error(f"Feature engineering failed for {req.wallet_address}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "wallet_address": req.wallet_address,
+        "features": features,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+@app.post("/wallets/fetch")
+def wallet_fetch(req: WalletFetchRequest):
+    """Live Blockfrost transactions for one wallet (mock data if Blockfrost is unavailable)"""
+    result = fetch_wallet_transactions(req.wallet_address, max_transactions=req.max_transactions)
+    if result.get("error"):
+        logger.warning(f"Blockfrost fetch failed ({result['error']}); using mock data")
+        result = mock_wallet_transactions(req.wallet_address)
+    return result
+
+
+@app.post("/wallets/scan")
+def wallet_scan(req: WalletScanRequest):
+    """Batch scan of many wallets with per-address features (see live_pipeline.scan_wallets)"""
+    if not req.wallet_addresses:
+        raise HTTPException(status_code=400, detail="wallet_addresses must not be empty")
+    if len(set(req.wallet_addresses)) > MAX_SCAN_ADDRESSES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCAN_ADDRESSES} addresses per scan")
+    result = scan_wallets(req.wallet_addresses, max_transactions=req.max_transactions)
+    if result.get("error"):
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=FEATURE_SERVICE_PORT)
@@ -8,6 +8,8 @@ import pandas as pd
 import requests
 from datetime import datetime, timedelta
 
+from agents.ai_model.src.tx_cache import DETAILS, get_default_cache
+
 # Load Blockfrost API key from environment
 BLOCKFROST_API_KEY = os.getenv("BLOCKFROST_API_KEY", "previewXjcueZf3rkZKHUeC0e7rnDNG6pzsX02X")
 BLOCKFROST_PROJECT = os.getenv("BLOCKFROST_PROJECT", "testnet")  # "mainnet" or "testnet"
@@ -32,12 +34,14 @@ def fetch_transactions(address: str, count: int = 100) -> list[dict]:
 # --- Helper: fetch transaction details ---
 def fetch_transaction_details(tx_hash: str) -> dict:
     """
-    Fetch details of a transaction by hash.
+    Fetch details of a transaction by hash (served from the local tx cache when known).
     """
-    url = f"{BASE_URL}/txs/{tx_hash}"
-    resp = requests.get(url, headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
+    def fetch(h: str) -> dict:
+        resp = requests.get(f"{BASE_URL}/txs/{h}", headers=HEADERS)
+        resp.raise_for_status()
+        return resp.json()
+
+    return get_default_cache().get_or_fetch(DETAILS, tx_hash, fetch)
 
 
 # --- Build global features ---
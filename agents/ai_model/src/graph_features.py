@@ -1,122 +1,131 @@
-import json
-from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Optional
 
 import numpy as np
 import pandas as pd
-import networkx as nx
 
-DATA_PATH = Path("agents/ai_model/data/transactions.json")
-IO_PATH = Path("agents/ai_model/data/io_cache.csv")
-GRAPH_FEATURES_PATH = Path("agents/ai_model/data/graph_features.csv")
+from agents.ai_model.src import io_cache, storage
+from agents.ai_model.src.address_graph import GRAPH_PATH, AddressGraph, GraphProjection
+from agents.ai_model.src.centrality import CentralityEngine
+from agents.ai_model.src.communities import CommunityDetector
+from agents.ai_model.src.cooccurrence import CooccurrenceIndex
 
-def load_transactions(path: Path = DATA_PATH) -> pd.DataFrame:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    df = pd.json_normalize(data, sep="_")
-    if "block_time" in df.columns:
-        df["block_time"] = pd.to_datetime(df["block_time"], errors="coerce")
-    return df
-
-def explode_io(df: pd.DataFrame) -> pd.DataFrame:
-    outputs = df.explode("outputs").reset_index(drop=True)
-    outputs["outputs"] = outputs["outputs"].fillna({})
-    out_df = pd.json_normalize(outputs["outputs"])
-    out_df["direction"] = "out"
-    out_df["tx_hash"] = outputs["tx_hash"]
-    out_df["block_time"] = outputs["block_time"]
-
-    inputs = df.explode("inputs").reset_index(drop=True)
-    inputs["inputs"] = inputs["inputs"].fillna({})
-    in_df = pd.json_normalize(inputs["inputs"])
-    in_df["direction"] = "in"
-    in_df["tx_hash"] = inputs["tx_hash"]
-    in_df["block_time"] = inputs["block_time"]
-
-    io_df = pd.concat([out_df, in_df], ignore_index=True)
-
-    if "amount" in io_df.columns:
-        io_df["lovelace"] = io_df["amount"].apply(
-            lambda x: int(x[0]["quantity"]) if isinstance(x, list) and x else 0
-        )
-        io_df["ada"] = io_df["lovelace"] / 1_000_000
-    else:
-        io_df["lovelace"] = 0
-        io_df["ada"] = 0.0
+GRAPH_FEATURES_PATH = storage.artifact_path("graph_features")
+# Only the columns the co-occurrence graph needs are taken from the IO cache
+IO_COLUMNS = ["address", "tx_hash", "date"]
 
-    if "address" not in io_df.columns:
-        io_df["address"] = None
-    io_df["date"] = io_df["block_time"].dt.date
+def load_transactions(**filters) -> pd.DataFrame:
+    return storage.read_transactions(**filters)
 
-    return io_df[["address", "direction", "tx_hash", "block_time", "date", "ada"]]
-
-def build_counterparty_edges(io_df: pd.DataFrame) -> pd.DataFrame:
+def build_counterparty_edges(io_df: pd.DataFrame, cooc: Optional[CooccurrenceIndex] = None) -> pd.DataFrame:
     """
     For each transaction, create undirected edges between all co-appearing addresses.
     Edge weight = frequency of co-appearance across transactions.
+    Taken from the upper triangle of the sparse co-occurrence matrix A·Aᵀ.
     """
-    tmp = io_df.dropna(subset=["address", "tx_hash"]).copy()
-    tx_groups = tmp.groupby("tx_hash")["address"].unique()
-
-    edge_counts: Dict[Tuple[str, str], int] = {}
-    for tx_hash, addresses in tx_groups.items():
-        unique_addresses = sorted(set(addresses))
-        n = len(unique_addresses)
-        for i in range(n):
-            for j in range(i + 1, n):
-                a, b = unique_addresses[i], unique_addresses[j]
-                key = (a, b)
-                edge_counts[key] = edge_counts.get(key, 0) + 1
-
-    rows = [{"addr_u": u, "addr_v": v, "weight": w} for (u, v), w in edge_counts.items()]
-    return pd.DataFrame(rows)
-
-def compute_graph_metrics(edges_df: pd.DataFrame) -> pd.DataFrame:
+    if cooc is None:
+        cooc = CooccurrenceIndex(io_df)
+    return cooc.edges()
+
+def compute_graph_metrics(
+    edges_df: pd.DataFrame,
+    centrality: Optional[CentralityEngine] = None,
+    communities: Optional[CommunityDetector] = None,
+) -> pd.DataFrame:
     """
     Compute per-address graph metrics:
       - degree
       - weighted_degree
       - clustering_coefficient
-      - betweenness_centrality (normalized)
+      - betweenness_centrality (normalized), closeness_centrality, eigenvector_centrality
+        as configured on the CentralityEngine (pivot-sampled by default)
+      - community_id, community_size (Louvain or label propagation, unless disabled on
+        the CommunityDetector) and component_size
     """
-    if edges_df.empty:
-        return pd.DataFrame(columns=["address", "degree", "weighted_degree", "clustering_coefficient", "betweenness_centrality"])
-
-    G = nx.Graph()
-    for _, row in edges_df.iterrows():
-        G.add_edge(row["addr_u"], row["addr_v"], weight=float(row["weight"]))
-
-    # Degree
-    degree = dict(G.degree())
-    # Weighted degree
-    weighted_degree = {n: float(sum(d["weight"] for _, _, d in G.edges(n, data=True))) for n in G.nodes()}
-    # Clustering coefficient
-    clustering = nx.clustering(G, weight="weight")
-    # Betweenness centrality (normalized)
-    betweenness = nx.betweenness_centrality(G, normalized=True, weight="weight")
+    return graph_metrics(AddressGraph.from_edges(edges_df), centrality, communities)
 
+def graph_metrics(
+    graph: AddressGraph,
+    centrality: Optional[CentralityEngine] = None,
+    communities: Optional[CommunityDetector] = None,
+) -> pd.DataFrame:
+    """
+    compute_graph_metrics over an already built (or memory-mapped) AddressGraph.
+    Metrics of a star / bipartite projection are computed over the whole graph, tx nodes
+    included; only the address rows are returned and sizes count addresses only.
+    """
+    if centrality is None:
+        centrality = CentralityEngine()
+    if communities is None:
+        communities = CommunityDetector()
+    centrality_columns = [f"{m}_centrality" for m in centrality.measures]
+    community_columns = ["community_id", "community_size"] if communities.enabled else []
+    if graph.n_addresses == 0:
+        return pd.DataFrame(columns=["address", "degree", "weighted_degree", "clustering_coefficient",
+                                     *centrality_columns, *community_columns, "component_size"])
+
+    A = graph.adjacency
+    scores = centrality.compute(A)
+    community, component = communities.compute(A)
+    return metrics_frame(
+        graph, graph.degree(), graph.weighted_degree(), graph.clustering(weighted=True),
+        {column: scores[column] for column in centrality_columns}, community, component,
+    )
+
+def metrics_frame(
+    graph: AddressGraph,
+    degree: np.ndarray,
+    weighted_degree: np.ndarray,
+    clustering: np.ndarray,
+    scores: Dict[str, np.ndarray],
+    community: Optional[np.ndarray],
+    component: np.ndarray,
+) -> pd.DataFrame:
+    """
+    graph_features rows of the address nodes from per-node metric arrays (also used by
+    incremental_graph). community is None when community detection is disabled.
+    """
+    n = graph.n_addresses
     df = pd.DataFrame({
-        "address": list(G.nodes()),
-        "degree": [degree.get(n, 0) for n in G.nodes()],
-        "weighted_degree": [weighted_degree.get(n, 0.0) for n in G.nodes()],
-        "clustering_coefficient": [clustering.get(n, 0.0) for n in G.nodes()],
-        "betweenness_centrality": [betweenness.get(n, 0.0) for n in G.nodes()],
+        "address": np.asarray(graph.addresses[:n]),
+        "degree": degree[:n],
+        "weighted_degree": weighted_degree[:n],
+        "clustering_coefficient": clustering[:n],
+        **{column: values[:n] for column, values in scores.items()},
     })
+    if community is not None:
+        df["community_id"] = community[:n]
+        df["community_size"] = np.bincount(community[:n])[community[:n]]
+    df["component_size"] = np.bincount(component[:n], minlength=graph.n_nodes)[component[:n]]
     return df
 
-def build_and_save_graph_features():
-    df = load_transactions()
-    io_df = explode_io(df)
-    # Optional cache of IO for debugging
-    IO_PATH.parent.mkdir(parents=True, exist_ok=True)
-    io_df.to_csv(IO_PATH, index=False)
-
-    edges_df = build_counterparty_edges(io_df)
-    graph_df = compute_graph_metrics(edges_df)
+def build_address_graph(io_df: pd.DataFrame, projection: Optional[GraphProjection] = None) -> AddressGraph:
+    """
+    Address graph of an IO frame under the configured projection (star by default: large
+    transactions go through a tx node instead of adding every address pair).
+    """
+    if projection is None:
+        projection = GraphProjection()
+    return projection.build(CooccurrenceIndex(io_df))
 
-    GRAPH_FEATURES_PATH.parent.mkdir(parents=True, exist_ok=True)
-    graph_df.to_csv(GRAPH_FEATURES_PATH, index=False)
-    print(f"✅ Graph features saved to {GRAPH_FEATURES_PATH} with {len(graph_df)} addresses and {len(edges_df)} edges")
+def build_and_save_graph_features(params=None, build_params=None, community_params=None):
+    """
+    params: optional GraphMetricsParams selecting and approximating centralities.
+    build_params: optional GraphBuildParams choosing the projection and hub-size caps.
+    community_params: optional CommunityDetectionParams (algorithm, resolution, max_iterations).
+    Full rebuild; live pulls keep the graph current with incremental_graph.update_graph_features.
+    """
+    io_df = io_cache.load_io(columns=IO_COLUMNS)
+
+    projection = GraphProjection.from_params(build_params) if build_params is not None else None
+    graph = build_address_graph(io_df, projection)
+    # CSR arrays are kept for other processes to memory-map (AddressGraph.load)
+    graph.save(GRAPH_PATH)
+    centrality = CentralityEngine.from_params(params) if params is not None else None
+    communities = CommunityDetector.from_params(community_params) if community_params is not None else None
+    graph_df = graph_metrics(graph, centrality, communities)
+
+    storage.write_artifact(graph_df, GRAPH_FEATURES_PATH.stem, GRAPH_FEATURES_PATH.parent)
+    print(f"✅ Graph features saved to {GRAPH_FEATURES_PATH} with {len(graph_df)} addresses and {graph.n_edges} edges ({graph.n_nodes - graph.n_addresses} tx nodes)")
 
 if __name__ == "__main__":
     build_and_save_graph_features()
\ No newline at end of file
@@ -0,0 +1,528 @@
+"""
+incremental_features.py
+Incremental maintenance of the per-address and daily feature tables.
+- Keeps per-address sufficient statistics in a SQLite state file: counts, sums, maxima,
+  hour-of-day histograms, active days, counterparty sets, the running mean/M2 of
+  inter-transaction gaps and the incoming times still waiting for a later send.
+- Each refresh applies only the IO rows returned by storage.append_transactions and
+  rewrites feature rows for the addresses (and address/day pairs) those rows touch.
+- Rows older than an address's last seen time cannot be folded into the running gap and
+  velocity state; that address's timing state is rebuilt from its full history instead.
+Outputs match feature_engineering.assemble_address_features / assemble_daily_features.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agents.ai_model.src import feature_engineering, io_cache, storage
+from agents.ai_model.src.cooccurrence import CooccurrenceIndex
+from agents.ai_model.src.utils import logger, ensure_dir
+
+STATE_PATH = storage.DATA_DIR / "feature_state.sqlite"
+HIGH_VALUE_THRESHOLD_ADA = 100_000.0
+ROLLING_WINDOW_DAYS = 7
+TOP_K_COUNTERPARTIES = 3
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS address_stats (
+    address TEXT PRIMARY KEY,
+    n_rows INTEGER NOT NULL DEFAULT 0,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    sum_ada REAL NOT NULL DEFAULT 0,
+    max_ada REAL,
+    received REAL NOT NULL DEFAULT 0,
+    sent REAL NOT NULL DEFAULT 0,
+    n_collateral REAL NOT NULL DEFAULT 0,
+    n_high_value INTEGER NOT NULL DEFAULT 0,
+    smart_contract INTEGER NOT NULL DEFAULT 0,
+    n_counterparties INTEGER NOT NULL DEFAULT 0,
+    active_days INTEGER NOT NULL DEFAULT 0,
+    last_seen INTEGER,
+    n_gaps INTEGER NOT NULL DEFAULT 0,
+    gap_mean REAL NOT NULL DEFAULT 0,
+    gap_m2 REAL NOT NULL DEFAULT 0,
+    vel_sum REAL NOT NULL DEFAULT 0,
+    vel_n INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hour_counts (
+    address TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (address, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counterparties (
+    address TEXT NOT NULL,
+    counterparty TEXT NOT NULL,
+    PRIMARY KEY (address, counterparty)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS active_days (
+    address TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (address, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pending_incoming (
+    address TEXT NOT NULL,
+    t INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pending_incoming_address ON pending_incoming (address);
+"""
+
+_TEMPORAL_FIELDS = ("last_seen", "n_gaps", "gap_mean", "gap_m2", "vel_sum", "vel_n")
+
+
+# -------------------------------
+# Batch preparation
+# -------------------------------
+
+def _prepare(io_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows with an address, plain object address/direction and int64 ns timestamps.
+    """
+    tmp = io_df.dropna(subset=["address"])
+    out = pd.DataFrame({
+        "address": tmp["address"].to_numpy(dtype=object),
+        "direction": tmp["direction"].to_numpy(dtype=object),
+        "tx_hash": tmp["tx_hash"].to_numpy(dtype=object),
+        "ada": tmp["ada"].to_numpy(dtype=float),
+        "date": tmp["date"].to_numpy(dtype=object),
+    })
+    bt = pd.to_datetime(tmp["block_time"], utc=True)
+    out["t"] = bt.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    out["has_time"] = bt.notna().to_numpy()
+    out["hour"] = bt.dt.hour.to_numpy()
+    out["collateral"] = (
+        tmp["collateral"].astype(float).fillna(0.0).to_numpy()
+        if "collateral" in tmp.columns else 0.0
+    )
+    sc = np.zeros(len(tmp), dtype=bool)
+    for col in ("data_hash", "reference_script_hash"):
+        if col in tmp.columns:
+            sc |= tmp[col].notna().to_numpy()
+    out["smart_contract"] = sc
+    return out
+
+
+# -------------------------------
+# Timing state
+# -------------------------------
+
+def _empty_timing() -> dict:
+    return {"last_seen": None, "n_gaps": 0, "gap_mean": 0.0, "gap_m2": 0.0,
+            "vel_sum": 0.0, "vel_n": 0, "pending": np.empty(0, dtype=np.int64)}
+
+
+def _advance_timing(state: dict, t: np.ndarray, incoming: np.ndarray, outgoing: np.ndarray) -> dict:
+    """
+    Fold time-sorted rows (all >= state['last_seen']) into the timing state.
+    Gap variance is merged with Chan's parallel update; incoming times with no
+    later outgoing time stay pending for the next batch.
+    """
+    state = dict(state)
+    seq = t if state["last_seen"] is None else np.concatenate(([state["last_seen"]], t))
+    gaps = (np.diff(seq) // NS_PER_SECOND).astype(float)
+    if len(gaps):
+        n_a, n_b = state["n_gaps"], len(gaps)
+        mean_b = float(gaps.mean())
+        m2_b = float(((gaps - mean_b) ** 2).sum())
+        delta = mean_b - state["gap_mean"]
+        n = n_a + n_b
+        state["gap_mean"] = state["gap_mean"] + delta * n_b / n
+        state["gap_m2"] = state["gap_m2"] + m2_b + delta * delta * n_a * n_b / n
+        state["n_gaps"] = n
+    state["last_seen"] = int(t[-1])
+
+    pending = np.sort(np.concatenate((state["pending"], t[incoming])))
+    sends = t[outgoing]
+    if len(pending) and len(sends):
+        # Next outgoing strictly after each incoming
+        nxt = np.searchsorted(sends, pending, side="right")
+        matched = nxt < len(sends)
+        state["vel_sum"] += float(((sends[nxt[matched]] - pending[matched]) // NS_PER_HOUR).sum())
+        state["vel_n"] += int(matched.sum())
+        pending = pending[~matched]
+    state["pending"] = pending
+    return state
+
+
+def _group_slices(rows: pd.DataFrame):
+    """
+    Yield (address, t, incoming, outgoing) per address with rows sorted by time.
+    """
+    rows = rows[rows["has_time"]]
+    codes, addresses = pd.factorize(rows["address"], sort=True)
+    t = rows["t"].to_numpy()
+    direction = rows["direction"].to_numpy()
+    order = np.lexsort((t, codes))
+    codes, t, direction = codes[order], t[order], direction[order]
+    _, starts = np.unique(codes, return_index=True)
+    ends = np.append(starts[1:], len(codes))
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        d = direction[start:end]
+        # outputs are funds received by the address, inputs are funds spent
+        yield addresses[g], t[start:end], d == "out", d == "in"
+
+
+# -------------------------------
+# State store
+# -------------------------------
+
+class IncrementalFeatureStore:
+    """
+    SQLite-backed sufficient statistics for every address seen so far.
+    """
+
+    def __init__(self, state_path: Path = STATE_PATH, data_dir: Path = storage.DATA_DIR):
+        self.state_path = Path(state_path)
+        self.data_dir = Path(data_dir)
+
+    # ---------- connection ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        ensure_dir(self.state_path.parent)
+        con = sqlite3.connect(self.state_path)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.executescript(_SCHEMA)
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS touched (address TEXT PRIMARY KEY)")
+        return con
+
+    @property
+    def initialized(self) -> bool:
+        if not self.state_path.exists():
+            return False
+        con = sqlite3.connect(self.state_path)
+        try:
+            row = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='address_stats'"
+            ).fetchone()
+        finally:
+            con.close()
+        return row is not None
+
+    @staticmethod
+    def _set_touched(con: sqlite3.Connection, addresses: Iterable[str]) -> None:
+        con.execute("DELETE FROM touched")
+        con.executemany("INSERT OR IGNORE INTO touched (address) VALUES (?)", ((a,) for a in addresses))
+
+    # ---------- order-independent statistics ----------
+
+    def _update_counts(self, con: sqlite3.Connection, rows: pd.DataFrame) -> None:
+        agg = rows.assign(
+            received=np.where(rows["direction"] == "out", rows["ada"], 0.0),
+            sent=np.where(rows["direction"] == "in", rows["ada"], 0.0),
+            high_value=(rows["ada"] >= HIGH_VALUE_THRESHOLD_ADA).astype(int),
+        ).groupby("address").agg(
+            n_rows=("ada", "size"),
+            tx_count=("tx_hash", "nunique"),
+            sum_ada=("ada", "sum"),
+            max_ada=("ada", "max"),
+            received=("received", "sum"),
+            sent=("sent", "sum"),
+            n_collateral=("collateral", "sum"),
+            n_high_value=("high_value", "sum"),
+            smart_contract=("smart_contract", "max"),
+        ).reset_index()
+
+        con.executemany(
+            """
+            INSERT INTO address_stats
+                (address, n_rows, tx_count, sum_ada, max_ada, received, sent,
+                 n_collateral, n_high_value, smart_contract)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (address) DO UPDATE SET
+                n_rows = n_rows + excluded.n_rows,
+                tx_count = tx_count + excluded.tx_count,
+                sum_ada = sum_ada + excluded.sum_ada,
+                max_ada = MAX(COALESCE(max_ada, excluded.max_ada), excluded.max_ada),
+                received = received + excluded.received,
+                sent = sent + excluded.sent,
+                n_collateral = n_collateral + excluded.n_collateral,
+                n_high_value = n_high_value + excluded.n_high_value,
+                smart_contract = MAX(smart_contract, excluded.smart_contract)
+            """,
+            (
+                (r.address, int(r.n_rows), int(r.tx_count), float(r.sum_ada), float(r.max_ada),
+                 float(r.received), float(r.sent), float(r.n_collateral), int(r.n_high_value),
+                 int(r.smart_contract))
+                for r in agg.itertuples(index=False)
+            ),
+        )
+
+    def _update_hours(self, con: sqlite3.Connection, rows: pd.DataFrame) -> None:
+        timed = rows[rows["has_time"]]
+        hist = timed.groupby(["address", "hour"]).size().reset_index(name="n")
+        con.executemany(
+            """
+            INSERT INTO hour_counts (address, hour, n) VALUES (?, ?, ?)
+            ON CONFLICT (address, hour) DO UPDATE SET n = n + excluded.n
+            """,
+            ((r.address, int(r.hour), int(r.n)) for r in hist.itertuples(index=False)),
+        )
+
+    def _update_sets(self, con: sqlite3.Connection, rows: pd.DataFrame, io_df: pd.DataFrame) -> None:
+        edges = CooccurrenceIndex(io_df).edges()
+        pairs = zip(edges["addr_u"].astype(object), edges["addr_v"].astype(object))
+        con.executemany(
+            "INSERT OR IGNORE INTO counterparties (address, counterparty) VALUES (?, ?)",
+            ((p, q) for u, v in pairs for p, q in ((u, v), (v, u))),
+        )
+
+        days = rows.loc[rows["date"].notna(), ["address", "date"]].drop_duplicates()
+        con.executemany(
+            "INSERT OR IGNORE INTO active_days (address, day) VALUES (?, ?)",
+            ((a, str(d)) for a, d in days.itertuples(index=False)),
+        )
+
+        con.execute("""
+            UPDATE address_stats SET
+                n_counterparties = (SELECT COUNT(*) FROM counterparties c WHERE c.address = address_stats.address),
+                active_days = (SELECT COUNT(*) FROM active_days d WHERE d.address = address_stats.address)
+            WHERE address IN (SELECT address FROM touched)
+        """)
+
+    # ---------- timing statistics ----------
+
+    def _load_timing(self, con: sqlite3.Connection) -> Dict[str, dict]:
+        states: Dict[str, dict] = {}
+        cur = con.execute(f"""
+            SELECT s.address, {", ".join("s." + f for f in _TEMPORAL_FIELDS)}
+            FROM address_stats s JOIN touched USING (address)
+            WHERE s.last_seen IS NOT NULL
+        """)
+        for row in cur:
+            states[row[0]] = dict(zip(_TEMPORAL_FIELDS, row[1:]), pending=[])
+        cur = con.execute(
+            "SELECT p.address, p.t FROM pending_incoming p JOIN touched USING (address)"
+        )
+        for address, t in cur:
+            states[address]["pending"].append(t)
+        for state in states.values():
+            state["pending"] = np.asarray(state["pending"], dtype=np.int64)
+        return states
+
+    def _save_timing(self, con: sqlite3.Connection, states: Dict[str, dict]) -> None:
+        con.executemany(
+            f"UPDATE address_stats SET {', '.join(f + ' = ?' for f in _TEMPORAL_FIELDS)} WHERE address = ?",
+            ((*(s[f] for f in _TEMPORAL_FIELDS), a) for a, s in states.items()),
+        )
+        con.executemany("DELETE FROM pending_incoming WHERE address = ?", ((a,) for a in states))
+        con.executemany(
+            "INSERT INTO pending_incoming (address, t) VALUES (?, ?)",
+            ((a, int(t)) for a, s in states.items() for t in s["pending"]),
+        )
+
+    def _update_timing(self, con: sqlite3.Connection, rows: pd.DataFrame, prior: Dict[str, dict]) -> None:
+        updated: Dict[str, dict] = {}
+        out_of_order: List[str] = []
+        for address, t, incoming, outgoing in _group_slices(rows):
+            state = prior.get(address, _empty_timing())
+            if state["last_seen"] is not None and t[0] < state["last_seen"]:
+                out_of_order.append(address)
+                continue
+            updated[address] = _advance_timing(state, t, incoming, outgoing)
+
+        if out_of_order:
+            # Late rows: replay the address's whole history in time order
+            logger.info(f"Rebuilding timing state for {len(out_of_order)} addresses with out-of-order rows")
+            history = _prepare(storage.read_io(
+                columns=["address", "direction", "tx_hash", "block_time", "date", "ada"],
+                addresses=out_of_order,
+            ))
+            for address, t, incoming, outgoing in _group_slices(history):
+                updated[address] = _advance_timing(_empty_timing(), t, incoming, outgoing)
+
+        self._save_timing(con, updated)
+
+    # ---------- feature rows ----------
+
+    def _feature_rows(self, con: sqlite3.Connection) -> pd.DataFrame:
+        stats = pd.read_sql_query(
+            "SELECT s.* FROM address_stats s JOIN touched USING (address) ORDER BY s.address", con
+        )
+        hours = pd.read_sql_query(
+            "SELECT h.address, h.hour, h.n FROM hour_counts h JOIN touched USING (address)", con
+        )
+        counts = np.zeros((len(stats), 24))
+        if not hours.empty:
+            row = pd.Index(stats["address"]).get_indexer(hours["address"])
+            np.add.at(counts, (row, hours["hour"].to_numpy()), hours["n"].to_numpy())
+        totals = counts.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probs = counts / totals[:, None]
+            terms = np.where(probs > 0, probs * np.log2(np.where(probs > 0, probs, 1.0)), 0.0)
+
+        n_rows = stats["n_rows"].astype(float)
+        tx_count = stats["tx_count"].astype(float)
+        received, sent = stats["received"], stats["sent"]
+        denom = (received + sent).replace(0, 1e-9)
+
+        features = pd.DataFrame({
+            "address": stats["address"],
+            "tx_count": stats["tx_count"],
+            "total_received": received,
+            "total_sent": sent,
+            "max_tx_size": stats["max_ada"],
+            "avg_tx_size": stats["sum_ada"] / n_rows,
+            "net_balance_change": received - sent,
+            "unique_counterparties": stats["n_counterparties"].astype(float),
+            "tx_per_day": (tx_count / stats["active_days"].replace(0, np.nan)).fillna(0.0),
+            "active_days": stats["active_days"].astype(float),
+            "burstiness": np.where(stats["n_gaps"] > 0, stats["gap_m2"] / stats["n_gaps"].clip(lower=1), 0.0),
+            "collateral_ratio": stats["n_collateral"] / n_rows,
+            "smart_contract_flag": stats["smart_contract"].astype(int),
+            "high_value_ratio": stats["n_high_value"] / n_rows,
+            "counterparty_diversity": (stats["n_counterparties"] / tx_count.replace(0, np.nan)).fillna(0.0),
+            "inflow_outflow_asymmetry": (received - sent) / denom,
+            "timing_entropy": -terms.sum(axis=1),
+            "velocity_hours": np.where(stats["vel_n"] > 0, stats["vel_sum"] / stats["vel_n"].clip(lower=1), np.nan),
+        })
+        return features
+
+    # ---------- public API ----------
+
+    def apply(self, io_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold new IO rows into the state and return feature rows for the touched addresses.
+        """
+        rows = _prepare(io_df)
+        if rows.empty:
+            return pd.DataFrame(columns=["address"])
+
+        con = self._connect()
+        try:
+            with con:
+                self._set_touched(con, rows["address"].unique())
+                prior = self._load_timing(con)
+                self._update_counts(con, rows)
+                self._update_hours(con, rows)
+                self._update_sets(con, rows, io_df)
+                self._update_timing(con, rows, prior)
+                return self._feature_rows(con)
+        finally:
+            con.close()
+
+    def reset(self) -> None:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.state_path}{suffix}").unlink(missing_ok=True)
+
+
+# -------------------------------
+# Daily rows for touched (address, day) pairs
+# -------------------------------
+
+def _touched_pairs(io_df: pd.DataFrame) -> pd.DataFrame:
+    tmp = io_df.dropna(subset=["address", "date"])
+    return pd.DataFrame({
+        "address": tmp["address"].to_numpy(dtype=object),
+        "date": tmp["date"].to_numpy(dtype=object),
+    }).drop_duplicates()
+
+
+def _daily_rows(io_df: pd.DataFrame, existing: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Recompute daily aggregates and top counterparties for the (address, day) pairs in io_df
+    from those days' IO partitions, then the rolling columns for the touched addresses.
+    """
+    pairs = _touched_pairs(io_df)
+    if pairs.empty:
+        return existing.iloc[0:0], []
+    days = sorted(pairs["date"].unique())
+    day_io = storage.read_io(start_date=days[0], end_date=days[-1])
+    day_io = day_io[day_io["date"].isin(set(days))]
+
+    keys = pd.MultiIndex.from_frame(pairs)
+    aggregates = feature_engineering.compute_daily_aggregates(day_io)
+    aggregates = aggregates[pd.MultiIndex.from_frame(aggregates[["address", "date"]]).isin(keys)]
+    top_cp = CooccurrenceIndex(day_io).top_counterparties_per_day(top_k=TOP_K_COUNTERPARTIES)
+
+    addresses = sorted(pairs["address"].unique())
+    agg_cols = list(aggregates.columns)
+    history = existing.loc[existing["address"].isin(addresses), [c for c in agg_cols if c in existing.columns]]
+    history = history[~pd.MultiIndex.from_frame(history[["address", "date"]]).isin(keys)]
+    daily = pd.concat([history, aggregates], ignore_index=True)
+
+    rolled = feature_engineering.compute_rolling_features(daily, window_days=ROLLING_WINDOW_DAYS)
+    daily_full = daily.merge(rolled, on=["address", "date"], how="left") \
+                      .merge(top_cp, on=["address", "date"], how="left")
+
+    # Top counterparties of untouched days are carried over from the existing table
+    carried = existing.loc[existing["address"].isin(addresses),
+                           ["address", "date", "top_counterparties", "top_counterparty_count"]]
+    daily_full = daily_full.merge(carried, on=["address", "date"], how="left", suffixes=("", "_prev"))
+    for col in ("top_counterparties", "top_counterparty_count"):
+        daily_full[col] = daily_full[col].fillna(daily_full.pop(f"{col}_prev"))
+
+    for col in ["rolling_avg_tx_size", "rolling_tx_frequency", "rolling_net"]:
+        daily_full[col] = daily_full[col].fillna(0.0)
+    daily_full["top_counterparties"] = daily_full["top_counterparties"].fillna("")
+    daily_full["top_counterparty_count"] = daily_full["top_counterparty_count"].fillna(0).astype(int)
+    return daily_full, addresses
+
+
+def _upsert(existing: pd.DataFrame, rows: pd.DataFrame, addresses: Iterable[str], sort_by: List[str]) -> pd.DataFrame:
+    keep = existing[~existing["address"].isin(set(addresses))] if not existing.empty else existing
+    frames = [f for f in (keep, rows) if not f.empty]
+    if not frames:
+        return rows
+    return pd.concat(frames, ignore_index=True).sort_values(sort_by).reset_index(drop=True)
+
+
+def _read_or_empty(name: str, data_dir: Path) -> pd.DataFrame:
+    if not storage.artifact_path(name, data_dir).exists():
+        return pd.DataFrame(columns=["address", "date"])
+    return storage.read_artifact(name, data_dir=data_dir)
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+
+def rebuild(store: Optional[IncrementalFeatureStore] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Recreate the state from the full IO history and write both feature tables.
+    Used once to bootstrap, or to recover from a lost state file.
+    """
+    store = store or IncrementalFeatureStore()
+    store.reset()
+    io_df = io_cache.load_io()
+    features = store.apply(io_df)
+    daily = feature_engineering.assemble_daily_features(io_df)
+    storage.write_artifact(features, "features", store.data_dir)
+    storage.write_artifact(daily, "daily_features", store.data_dir)
+    logger.info(f"Feature state rebuilt for {len(features)} addresses")
+    return features, daily
+
+
+def update_features(new_io: pd.DataFrame, store: Optional[IncrementalFeatureStore] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Apply the IO rows of the latest pull and upsert the touched rows into
+    features / daily_features. Returns the updated rows only.
+    The state is bootstrapped from full history on first use.
+    """
+    store = store or IncrementalFeatureStore()
+    if not store.initialized:
+        return rebuild(store)
+    if new_io is None or new_io.empty:
+        return pd.DataFrame(columns=["address"]), pd.DataFrame(columns=["address", "date"])
+
+    features = store.apply(new_io)
+    existing_features = _read_or_empty("features", store.data_dir)
+    storage.write_artifact(
+        _upsert(existing_features, features, features["address"], ["address"]), "features", store.data_dir
+    )
+
+    existing_daily = _read_or_empty("daily_features", store.data_dir)
+    daily, addresses = _daily_rows(new_io, existing_daily)
+    storage.write_artifact(
+        _upsert(existing_daily, daily, addresses, ["address", "date"]), "daily_features", store.data_dir
+    )
+
+    logger.info(f"Incremental features: {len(features)} addresses, {len(daily)} daily rows updated")
+    return features, daily
@@ -0,0 +1,447 @@
+"""
+incremental_graph.py
+Incremental maintenance of the address graph (address_graph.npz) and graph_features.
+- Next to the CSR graph, address_graph_state.npz keeps per-node metric state: degree,
+  weighted degree, unnormalized weighted triangle sums, union-find parents, community
+  ids and the centralities of the last scheduled refresh.
+- Each refresh projects only the IO rows returned by storage.append_transactions with the
+  configured GraphProjection. A transaction is always stored whole by one pull, so its
+  edges simply add to the stored weights; new addresses are inserted after the existing
+  ones and new tx nodes appended at the end.
+- Degree and weighted degree move by the new edges only. A triangle changes only if it
+  contains a changed edge, and its third node is then a common neighbor of that edge's
+  ends, so triangle sums (clustering) are updated for those nodes alone. Components are
+  merged with UnionFind; new nodes join the community of their heaviest labeled neighbor.
+- Centralities and communities are global and recomputed on a schedule: every
+  refresh_batches pulls, or once the edge count grew by refresh_growth since the last
+  refresh. Until then new nodes carry zero centralities.
+degree, weighted_degree, clustering_coefficient and component_size always equal a full
+graph_features.graph_metrics run over the same transactions.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from agents.ai_model.src import io_cache, storage
+from agents.ai_model.src.address_graph import (
+    GRAPH_PATH, AddressGraph, GraphProjection, load_npz_arrays, save_npz_arrays,
+)
+from agents.ai_model.src.centrality import CentralityEngine
+from agents.ai_model.src.communities import CommunityDetector, UnionFind, connected_components, extend_labels
+from agents.ai_model.src.cooccurrence import CooccurrenceIndex
+from agents.ai_model.src.graph_features import GRAPH_FEATURES_PATH, IO_COLUMNS, build_address_graph, metrics_frame
+from agents.ai_model.src.utils import logger
+
+GRAPH_STATE_PATH = storage.DATA_DIR / "address_graph_state.npz"
+# Centralities and communities are recomputed every this many pulls (GraphMetricsParams.refresh_batches)
+GRAPH_REFRESH_BATCHES = int(os.getenv("GRAPH_REFRESH_BATCHES", "24"))
+# ... or once the edge count grew by this fraction since the last refresh (refresh_growth)
+GRAPH_REFRESH_GROWTH = float(os.getenv("GRAPH_REFRESH_GROWTH", "0.1"))
+
+CENTRALITY_SUFFIX = "_centrality"
+
+
+class _EdgeLookup:
+    """
+    Vectorized matrix[rows[i], cols[i]] for a CSR matrix with sorted indices: entries
+    are keyed row * n + col, which the CSR order already sorts, and found by binary search.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix):
+        n = matrix.shape[1]
+        rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr))
+        self.n = n
+        self.keys = rows * n + matrix.indices
+        self.data = matrix.data
+
+    def __call__(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Weight per (row, col) pair, 0 where there is no entry.
+        """
+        if len(self.keys) == 0:
+            return np.zeros(len(rows))
+        query = rows * self.n + cols
+        pos = np.minimum(np.searchsorted(self.keys, query), len(self.keys) - 1)
+        return np.where(self.keys[pos] == query, self.data[pos], 0.0)
+
+
+def _add_triangle_change(
+    triangles: np.ndarray,
+    after: sparse.csr_matrix,
+    change: sparse.csr_matrix,
+    u: np.ndarray,
+    v: np.ndarray,
+    degree: np.ndarray,
+) -> None:
+    """
+    Add to the unnormalized triangle sums (AddressGraph.triangles x max weight) the
+    change caused by the weight added on edges (u, v). The common neighbors of each
+    edge are found by scanning its lower-degree end and looking the candidates up on
+    the other, so a hub gaining an edge to a small node is never scanned. A triangle
+    with several changed edges is found once per changed edge and each finding carries
+    an equal share of its change.
+    """
+    swap = degree[u] > degree[v]
+    u, v = np.where(swap, v, u), np.where(swap, u, v)
+    weight, changed = _EdgeLookup(after), _EdgeLookup(change)
+    rows = after[u]
+    edge = np.repeat(np.arange(len(u)), np.diff(rows.indptr))
+    w, w_uw = rows.indices.astype(np.int64), rows.data
+    w_vw = weight(v[edge], w)
+    closed = w_vw > 0
+    edge, w, w_uw, w_vw = edge[closed], w[closed], w_uw[closed], w_vw[closed]
+    if len(edge) == 0:
+        return
+
+    eu, ev = u[edge], v[edge]
+    w_uv = weight(eu, ev)
+    c_uv, c_uw, c_vw = changed(eu, ev), changed(eu, w), changed(ev, w)
+    new = np.cbrt(w_uv * w_uw * w_vw)
+    old = np.cbrt((w_uv - c_uv) * (w_uw - c_uw) * (w_vw - c_vw))
+    share = 1 + (c_uw > 0) + (c_vw > 0)
+    # Each triangle counts twice per node (both neighbor orders), as on the diagonal of M³
+    value = 2 * (new - old) / share
+    for nodes in (eu, ev, w):
+        np.add.at(triangles, nodes, value)
+
+
+# -------------------------------
+# Graph state
+# -------------------------------
+
+class GraphState:
+    """
+    AddressGraph plus the per-node metrics its graph_features rows are assembled from:
+
+        state = GraphState.from_graph(graph, centrality, communities)
+        state.absorb(projection.build(CooccurrenceIndex(new_io)))
+        state.frame()
+    """
+
+    def __init__(
+        self,
+        graph: AddressGraph,
+        degree: np.ndarray,
+        weighted_degree: np.ndarray,
+        triangles: np.ndarray,
+        components: UnionFind,
+        community: Optional[np.ndarray],
+        scores: Dict[str, np.ndarray],
+        batches_since_refresh: int = 0,
+        edges_at_refresh: Optional[int] = None,
+    ):
+        self.graph = graph
+        self.degree = degree
+        self.weighted_degree = weighted_degree
+        self.triangles = triangles
+        self.components = components
+        self.community = community
+        self.scores = scores
+        self.batches_since_refresh = int(batches_since_refresh)
+        self.edges_at_refresh = graph.n_edges if edges_at_refresh is None else int(edges_at_refresh)
+
+    @classmethod
+    def from_graph(cls, graph: AddressGraph, centrality: CentralityEngine,
+                   communities: CommunityDetector) -> "GraphState":
+        """
+        Every metric computed from scratch (bootstrap and projection changes).
+        """
+        components = UnionFind()
+        components.parent = connected_components(graph.adjacency)
+        max_weight = float(graph.weights.max()) if len(graph.weights) else 1.0
+        state = cls(
+            graph,
+            graph.degree().astype(np.int64),
+            graph.weighted_degree(),
+            graph.triangles(weighted=True) * max_weight,
+            components,
+            None,
+            {},
+        )
+        state.refresh(centrality, communities)
+        return state
+
+    @property
+    def max_weight(self) -> float:
+        return float(self.graph.weights.max()) if len(self.graph.weights) else 1.0
+
+    # ---------- metrics ----------
+
+    def clustering(self) -> np.ndarray:
+        """
+        AddressGraph.clustering(weighted=True) from the maintained triangle sums.
+        """
+        degree = self.degree.astype(np.float64)
+        pairs = degree * (degree - 1)
+        return np.divide(self.triangles / self.max_weight, pairs, out=np.zeros(len(degree)), where=pairs > 0)
+
+    def refresh(self, centrality: CentralityEngine, communities: CommunityDetector) -> None:
+        """
+        Recompute the global metrics (centralities, communities) over the current graph.
+        """
+        A = self.graph.adjacency
+        scores = centrality.compute(A)
+        self.scores = {f"{m}{CENTRALITY_SUFFIX}": scores[f"{m}{CENTRALITY_SUFFIX}"] for m in centrality.measures}
+        self.community = communities.communities(A) if communities.enabled else None
+        self.batches_since_refresh = 0
+        self.edges_at_refresh = self.graph.n_edges
+
+    def frame(self) -> pd.DataFrame:
+        return metrics_frame(
+            self.graph, self.degree, self.weighted_degree, self.clustering(),
+            self.scores, self.community, self.components.roots(),
+        )
+
+    # ---------- updates ----------
+
+    def absorb(self, delta: AddressGraph) -> int:
+        """
+        Add the edges of a graph built from new transactions only (same projection).
+        Returns the number of changed undirected edges.
+        """
+        self.batches_since_refresh += 1
+        if delta.n_edges == 0:
+            return 0
+        graph = self.graph
+        n_a, n = graph.n_addresses, graph.n_nodes
+
+        found = pd.Index(np.asarray(graph.addresses)).get_indexer(np.asarray(delta.addresses))
+        is_address = np.arange(delta.n_nodes) < delta.n_addresses
+        new_addresses = is_address & (found < 0)
+        new_txs = ~is_address & (found < 0)
+        k_a, k_t = int(new_addresses.sum()), int(new_txs.sum())
+        size = n + k_a + k_t
+
+        def shift(ids: np.ndarray) -> np.ndarray:
+            # New addresses go in front of the existing tx nodes
+            return ids + k_a * (ids >= n_a)
+
+        def splice(values: np.ndarray, fill) -> np.ndarray:
+            values = np.asarray(values)
+            return np.concatenate([
+                values[:n_a], np.full(k_a, fill, dtype=values.dtype),
+                values[n_a:], np.full(k_t, fill, dtype=values.dtype),
+            ])
+
+        node = np.empty(delta.n_nodes, dtype=np.int64)
+        node[found >= 0] = shift(found[found >= 0])
+        node[new_addresses] = n_a + np.arange(k_a)
+        node[new_txs] = n + k_a + np.arange(k_t)
+
+        indptr = np.concatenate([
+            graph.indptr[:n_a + 1], np.full(k_a, graph.indptr[n_a]),
+            graph.indptr[n_a + 1:], np.full(k_t, graph.indptr[-1]),
+        ])
+        before = sparse.csr_matrix((np.asarray(graph.weights), shift(np.asarray(graph.indices, dtype=np.int64)), indptr),
+                                   shape=(size, size))
+        d = delta.adjacency.tocoo()
+        change = sparse.csr_matrix((d.data, (node[d.row], node[d.col])), shape=(size, size))
+        after = (before + change).tocsr()
+        after.sort_indices()
+
+        upper = change.tocoo()
+        keep = upper.row < upper.col
+        u, v, added = upper.row[keep].astype(np.int64), upper.col[keep].astype(np.int64), upper.data[keep]
+        fresh = _EdgeLookup(change)(u, v) == _EdgeLookup(after)(u, v)
+
+        degree = splice(self.degree, 0)
+        np.add.at(degree, u[fresh], 1)
+        np.add.at(degree, v[fresh], 1)
+        weighted_degree = splice(self.weighted_degree, 0.0)
+        np.add.at(weighted_degree, u, added)
+        np.add.at(weighted_degree, v, added)
+        triangles = splice(self.triangles, 0.0)
+        _add_triangle_change(triangles, after, change, u, v, degree)
+
+        parent = splice(shift(self.components.roots()), -1)
+        parent[parent < 0] = np.flatnonzero(parent < 0)
+        components = UnionFind()
+        components.parent = parent
+        components.union(u, v)
+
+        labels = np.concatenate([
+            graph.addresses[:n_a], delta.addresses[new_addresses],
+            graph.addresses[n_a:], delta.addresses[new_txs],
+        ])
+        self.graph = AddressGraph.from_adjacency(labels, after, n_addresses=n_a + k_a)
+        self.degree, self.weighted_degree, self.triangles = degree, weighted_degree, triangles
+        self.components = components
+        if self.community is not None:
+            self.community = extend_labels(after, splice(self.community, -1), components.roots())
+        self.scores = {column: splice(values, 0.0) for column, values in self.scores.items()}
+        return len(u)
+
+    # ---------- persistence ----------
+
+    def save(self, graph_path: Path = GRAPH_PATH, state_path: Path = GRAPH_STATE_PATH,
+             projection: Optional[GraphProjection] = None) -> None:
+        self.graph.save(graph_path)
+        arrays = {
+            "degree": self.degree,
+            "weighted_degree": self.weighted_degree,
+            "triangles": self.triangles,
+            "components": self.components.roots(),
+            "counters": np.array([self.batches_since_refresh, self.edges_at_refresh,
+                                  self.graph.n_nodes, self.graph.n_edges], dtype=np.int64),
+            **self.scores,
+        }
+        if self.community is not None:
+            arrays["community"] = self.community
+        if projection is not None:
+            arrays["projection"] = np.array([projection.mode, projection.clique_max_addresses,
+                                             projection.max_tx_addresses], dtype=str)
+        save_npz_arrays(state_path, **arrays)
+
+    @classmethod
+    def load(cls, graph_path: Path = GRAPH_PATH, state_path: Path = GRAPH_STATE_PATH) -> "GraphState":
+        graph = AddressGraph.load(graph_path)
+        arrays = load_npz_arrays(state_path, mmap=False)
+        components = UnionFind()
+        components.parent = arrays["components"].astype(np.int64)
+        return cls(
+            graph,
+            arrays["degree"],
+            arrays["weighted_degree"],
+            arrays["triangles"],
+            components,
+            arrays.get("community"),
+            {name: values for name, values in arrays.items() if name.endswith(CENTRALITY_SUFFIX)},
+            batches_since_refresh=int(arrays["counters"][0]),
+            edges_at_refresh=int(arrays["counters"][1]),
+        )
+
+
+def _state_matches(state_path: Path, graph_path: Path, projection: GraphProjection) -> bool:
+    """
+    The state file belongs to the graph file on disk and was built with this projection.
+    """
+    if not (Path(state_path).exists() and Path(graph_path).exists()):
+        return False
+    arrays = load_npz_arrays(state_path)
+    if "projection" not in arrays:
+        return False
+    expected = [projection.mode, str(projection.clique_max_addresses), str(projection.max_tx_addresses)]
+    if list(arrays["projection"]) != expected:
+        return False
+    graph = AddressGraph.load(graph_path)
+    return [int(x) for x in arrays["counters"][2:]] == [graph.n_nodes, graph.n_edges]
+
+
+# -------------------------------
+# State store
+# -------------------------------
+
+class IncrementalGraphStore:
+    """
+    Persisted GraphState and the settings it is maintained with.
+    """
+
+    def __init__(
+        self,
+        graph_path: Path = GRAPH_PATH,
+        state_path: Path = GRAPH_STATE_PATH,
+        data_dir: Path = storage.DATA_DIR,
+        projection: Optional[GraphProjection] = None,
+        centrality: Optional[CentralityEngine] = None,
+        communities: Optional[CommunityDetector] = None,
+        refresh_batches: int = GRAPH_REFRESH_BATCHES,
+        refresh_growth: float = GRAPH_REFRESH_GROWTH,
+    ):
+        self.graph_path = Path(graph_path)
+        self.state_path = Path(state_path)
+        self.data_dir = Path(data_dir)
+        self.projection = projection or GraphProjection()
+        self.centrality = centrality or CentralityEngine()
+        self.communities = communities or CommunityDetector()
+        self.refresh_batches = max(int(refresh_batches), 1)
+        self.refresh_growth = float(refresh_growth)
+
+    @classmethod
+    def from_params(cls, params=None, build_params=None, community_params=None, **kwargs) -> "IncrementalGraphStore":
+        """
+        Build from GraphMetricsParams (centralities, refresh_batches, refresh_growth),
+        GraphBuildParams (projection) and CommunityDetectionParams; None keeps the defaults.
+        """
+        return cls(
+            projection=GraphProjection.from_params(build_params) if build_params is not None else None,
+            centrality=CentralityEngine.from_params(params) if params is not None else None,
+            communities=CommunityDetector.from_params(community_params) if community_params is not None else None,
+            refresh_batches=getattr(params, "refresh_batches", GRAPH_REFRESH_BATCHES),
+            refresh_growth=getattr(params, "refresh_growth", GRAPH_REFRESH_GROWTH),
+            **kwargs,
+        )
+
+    @property
+    def initialized(self) -> bool:
+        return _state_matches(self.state_path, self.graph_path, self.projection)
+
+    def _refresh_due(self, state: GraphState) -> bool:
+        columns = {f"{m}{CENTRALITY_SUFFIX}" for m in self.centrality.measures}
+        if set(state.scores) != columns or (state.community is not None) != self.communities.enabled:
+            return True
+        if state.batches_since_refresh >= self.refresh_batches:
+            return True
+        return state.graph.n_edges > state.edges_at_refresh * (1 + self.refresh_growth)
+
+    # ---------- public API ----------
+
+    def rebuild(self, io_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Build the graph and every metric from the given IO rows; returns graph_features.
+        """
+        state = GraphState.from_graph(build_address_graph(io_df, self.projection), self.centrality, self.communities)
+        state.save(self.graph_path, self.state_path, self.projection)
+        return state.frame()
+
+    def apply(self, io_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold the edges of new IO rows into the stored state; returns the full graph_features.
+        """
+        state = GraphState.load(self.graph_path, self.state_path)
+        changed = state.absorb(self.projection.build(CooccurrenceIndex(io_df)))
+        if self._refresh_due(state):
+            state.refresh(self.centrality, self.communities)
+            logger.info(f"Graph centralities / communities refreshed over {state.graph.n_edges} edges")
+        state.save(self.graph_path, self.state_path, self.projection)
+        logger.info(f"Incremental graph: {changed} edges changed, {state.graph.n_nodes} nodes")
+        return state.frame()
+
+    def reset(self) -> None:
+        self.state_path.unlink(missing_ok=True)
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+
+def rebuild(store: Optional[IncrementalGraphStore] = None) -> pd.DataFrame:
+    """
+    Recreate the graph state from the full IO history and write graph_features.
+    Used once to bootstrap, or when the projection settings changed.
+    """
+    store = store or IncrementalGraphStore()
+    graph_df = store.rebuild(io_cache.load_io(columns=IO_COLUMNS))
+    storage.write_artifact(graph_df, GRAPH_FEATURES_PATH.stem, store.data_dir)
+    logger.info(f"Graph state rebuilt for {len(graph_df)} addresses")
+    return graph_df
+
+
+def update_graph_features(new_io: pd.DataFrame, store: Optional[IncrementalGraphStore] = None) -> pd.DataFrame:
+    """
+    Apply the IO rows of the latest pull to the graph state and rewrite graph_features.
+    The state is bootstrapped from full history on first use.
+    """
+    store = store or IncrementalGraphStore()
+    if not store.initialized:
+        return rebuild(store)
+    if new_io is None or new_io.empty:
+        return pd.DataFrame(columns=["address"])
+
+    graph_df = store.apply(new_io)
+    storage.write_artifact(graph_df, GRAPH_FEATURES_PATH.stem, store.data_dir)
+    return graph_df
@@ -3,14 +3,13 @@ inference.py
 Inference pipeline for AUREV Guard AI agents.
 - Loads trained models (IsolationForest + RandomForestClassifier).
 - Runs anomaly detection and supervised risk prediction.
-- Generates SHAP explainability plots for transparency.
+- Explains predictions with SHAP (see explanation_engine); force plots only when saved to disk.
 """
 
 import os
 import joblib
 import pandas as pd
 import shap
-import matplotlib.pyplot as plt
 
 from agents.ai_model.src.utils import MODEL_DIR, logger
 
@@ -63,8 +62,10 @@ def predict_risk(rf_model, features: pd.DataFrame):
     Run RandomForest risk prediction.
     Returns predicted label and probability of risk.
     """
-    y_pred = int(rf_model.predict(features[BASE_FEATURES])[0])
-    y_prob = float(rf_model.predict_proba(features[BASE_FEATURES])[0][1])
+    # One forest traversal: the predicted class is the argmax of predict_proba
+    proba = rf_model.predict_proba(features[BASE_FEATURES])[0]
+    y_pred = int(rf_model.classes_[proba.argmax()])
+    y_prob = float(proba[1])
     logger.debug(f"Risk prediction: y_pred={y_pred}, y_prob={y_prob}")
     return y_pred, y_prob
 
@@ -72,34 +73,18 @@ def predict_risk(rf_model, features: pd.DataFrame):
 # --- Explainability ---
 def explain_prediction(explainer, features: pd.DataFrame, save_path: str | None = None):
     """
-    Generate SHAP force plot for prediction explanation.
-    If save_path is provided, saves the plot as an image.
+    SHAP explanation of the first row of features (risk class), as returned by
+    ExplanationEngine. explainer is a shap.TreeExplainer or an ExplanationEngine.
+    If save_path is provided, also renders the force plot there; nothing is displayed.
     """
-    shap_values = explainer.shap_values(features[BASE_FEATURES])
-
-    # Classification returns list [class0, class1]
-    if isinstance(shap_values, list):
-        shap_to_use = shap_values[1][0, :]
-        expected_val = explainer.expected_value[1]
-    else:
-        shap_to_use = shap_values[0, :]
-        expected_val = explainer.expected_value
-
-    force_plot = shap.force_plot(
-        expected_val,
-        shap_to_use,
-        features[BASE_FEATURES].iloc[0, :],
-        matplotlib=True,
-        show=False,
-    )
+    from agents.ai_model.src.explanation_engine import engine_for, render_force_plot
+
+    explanation = engine_for(explainer).explain_frame(features.iloc[:1])[0]
 
     if save_path:
-        plt.savefig(save_path, bbox_inches="tight")
-        logger.info(f"💡 SHAP force plot saved to {save_path}")
-    else:
-        plt.show()
+        render_force_plot(explanation, save_path)
 
-    return force_plot
+    return explanation
 
 
 # --- Example usage ---
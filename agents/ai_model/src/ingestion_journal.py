@@ -0,0 +1,110 @@
+"""
+ingestion_journal.py
+Checkpoint journal for block ingestion.
+- Records the contiguous range of fully ingested block heights (low/high watermarks)
+  plus any heights completed out of order outside that range.
+- A block is marked only after its transactions are in the Parquet store. Blocks are
+  written in batches (live_pipeline.BlockWriter), and the journal is rewritten atomically
+  (temp file + fsync + rename) once per batch.
+- The next run asks for the heights between the watermark and the chain tip that are not
+  yet ingested, so interrupted or hourly runs never re-download finished blocks.
+- When the tip has moved more than max_blocks past the watermark (e.g. after downtime),
+  the unreachable gap is given up: the watermark restarts inside the fetch window and
+  older out-of-order heights are dropped, so the journal stays small.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Set
+
+from agents.ai_model.src import storage
+from agents.ai_model.src.utils import logger, ensure_dir
+
+JOURNAL_PATH = storage.DATA_DIR / "ingestion_journal.json"
+
+
+class IngestionJournal:
+    def __init__(
+        self,
+        path: Path = JOURNAL_PATH,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        completed: Optional[Set[int]] = None,
+    ):
+        self.path = Path(path)
+        self.low = low
+        self.high = high
+        self.completed: Set[int] = set(completed or ())
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+
+    @classmethod
+    def load(cls, path: Path = JOURNAL_PATH) -> "IngestionJournal":
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data.get("low"), data.get("high"), set(data.get("completed", [])))
+
+    def save(self) -> None:
+        ensure_dir(self.path.parent)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"low": self.low, "high": self.high, "completed": sorted(self.completed)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    # -------------------------------
+    # Watermarks
+    # -------------------------------
+
+    def is_ingested(self, height: int) -> bool:
+        if self.low is not None and self.low <= height <= self.high:
+            return True
+        return height in self.completed
+
+    def mark_ingested(self, height: int, save: bool = True) -> None:
+        """
+        Record a fully stored block and advance the watermarks over any now-contiguous heights.
+        """
+        if self.low is None:
+            self.low = self.high = height
+        elif not self.is_ingested(height):
+            self.completed.add(height)
+        while self.high + 1 in self.completed:
+            self.high += 1
+            self.completed.discard(self.high)
+        while self.low - 1 in self.completed:
+            self.low -= 1
+            self.completed.discard(self.low)
+        if save:
+            self.save()
+
+    def _skip_below(self, floor: int) -> None:
+        """
+        Give up on heights up to floor, which are no longer in the fetch window. The
+        watermark restarts on the ingested heights above floor, if any are contiguous.
+        """
+        logger.warning(f"Ingestion gap: blocks {self.high + 1}..{floor} fell out of the fetch window and are skipped")
+        completed = sorted(h for h in self.completed if h > floor)
+        self.low = self.high = None
+        self.completed = set()
+        for height in completed:
+            self.mark_ingested(height, save=False)
+        self.save()
+
+    def missing_heights(self, tip: int, max_blocks: int) -> List[int]:
+        """
+        Heights among the latest `max_blocks` (newest first) that still need fetching.
+        With a watermark in place this is the gap between it and the tip plus any holes.
+        A watermark that fell below the window is moved into it first (see _skip_below).
+        """
+        floor = max(tip - max_blocks, 0)
+        if self.high is not None and self.high < floor:
+            self._skip_below(floor)
+        return [h for h in range(tip, floor, -1) if not self.is_ingested(h)]
@@ -0,0 +1,104 @@
+"""
+io_cache.py
+Content-addressed cache of the exploded IO table shared by every feature stage.
+- The cache key is a hash of the transaction partition files in the Parquet store,
+  so any append (which always adds new part files) invalidates it automatically.
+- The cached table is a single Feather file with dictionary-encoded (categorical)
+  address and direction columns (sorted dictionaries), read back memory-mapped.
+- Within one process the decoded frame is also kept in memory, so volume, behavioral,
+  daily and graph stages run against one load.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from agents.ai_model.src import storage
+from agents.ai_model.src.utils import logger, ensure_dir
+
+CACHE_DIR = storage.DATA_DIR / "cache"
+CACHE_PREFIX = "io-"
+CATEGORICAL_COLUMNS = ("address", "direction")
+
+# In-process copy of the most recently loaded cache entry
+_memo: dict = {"key": None, "frame": None}
+
+
+def cache_key(transactions_dir: Path = storage.TRANSACTIONS_DIR) -> str:
+    """
+    Hash of the transaction partitions (relative part-file paths and sizes).
+    Part files are immutable and uniquely named, so the listing identifies the content.
+    """
+    h = hashlib.sha256()
+    if transactions_dir.exists():
+        for path in sorted(transactions_dir.rglob("*.parquet")):
+            h.update(str(path.relative_to(transactions_dir)).encode("utf-8"))
+            h.update(str(path.stat().st_size).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{CACHE_PREFIX}{key}.feather"
+
+
+def _sorted_dictionary(column: pa.ChunkedArray) -> pa.DictionaryArray:
+    """
+    Dictionary-encode with a sorted dictionary, so category order == value order
+    (pd.factorize(sort=True) on the decoded categorical then matches plain strings).
+    """
+    values = column.combine_chunks()
+    dictionary = pc.drop_null(pc.unique(values)).sort()
+    return pa.DictionaryArray.from_arrays(pc.index_in(values, value_set=dictionary), dictionary)
+
+
+def _build(path: Path) -> None:
+    table = pa.Table.from_pandas(storage.read_io(), preserve_index=False)
+    for name in CATEGORICAL_COLUMNS:
+        idx = table.schema.get_field_index(name)
+        table = table.set_column(idx, name, _sorted_dictionary(table.column(name)))
+
+    ensure_dir(path.parent)
+    tmp = path.with_suffix(".tmp")
+    # Uncompressed so reads can be memory-mapped
+    feather.write_feather(table, tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+    # Older entries can never be hit again once the partitions changed
+    for stale in CACHE_DIR.glob(f"{CACHE_PREFIX}*.feather"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    logger.info(f"IO cache rebuilt: {path} ({table.num_rows} rows)")
+
+
+def load_io(columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Exploded IO frame for the current transaction partitions, building the cache on a miss.
+    address and direction come back as pandas categoricals.
+    """
+    key = cache_key()
+    if _memo["key"] != key:
+        path = cache_path(key)
+        if not path.exists():
+            _build(path)
+        _memo["key"] = key
+        _memo["frame"] = feather.read_table(path, memory_map=True).to_pandas()
+
+    frame = _memo["frame"]
+    return frame[columns] if columns is not None else frame
+
+
+def invalidate() -> None:
+    """
+    Drop the in-process copy and every cached file (the next load rebuilds).
+    """
+    _memo["key"] = None
+    _memo["frame"] = None
+    if CACHE_DIR.exists():
+        for path in CACHE_DIR.glob(f"{CACHE_PREFIX}*.feather"):
+            path.unlink(missing_ok=True)
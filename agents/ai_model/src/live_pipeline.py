@@ -1,17 +1,30 @@
 """
 live_pipeline.py
 Efficient batch pull of Cardano blockchain data via Blockfrost.
-- Pulls latest N blocks (default 500).
+- Pulls latest N blocks (default 500) concurrently via blockfrost_crawler,
+  skipping blocks already recorded in the ingestion journal.
 - Extracts all transactions with full details (including UTXOs).
 - Ensures at least 15 transactions per address (pads if needed).
-- Saves raw data as JSON in agents/ai_model/data/.
+- Appends raw transactions and exploded IO rows to the Parquet store (see storage.py),
+  buffering blocks and writing them off the event loop every LIVE_FLUSH_BLOCKS blocks or
+  LIVE_FLUSH_SECONDS seconds; touched day partitions are compacted at the end of a pull.
+- Updates feature rows for the touched addresses only (see incremental_features.py) and
+  folds the new co-occurrence edges into the address graph (see incremental_graph.py).
+- Batch wallet scans: many addresses fetched in one pass, per-address features returned together.
 """
 from agents.ai_model.src import feature_engineering
+from agents.ai_model.src import storage
+from agents.ai_model.src import blockfrost_crawler
+from agents.ai_model.src.ingestion_journal import IngestionJournal
+from agents.ai_model.src.tx_cache import DETAILS, UTXOS, get_default_cache
 import os
 import json
+import time
+import asyncio
+import httpx
 import requests
+import pandas as pd
 from datetime import datetime, timezone
-from pathlib import Path
 
 from agents.ai_model.src.utils import logger, ensure_dir
 
@@ -21,76 +34,65 @@ BLOCKFROST_PROJECT = os.getenv("BLOCKFROST_PROJECT", "mainnet")
 BASE_URL = f"https://cardano-{BLOCKFROST_PROJECT}.blockfrost.io/api/v0"
 HEADERS = {"project_id": BLOCKFROST_API_KEY}
 
+# Shared session so the synchronous helpers reuse keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
 # --- Output paths ---
-DATA_DIR = Path("agents/ai_model/data")
-RAW_JSON_PATH = DATA_DIR / "transactions.json"
+DATA_DIR = storage.DATA_DIR
+
+# Fetched blocks are written and checkpointed in batches of this many blocks ...
+LIVE_FLUSH_BLOCKS = int(os.getenv("LIVE_FLUSH_BLOCKS", "50"))
+# ... or once the oldest buffered block has waited this long
+LIVE_FLUSH_SECONDS = float(os.getenv("LIVE_FLUSH_SECONDS", "30"))
 
 
 def fetch_latest_block():
-    resp = requests.get(f"{BASE_URL}/blocks/latest", headers=HEADERS)
+    resp = SESSION.get(f"{BASE_URL}/blocks/latest")
     resp.raise_for_status()
     return resp.json()
 
 
 def fetch_block(block_hash: str):
-    resp = requests.get(f"{BASE_URL}/blocks/{block_hash}", headers=HEADERS)
+    resp = SESSION.get(f"{BASE_URL}/blocks/{block_hash}")
     resp.raise_for_status()
     return resp.json()
 
 
 def fetch_block_transactions(block_hash: str):
-    resp = requests.get(f"{BASE_URL}/blocks/{block_hash}/txs", headers=HEADERS)
+    resp = SESSION.get(f"{BASE_URL}/blocks/{block_hash}/txs")
     resp.raise_for_status()
     return resp.json()
 
 
-def fetch_transaction_details(tx_hash: str):
-    resp = requests.get(f"{BASE_URL}/txs/{tx_hash}", headers=HEADERS)
+def _get_json(path: str):
+    resp = SESSION.get(f"{BASE_URL}{path}")
     resp.raise_for_status()
     return resp.json()
 
 
+def fetch_transaction_details(tx_hash: str):
+    # Confirmed transactions are immutable: served from the local tx cache when known
+    return get_default_cache().get_or_fetch(DETAILS, tx_hash, lambda h: _get_json(f"/txs/{h}"))
+
+
 def fetch_transaction_utxos(tx_hash: str):
-    resp = requests.get(f"{BASE_URL}/txs/{tx_hash}/utxos", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
+    return get_default_cache().get_or_fetch(UTXOS, tx_hash, lambda h: _get_json(f"/txs/{h}/utxos"))
 
 
 def batch_pull_transactions(max_blocks: int = 500) -> list[dict]:
     """
     Pull transactions from the latest N blocks.
     Returns a list of transaction dicts.
+    Blocks and their transactions are fetched concurrently by the async crawler
+    (pooled client, Blockfrost rate limits, retries); see blockfrost_crawler.py.
     """
-    all_txs = []
-    block = fetch_latest_block()
-    current_hash = block["hash"]
-
-    for i in range(max_blocks):
-        logger.info(f"Fetching block {i+1}/{max_blocks}: {current_hash}")
-        tx_hashes = fetch_block_transactions(current_hash)
-
-        for txh in tx_hashes:
-            details = fetch_transaction_details(txh)
-            utxos = fetch_transaction_utxos(txh)
-            tx_record = {
-                "tx_hash": txh,
-                "block_time": datetime.fromtimestamp(details["block_time"], timezone.utc).isoformat(),
-                "block_height": details.get("block_height"),
-                "inputs": utxos.get("inputs", []),
-                "outputs": utxos.get("outputs", []),
-                "fees": details.get("fees"),
-                "size": details.get("size"),
-            }
-            all_txs.append(tx_record)
-
-        # move to previous block correctly
-        block = fetch_block(current_hash)
-        current_hash = block.get("previous_block")
-        if not current_hash:
-            break
-
-    logger.info(f"Total collected transactions: {len(all_txs)}")
-    return all_txs
+    return blockfrost_crawler.crawl_latest_blocks(
+        max_blocks=max_blocks,
+        base_url=BASE_URL,
+        project_id=BLOCKFROST_API_KEY,
+        tx_cache=get_default_cache(),
+    )
 
 
 def ensure_minimum_per_address(transactions: list[dict], min_count: int = 15) -> list[dict]:
@@ -125,193 +127,109 @@ def ensure_minimum_per_address(transactions: list[dict], min_count: int = 15) ->
     return padded
 
 
-def save_transactions_json(transactions: list[dict]):
+def save_transactions(transactions: list[dict], index: storage.TxHashIndex | None = None):
+    """
+    Append fetched transactions to the Parquet store.
+    Already-stored tx hashes are skipped; only new partitions are written.
+    """
     ensure_dir(DATA_DIR)
-    if RAW_JSON_PATH.exists():
-        with open(RAW_JSON_PATH, "r", encoding="utf-8") as f:
-            existing = json.load(f)
-    else:
-        existing = []
-
-    seen = {tx.get("tx_hash") for tx in existing if tx.get("tx_hash")}
-    new = []
-    for tx in transactions:
-        h = tx.get("tx_hash")
-        if h and h in seen:
-            continue
-        if h:
-            seen.add(h)
-        new.append(tx)
-
-    combined = existing + new
-    with open(RAW_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(combined, f, indent=2)
-
-    logger.info(f"Collected {len(new)} new transactions (including padded)")
-    logger.info(f"✅ Saved {len(combined)} total transactions to {RAW_JSON_PATH}")
-
-
-def build_live_data(max_blocks: int = 500):
-    txs = batch_pull_transactions(max_blocks=max_blocks)
-"""
-live_pipeline.py
-Efficient batch pull of Cardano blockchain data via Blockfrost.
-- Pulls latest N blocks (default 500).
-- Extracts all transactions with full details (including UTXOs).
-- Ensures at least 15 transactions per address (pads if needed).
-- Saves raw data as JSON in agents/ai_model/data/.
-"""
-from agents.ai_model.src import feature_engineering
-import os
-import json
-import requests
-from datetime import datetime, timezone
-from pathlib import Path
-
-from agents.ai_model.src.utils import logger, ensure_dir
-
-# --- Blockfrost setup ---
-BLOCKFROST_API_KEY = os.getenv("BLOCKFROST_API_KEY", "")
-BLOCKFROST_PROJECT = os.getenv("BLOCKFROST_PROJECT", "mainnet")
-BASE_URL = f"https://cardano-{BLOCKFROST_PROJECT}.blockfrost.io/api/v0"
-HEADERS = {"project_id": BLOCKFROST_API_KEY}
-
-# --- Output paths ---
-DATA_DIR = Path("agents/ai_model/data")
-RAW_JSON_PATH = DATA_DIR / "transactions.json"
-
-
-def fetch_latest_block():
-    resp = requests.get(f"{BASE_URL}/blocks/latest", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def fetch_block(block_hash: str):
-    resp = requests.get(f"{BASE_URL}/blocks/{block_hash}", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def fetch_block_transactions(block_hash: str):
-    resp = requests.get(f"{BASE_URL}/blocks/{block_hash}/txs", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def fetch_transaction_details(tx_hash: str):
-    resp = requests.get(f"{BASE_URL}/txs/{tx_hash}", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def fetch_transaction_utxos(tx_hash: str):
-    resp = requests.get(f"{BASE_URL}/txs/{tx_hash}/utxos", headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json()
+    return storage.append_transactions(transactions, index=index)
 
 
-def batch_pull_transactions(max_blocks: int = 500) -> list[dict]:
+class BlockWriter:
     """
-    Pull transactions from the latest N blocks.
-    Returns a list of transaction dicts.
+    Buffers fetched blocks and writes them to the store in batches. A batch is one
+    append (two part files per touched day) plus one journal rewrite, run in a worker
+    thread so the crawler's in-flight requests are not stalled. Blocks are marked in
+    the journal only after their batch is stored.
     """
-    all_txs = []
-    block = fetch_latest_block()
-    current_hash = block["hash"]
-
-    for i in range(max_blocks):
-        logger.info(f"Fetching block {i+1}/{max_blocks}: {current_hash}")
-        tx_hashes = fetch_block_transactions(current_hash)
-
-        for txh in tx_hashes:
-            details = fetch_transaction_details(txh)
-            utxos = fetch_transaction_utxos(txh)
-            tx_record = {
-                "tx_hash": txh,
-                "block_time": datetime.fromtimestamp(details["block_time"], timezone.utc).isoformat(),
-                "block_height": details.get("block_height"),
-                "inputs": utxos.get("inputs", []),
-                "outputs": utxos.get("outputs", []),
-                "fees": details.get("fees"),
-                "size": details.get("size"),
-            }
-            all_txs.append(tx_record)
 
-        # move to previous block correctly
-        block = fetch_block(current_hash)
-        current_hash = block.get("previous_block")
-        if not current_hash:
-            break
-
-    logger.info(f"Total collected transactions: {len(all_txs)}")
-    return all_txs
-
-
-def ensure_minimum_per_address(transactions: list[dict], min_count: int = 15) -> list[dict]:
+    def __init__(self, journal: IngestionJournal, flush_blocks: int = LIVE_FLUSH_BLOCKS,
+                 flush_seconds: float = LIVE_FLUSH_SECONDS):
+        self.journal = journal
+        self.flush_blocks = max(int(flush_blocks), 1)
+        self.flush_seconds = flush_seconds
+        self.index = storage.TxHashIndex()
+        self.new_io_frames: list[pd.DataFrame] = []
+        self._pending: list[tuple[int, list[dict]]] = []
+        self._since = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _write(self, blocks: list[tuple[int, list[dict]]]) -> None:
+        txs = [tx for _, block in blocks for tx in block]
+        if txs:
+            self.new_io_frames.append(save_transactions(txs, self.index))
+        for height, _ in blocks:
+            self.journal.mark_ingested(height, save=False)
+        self.journal.save()
+
+    def flush(self) -> None:
+        """
+        Write whatever is still buffered (synchronously, after the crawl, also when it failed).
+        """
+        blocks, self._pending = self._pending, []
+        if blocks:
+            self._write(blocks)
+
+    async def on_block(self, height: int, txs: list[dict]) -> None:
+        self._pending.append((height, txs))
+        due = len(self._pending) >= self.flush_blocks or time.monotonic() - self._since >= self.flush_seconds
+        if not due or self._lock.locked():
+            return
+        async with self._lock:
+            blocks, self._pending = self._pending, []
+            self._since = time.monotonic()
+            await asyncio.to_thread(self._write, blocks)
+
+    @property
+    def days(self) -> set:
+        return set(self.index.days)
+
+
+def build_live_data(max_blocks: int = 500, incremental_features: bool = True):
     """
-    Ensure at least min_count transactions per address.
-    If fewer, duplicate or pad with empty entries.
+    Fetch the blocks between the ingestion watermark and the chain tip (at most max_blocks).
+    Blocks are stored and checkpointed in batches as they arrive (see BlockWriter), so an
+    interrupted run resumes close to where it stopped instead of starting over from /blocks/latest.
     """
-    addr_map = {}
-    for tx in transactions:
-        for inp in tx.get("inputs", []):
-            addr = inp.get("address")
-            if addr:
-                addr_map.setdefault(addr, []).append(tx)
-        for out in tx.get("outputs", []):
-            addr = out.get("address")
-            if addr:
-                addr_map.setdefault(addr, []).append(tx)
-
-    # If no addresses found at all, add a dummy one for demo purposes
-    if not addr_map:
-        logger.warning("No addresses found in fetched blocks, adding dummy address for demo")
-        addr_map["demo_address"] = []
+    journal = IngestionJournal.load()
+    writer = BlockWriter(journal)
 
-    padded = []
-    for addr, txs in addr_map.items():
-        if len(txs) < min_count:
-            logger.info(f"Address {addr} has only {len(txs)} txs, padding to {min_count}")
-            while len(txs) < min_count:
-                txs.append({"tx_hash": None, "address": addr, "padded": True})
-        padded.extend(txs)
-
-    return padded
-
-
-def save_transactions_json(transactions: list[dict]):
-    ensure_dir(DATA_DIR)
-    if RAW_JSON_PATH.exists():
-        with open(RAW_JSON_PATH, "r", encoding="utf-8") as f:
-            existing = json.load(f)
-    else:
-        existing = []
-
-    seen = {tx.get("tx_hash") for tx in existing if tx.get("tx_hash")}
-    new = []
-    for tx in transactions:
-        h = tx.get("tx_hash")
-        if h and h in seen:
-            continue
-        if h:
-            seen.add(h)
-        new.append(tx)
-
-    combined = existing + new
-    with open(RAW_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(combined, f, indent=2)
-
-    logger.info(f"Collected {len(new)} new transactions (including padded)")
-    logger.info(f"✅ Saved {len(combined)} total transactions to {RAW_JSON_PATH}")
+    try:
+        txs = blockfrost_crawler.crawl_latest_blocks(
+            max_blocks=max_blocks,
+            select_heights=journal.missing_heights,
+            on_block=writer.on_block,
+            base_url=BASE_URL,
+            project_id=BLOCKFROST_API_KEY,
+            tx_cache=get_default_cache(),
+        )
+    finally:
+        # Keep the blocks fetched before a failure; the next run skips them
+        writer.flush()
+        storage.compact_days(writer.days)
+    new_io_frames = writer.new_io_frames
+    if not txs and journal.high is None:
+        raise RuntimeError("No transactions fetched. Check Blockfrost API key.")
+    logger.info(f"Ingestion watermark: blocks {journal.low}..{journal.high}")
 
+    if incremental_features and new_io_frames:
+        # Only addresses touched by this pull are recomputed
+        from agents.ai_model.src.incremental_features import update_features
+        from agents.ai_model.src.incremental_graph import update_graph_features
+        new_io = pd.concat(new_io_frames, ignore_index=True)
+        update_features(new_io)
+        update_graph_features(new_io)
 
-def build_live_data(max_blocks: int = 500):
-    txs = batch_pull_transactions(max_blocks=max_blocks)
-    if not txs:
-        raise RuntimeError("No transactions fetched. Check Blockfrost API key.")
 
-    save_transactions_json(txs)
+def _scan(addresses: list[str], max_transactions: int):
+    return blockfrost_crawler.scan_wallets(
+        addresses,
+        max_transactions=max_transactions,
+        base_url=BASE_URL,
+        project_id=BLOCKFROST_API_KEY,
+        tx_cache=get_default_cache(),
+    )
 
 
 def fetch_wallet_transactions(wallet_address: str, max_transactions: int = 100) -> dict:
@@ -335,55 +253,15 @@ def fetch_wallet_transactions(wallet_address: str, max_transactions: int = 100)
         }
     
     try:
-        # Query Blockfrost for wallet addresses
         logger.info(f"Fetching transactions for wallet: {wallet_address}")
-        
-        url = f"{BASE_URL}/addresses/{wallet_address}/transactions"
-        params = {"count": max_transactions}
-        
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
-        resp.raise_for_status()
-        
-        tx_hashes = resp.json()
-        logger.info(f"Found {len(tx_hashes)} transactions")
-        
-        # Fetch details for each transaction
-        transactions = []
-        for i, tx_ref in enumerate(tx_hashes[:max_transactions]):
-            try:
-                tx_hash = tx_ref if isinstance(tx_ref, str) else tx_ref.get("tx_hash", "")
-                if not tx_hash:
-                    continue
-                
-                # Get transaction details
-                tx_details = fetch_transaction_details(tx_hash)
-                
-                # Get UTXOs
-                utxos = fetch_transaction_utxos(tx_hash)
-                
-                tx_record = {
-                    "tx_hash": tx_hash,
-                    "block_time": datetime.fromtimestamp(tx_details.get("block_time", 0), timezone.utc).isoformat(),
-                    "block_height": tx_details.get("block_height"),
-                    "fees": int(tx_details.get("fees", 0)),
-                    "size": tx_details.get("size"),
-                    "inputs": utxos.get("inputs", []),
-                    "outputs": utxos.get("outputs", []),
-                }
-                transactions.append(tx_record)
-                
-                # Progress logging
-                if (i + 1) % 10 == 0:
-                    logger.info(f"  Fetched {i + 1}/{len(tx_hashes)} transaction details")
-                    
-            except Exception as e:
-                logger.warning(f"Failed to fetch details for tx {tx_hash}: {e}")
-                continue
-        
+        # Transaction details are fetched concurrently by the crawler (tx cache aware)
+        transactions, _, errors = _scan([wallet_address], max_transactions)
+        if wallet_address in errors:
+            raise errors[wallet_address]
         logger.info(f"✅ Successfully fetched {len(transactions)} transactions for {wallet_address}")
         
-        # Save to transactions.json as requested
-        save_transactions_json(transactions)
+        # Persist to the Parquet store
+        save_transactions(transactions)
         
         return {
             "wallet_address": wallet_address,
@@ -392,7 +270,7 @@ def fetch_wallet_transactions(wallet_address: str, max_transactions: int = 100)
             "timestamp": datetime.now(timezone.utc).isoformat(),
         }
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Blockfrost API error: {e}")
         return {
             "wallet_address": wallet_address,
@@ -410,10 +288,103 @@ def fetch_wallet_transactions(wallet_address: str, max_transactions: int = 100)
         }
 
 
+def mock_wallet_transactions(wallet_address: str, count: int = 15) -> dict:
+    """
+    Demo stand-in for fetch_wallet_transactions when Blockfrost is unavailable
+    (missing or expired API key).
+    """
+    import random
+
+    mock_txs = []
+    for i in range(count):
+        mock_txs.append({
+            "tx_hash": f"mock_tx_{i}_{random.randint(1000,9999)}",
+            "block_time": datetime.now(timezone.utc).isoformat(),
+            "block_height": 1000000 + i,
+            "fees": random.randint(150000, 300000),
+            "size": random.randint(200, 1000),
+            "inputs": [{"address": wallet_address, "amount": [{"unit": "lovelace", "quantity": str(random.randint(1000000, 5000000))}]}],
+            "outputs": [{"address": "addr_test_mock_dest", "amount": [{"unit": "lovelace", "quantity": str(random.randint(500000, 2000000))}]}]
+        })
+
+    return {
+        "wallet_address": wallet_address,
+        "transaction_count": len(mock_txs),
+        "transactions": mock_txs,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "note": "⚠️ Using MOCK DATA (Blockfrost API Key invalid or expired)"
+    }
+
+
+def wallet_features(transactions: list[dict], addresses: list[str]) -> dict:
+    """
+    Per-address feature rows for `addresses`, computed from one exploded frame of
+    `transactions`. Addresses without any IO rows map to None.
+    """
+    if not transactions:
+        return {addr: None for addr in addresses}
+    tx_df = pd.DataFrame(transactions)
+    tx_df["block_time"] = pd.to_datetime(tx_df["block_time"], utc=True)
+    io_df = feature_engineering.explode_io(tx_df)
+    # Counterparty features need the other side of the wallets' transactions too
+    own_tx_hashes = io_df.loc[io_df["address"].isin(addresses), "tx_hash"].unique()
+    io_df = io_df[io_df["tx_hash"].isin(own_tx_hashes)]
+    if io_df.empty:
+        return {addr: None for addr in addresses}
+    features = feature_engineering.assemble_address_features(io_df).set_index("address")
+    # JSON round trip turns numpy scalars into plain values and NaN into None
+    rows = json.loads(features.to_json(orient="index"))
+    return {addr: rows.get(addr) for addr in addresses}
+
+
+def scan_wallets(addresses: list[str], max_transactions: int = 100) -> dict:
+    """
+    Batch wallet scan: fetch the tx lists of all addresses concurrently, fetch each
+    distinct transaction once (shared transactions are deduplicated), store them in a
+    single append and return per-address features in one response. Wallets that could not
+    be scanned carry an "error"; the response only fails as a whole when every wallet did.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    if not BLOCKFROST_API_KEY:
+        logger.error("BLOCKFROST_API_KEY not set!")
+        return {"wallet_count": len(addresses), "transaction_count": 0, "wallets": {},
+                "error": "BLOCKFROST_API_KEY not configured"}
+
+    try:
+        transactions, by_address, errors = _scan(addresses, max_transactions)
+        if addresses and len(errors) == len(addresses):
+            # Nothing could be scanned (bad key, 403, exhausted 429 retries)
+            raise errors[addresses[0]]
+    except httpx.HTTPError as e:
+        logger.error(f"Blockfrost API error: {e}")
+        return {"wallet_count": len(addresses), "transaction_count": 0, "wallets": {},
+                "error": f"Blockfrost API error: {str(e)}"}
+
+    save_transactions(transactions)
+    features = wallet_features(transactions, addresses)
+
+    return {
+        "wallet_count": len(addresses),
+        "transaction_count": len(transactions),
+        "wallets": {
+            addr: {
+                "transaction_count": len(by_address.get(addr, [])),
+                "tx_hashes": by_address.get(addr, []),
+                "features": features.get(addr),
+                **({"error": f"Blockfrost API error: {errors[addr]}"} if addr in errors else {}),
+            }
+            for addr in addresses
+        },
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
 if __name__ == "__main__":
     # Test: Fetch wallet transactions
     import sys
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2:
+        print(json.dumps(scan_wallets(sys.argv[1:], max_transactions=50), indent=2))
+    elif len(sys.argv) > 1:
         wallet_addr = sys.argv[1]
         result = fetch_wallet_transactions(wallet_addr, max_transactions=50)
         print(json.dumps(result, indent=2))
@@ -6,11 +6,13 @@ from sklearn.ensemble import IsolationForest
 from sklearn.svm import OneClassSVM
 from sklearn.neighbors import LocalOutlierFactor
 
-FEATURES_PATH = Path("agents/ai_model/data/features.csv")
-RESULTS_PATH = Path("agents/ai_model/data/anomaly_results.csv")
+from agents.ai_model.src import storage
+
+FEATURES_PATH = storage.artifact_path("features")
+RESULTS_PATH = storage.artifact_path("anomaly_results")
 
 def load_features(path: Path = FEATURES_PATH) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = storage.read_artifact(path.stem, data_dir=path.parent)
     return df
 
 def select_numeric_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -73,7 +75,7 @@ def build_anomaly_report():
     print(f"Anomalies flagged: {len(anomalies)}")
     print(anomalies[["address", "IsolationForest", "OneClassSVM", "LOF", "Ensemble"]].head())
 
-    df.to_csv(RESULTS_PATH, index=False)
+    storage.write_artifact(df, RESULTS_PATH.stem, RESULTS_PATH.parent)
     print(f"📂 Results saved to {RESULTS_PATH}")
 
     return df, anomalies
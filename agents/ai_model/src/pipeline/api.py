@@ -8,16 +8,16 @@ FastAPI service for AUREV Guard AI agents.
 
 import os
 import pandas as pd
-from fastapi import FastAPI
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
 from agents.ai_model.src.inference import (
     load_models,
-    detect_anomaly,
-    predict_risk,
     explain_prediction,
 )
+from agents.ai_model.src.batch_inference import BatchingInferenceEngine, EngineOverloaded
+from agents.ai_model.src.explanation_engine import engine_for, render_force_plot
 from agents.ai_model.src.utils import logger, MODEL_DIR
 
 # --- Load models once at startup ---
@@ -27,6 +27,13 @@ except Exception as e:
     logger.error(f"❌ Failed to load models: {e}")
     rf_model, iso_model, explainer = None, None, None
 
+# --- Micro-batching scorer shared by concurrent /predict calls ---
+engine = BatchingInferenceEngine(rf_model, iso_model)
+
+# --- Warm the SHAP explainer before the first /explain call ---
+if explainer:
+    engine_for(explainer, model=rf_model)
+
 # --- FastAPI app ---
 app = FastAPI(
     title="AUREV Guard AI API",
@@ -58,17 +65,20 @@ def health_check():
 
 
 @app.post("/predict")
-def predict(features: TransactionFeatures):
+async def predict(features: TransactionFeatures):
     """
     Predict risk and anomaly for a transaction feature set.
     """
     if not rf_model or not iso_model:
         return {"error": "Models not loaded"}
 
-    X_live = pd.DataFrame([features.dict()])
+    try:
+        scores = await engine.score(features.dict())
+    except EngineOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    anomaly_score, is_anomaly = detect_anomaly(iso_model, X_live)
-    y_pred, y_prob = predict_risk(rf_model, X_live)
+    anomaly_score, is_anomaly = scores["anomaly_score"], int(scores["is_anomaly"])
+    y_pred, y_prob = scores["risk_label"], scores["risk_probability"]
 
     logger.info(
         f"🔎 Prediction: risk={y_pred}, prob={y_prob:.3f}, anomaly_score={anomaly_score}, is_anomaly={is_anomaly}"
@@ -83,19 +93,25 @@ def predict(features: TransactionFeatures):
 
 
 @app.post("/explain")
-def explain(features: TransactionFeatures):
+def explain(features: TransactionFeatures, background_tasks: BackgroundTasks):
     """
     Generate SHAP explanation for a transaction.
-    Saves force plot image to models/ directory.
+    The force plot image is rendered to models/ in the background after the response.
     """
     if not explainer:
         return {"error": "Explainer not available"}
 
     X_live = pd.DataFrame([features.dict()])
+    explanation = explain_prediction(explainer, X_live)
     save_path = os.path.join(MODEL_DIR, "shap_explanation.png")
-    explain_prediction(explainer, X_live, save_path=save_path)
+    background_tasks.add_task(render_force_plot, explanation, save_path)
 
-    return {"message": "SHAP explanation generated", "path": save_path}
+    return {
+        "message": "SHAP explanation generated",
+        "path": save_path,
+        "shap_values": explanation["values"],
+        "base_value": explanation["base_value"],
+    }
 
 
 @app.get("/metadata")
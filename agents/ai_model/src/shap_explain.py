@@ -7,14 +7,16 @@ from sklearn.ensemble import IsolationForest
 # SHAP is optional dependency; install: pip install shap
 import shap
 
-FEATURES_PATH = Path("agents/ai_model/data/features.csv")
+from agents.ai_model.src import storage
+
+FEATURES_PATH = storage.artifact_path("features")
 SHAP_DIR = Path("agents/ai_model/data/shap")
 SHAP_VALUES_PATH = SHAP_DIR / "shap_values.npy"
 SHAP_SUMMARY_PATH = SHAP_DIR / "shap_summary.csv"
 SHAP_PER_ADDRESS_PATH = SHAP_DIR / "per_address.json"
 
 def load_features() -> pd.DataFrame:
-    df = pd.read_csv(FEATURES_PATH)
+    df = storage.read_artifact(FEATURES_PATH.stem, data_dir=FEATURES_PATH.parent)
     return df
 
 def select_numeric(df: pd.DataFrame) -> pd.DataFrame:
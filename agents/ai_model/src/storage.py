@@ -0,0 +1,368 @@
+"""
+storage.py
+Columnar Parquet storage layer for AUREV Guard pipeline data.
+- transactions/: raw transactions as a hive-partitioned Parquet dataset (one partition per UTC day).
+- io/: the same transactions already exploded into IO rows, partitioned the same way.
+- Feature artifacts (features, daily_features, graph_features, anomaly_results) as Parquet files.
+Appends write new immutable part files instead of rewriting history, and reads go through
+pyarrow.dataset so only the requested columns and partitions are touched.
+compact_days merges the small part files that many appends leave in one day partition.
+"""
+
+import json
+import os
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from agents.ai_model.src.utils import logger, ensure_dir
+
+# Paths
+DATA_DIR = Path("agents/ai_model/data")
+TRANSACTIONS_DIR = DATA_DIR / "transactions"
+IO_DIR = DATA_DIR / "io"
+LEGACY_JSON_PATH = DATA_DIR / "transactions.json"
+
+# Hive partition key shared by both datasets
+PARTITION_KEY = "day"
+UNKNOWN_DAY = "unknown"
+
+TX_SCHEMA = pa.schema([
+    ("tx_hash", pa.string()),
+    ("block_time", pa.timestamp("us", tz="UTC")),
+    ("block_height", pa.int64()),
+    ("fees", pa.int64()),
+    ("size", pa.int64()),
+    ("padded", pa.bool_()),
+    ("address", pa.string()),
+    ("inputs", pa.string()),    # JSON-encoded UTXO list
+    ("outputs", pa.string()),   # JSON-encoded UTXO list
+    (PARTITION_KEY, pa.string()),
+])
+
+IO_SCHEMA = pa.schema([
+    ("address", pa.string()),
+    ("direction", pa.string()),
+    ("tx_hash", pa.string()),
+    ("block_time", pa.timestamp("us", tz="UTC")),
+    ("date", pa.date32()),
+    ("block_height", pa.int64()),
+    ("lovelace", pa.int64()),
+    ("ada", pa.float64()),
+    ("data_hash", pa.string()),
+    ("reference_script_hash", pa.string()),
+    ("collateral", pa.bool_()),
+    (PARTITION_KEY, pa.string()),
+])
+
+_PARTITIONING = ds.partitioning(pa.schema([(PARTITION_KEY, pa.string())]), flavor="hive")
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+
+def _day_keys(block_time: pd.Series) -> pd.Series:
+    return block_time.dt.strftime("%Y-%m-%d").fillna(UNKNOWN_DAY)
+
+
+def _conform(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Project a frame onto a fixed schema, adding missing columns as nulls,
+    so every part file in a dataset shares one schema.
+    """
+    df = df.copy()
+    for name in schema.names:
+        if name not in df.columns:
+            df[name] = None
+    for name in ("tx_hash", "address", "direction", "data_hash", "reference_script_hash"):
+        if name in schema.names:
+            df[name] = df[name].astype(object).where(df[name].notna(), None)
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+def _write_partitions(table: pa.Table, base_dir: Path) -> None:
+    if table.num_rows == 0:
+        return
+    ensure_dir(base_dir)
+    ds.write_dataset(
+        table,
+        base_dir,
+        format="parquet",
+        partitioning=_PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def _dataset(base_dir: Path, schema: pa.Schema) -> Optional[ds.Dataset]:
+    if not base_dir.exists():
+        return None
+    return ds.dataset(base_dir, format="parquet", partitioning=_PARTITIONING, schema=schema)
+
+
+def _day_filter(start_date: Optional[date | str], end_date: Optional[date | str]):
+    expr = None
+    field = ds.field(PARTITION_KEY)
+    if start_date is not None:
+        expr = field >= str(start_date)
+    if end_date is not None:
+        upper = field <= str(end_date)
+        expr = upper if expr is None else expr & upper
+    if expr is not None:
+        # Rows without a block time are only kept when no date range is requested
+        expr = expr & (field != UNKNOWN_DAY)
+    return expr
+
+
+def _and(*exprs):
+    out = None
+    for e in exprs:
+        if e is not None:
+            out = e if out is None else out & e
+    return out
+
+
+# -------------------------------
+# Transactions
+# -------------------------------
+
+def _transactions_frame(transactions: Sequence[dict]) -> pd.DataFrame:
+    df = pd.json_normalize(list(transactions), sep="_", max_level=0)
+    for col in ("tx_hash", "block_time", "block_height", "fees", "size", "padded", "address"):
+        if col not in df.columns:
+            df[col] = None
+    df["block_time"] = pd.to_datetime(df["block_time"], errors="coerce", utc=True)
+    for col in ("block_height", "fees", "size"):
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    df["padded"] = df["padded"].fillna(False).astype(bool)
+    for col in ("inputs", "outputs"):
+        if col not in df.columns:
+            df[col] = None
+        df[col] = df[col].map(lambda v: json.dumps(v if isinstance(v, list) else []))
+    df[PARTITION_KEY] = _day_keys(df["block_time"])
+    return df
+
+
+def existing_tx_hashes(days: Optional[Iterable[str]] = None) -> set:
+    """
+    Set of tx hashes already stored, optionally restricted to the given day partitions.
+    Only the tx_hash column of the matching partitions is read.
+    """
+    dataset = _dataset(TRANSACTIONS_DIR, TX_SCHEMA)
+    if dataset is None:
+        return set()
+    expr = ds.field(PARTITION_KEY).isin(sorted(set(days))) if days is not None else None
+    col = dataset.to_table(columns=["tx_hash"], filter=expr).column("tx_hash")
+    return {h for h in col.to_pylist() if h}
+
+
+class TxHashIndex:
+    """
+    Stored tx hashes of the day partitions read so far, kept across appends so a
+    long ingest run reads each day's hashes from disk only once.
+    """
+
+    def __init__(self):
+        self.days: set = set()
+        self.hashes: set = set()
+
+    def load(self, days: Iterable[str]) -> set:
+        missing = set(days) - self.days
+        if missing:
+            self.hashes |= existing_tx_hashes(days=missing)
+            self.days |= missing
+        return self.hashes
+
+
+def append_transactions(transactions: Sequence[dict], index: Optional[TxHashIndex] = None) -> pd.DataFrame:
+    """
+    Append new transactions to the Parquet datasets.
+    Transactions already stored (by tx_hash) are skipped; records without a tx_hash
+    (padding) are always kept, matching the previous JSON behaviour.
+    Writes the raw transactions and their exploded IO rows as new part files and
+    returns the newly stored IO rows. index: optional TxHashIndex reused across calls
+    instead of re-reading the day partitions' hashes every time.
+    """
+    # Imported lazily: feature_engineering reads through this module
+    from agents.ai_model.src.feature_engineering import explode_io
+
+    migrate_legacy_json()
+    if not transactions:
+        return pd.DataFrame(columns=[c for c in IO_SCHEMA.names if c != PARTITION_KEY])
+
+    df = _transactions_frame(transactions)
+    days = df[PARTITION_KEY].unique()
+    seen = index.load(days) if index is not None else existing_tx_hashes(days=days)
+    has_hash = df["tx_hash"].notna()
+    dup = has_hash & (df["tx_hash"].isin(seen) | df["tx_hash"].duplicated())
+    new = df[~dup].reset_index(drop=True)
+
+    _write_partitions(_conform(new, TX_SCHEMA), TRANSACTIONS_DIR)
+
+    io_df = _explode_stored(new, explode_io)
+    _write_partitions(_conform(io_df, IO_SCHEMA), IO_DIR)
+    if index is not None:
+        index.hashes.update(h for h in new["tx_hash"] if isinstance(h, str))
+
+    logger.info(f"Collected {len(new)} new transactions (including padded), {len(io_df)} IO rows")
+    logger.info(f"✅ Appended to {TRANSACTIONS_DIR} and {IO_DIR}")
+    return io_df.drop(columns=[PARTITION_KEY])
+
+
+def compact_days(days: Iterable[str], min_files: int = 8) -> int:
+    """
+    Rewrite every day partition (of both datasets) holding at least min_files part
+    files as a single part file. The merged file is renamed in before the parts are
+    removed, so readers never miss rows. Returns the number of partitions compacted.
+    """
+    compacted = 0
+    for base_dir in (TRANSACTIONS_DIR, IO_DIR):
+        for day in sorted(set(days)):
+            part_dir = base_dir / f"{PARTITION_KEY}={day}"
+            parts = sorted(part_dir.glob("*.parquet")) if part_dir.exists() else []
+            if len(parts) < min_files:
+                continue
+            table = ds.dataset([str(p) for p in parts], format="parquet").to_table()
+            # Leading underscore: ignored by dataset discovery until renamed
+            tmp = part_dir / f"_compact-{uuid.uuid4().hex}.tmp"
+            pq.write_table(table, tmp)
+            os.replace(tmp, part_dir / f"part-{uuid.uuid4().hex}-0.parquet")
+            for path in parts:
+                path.unlink(missing_ok=True)
+            compacted += 1
+    if compacted:
+        logger.info(f"Compacted {compacted} day partitions")
+    return compacted
+
+
+def _explode_stored(tx_df: pd.DataFrame, explode_io) -> pd.DataFrame:
+    with_io = tx_df[tx_df["tx_hash"].notna()]
+    if with_io.empty:
+        return pd.DataFrame(columns=IO_SCHEMA.names)
+    decoded = with_io.assign(
+        inputs=with_io["inputs"].map(json.loads),
+        outputs=with_io["outputs"].map(json.loads),
+    )
+    io_df = explode_io(decoded)
+    heights = with_io.set_index("tx_hash")["block_height"]
+    io_df["block_height"] = io_df["tx_hash"].map(heights)
+    io_df[PARTITION_KEY] = _day_keys(io_df["block_time"])
+    return io_df
+
+
+def read_transactions(
+    columns: Optional[List[str]] = None,
+    start_date: Optional[date | str] = None,
+    end_date: Optional[date | str] = None,
+    min_block_height: Optional[int] = None,
+    decode: bool = True,
+) -> pd.DataFrame:
+    """
+    Read stored transactions with column projection and partition/row-group pushdown.
+    inputs/outputs are decoded back to UTXO lists unless decode=False.
+    """
+    migrate_legacy_json()
+    dataset = _dataset(TRANSACTIONS_DIR, TX_SCHEMA)
+    names = [c for c in TX_SCHEMA.names if c != PARTITION_KEY]
+    if dataset is None:
+        return pd.DataFrame(columns=columns or names)
+
+    expr = _and(
+        _day_filter(start_date, end_date),
+        ds.field("block_height") >= min_block_height if min_block_height is not None else None,
+    )
+    df = dataset.to_table(columns=columns or names, filter=expr).to_pandas()
+    if decode:
+        for col in ("inputs", "outputs"):
+            if col in df.columns:
+                df[col] = df[col].map(lambda v: json.loads(v) if v else [])
+    return df
+
+
+def read_io(
+    columns: Optional[List[str]] = None,
+    start_date: Optional[date | str] = None,
+    end_date: Optional[date | str] = None,
+    addresses: Optional[Iterable[str]] = None,
+    min_block_height: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Read the exploded IO table (same columns as feature_engineering.explode_io)
+    with column projection and predicate pushdown.
+    """
+    migrate_legacy_json()
+    dataset = _dataset(IO_DIR, IO_SCHEMA)
+    names = [c for c in IO_SCHEMA.names if c != PARTITION_KEY]
+    if dataset is None:
+        return pd.DataFrame(columns=columns or names)
+
+    expr = _and(
+        _day_filter(start_date, end_date),
+        ds.field("address").isin(list(addresses)) if addresses is not None else None,
+        ds.field("block_height") >= min_block_height if min_block_height is not None else None,
+    )
+    return dataset.to_table(columns=columns or names, filter=expr).to_pandas()
+
+
+def migrate_legacy_json(path: Path = LEGACY_JSON_PATH) -> None:
+    """
+    One-time import of a pre-Parquet transactions.json into the datasets.
+    The JSON file is renamed so it is not imported twice.
+    """
+    if not path.exists() or TRANSACTIONS_DIR.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        legacy = json.load(f)
+    logger.info(f"Migrating {len(legacy)} transactions from {path} to {TRANSACTIONS_DIR}")
+    ensure_dir(TRANSACTIONS_DIR)
+    append_transactions(legacy)
+    path.rename(path.with_suffix(".json.migrated"))
+
+
+# -------------------------------
+# Feature artifacts
+# -------------------------------
+
+def artifact_path(name: str, data_dir: Path = DATA_DIR) -> Path:
+    return Path(data_dir) / f"{name}.parquet"
+
+
+def write_artifact(df: pd.DataFrame, name: str, data_dir: Path = DATA_DIR) -> Path:
+    """
+    Persist a feature table (features, daily_features, graph_features, anomaly_results) as Parquet.
+    """
+    path = artifact_path(name, data_dir)
+    ensure_dir(path.parent)
+    df.replace([np.inf, -np.inf], np.nan).to_parquet(path, index=False)
+    return path
+
+
+def read_artifact(
+    name: str,
+    columns: Optional[List[str]] = None,
+    data_dir: Path = DATA_DIR,
+) -> pd.DataFrame:
+    """
+    Load a feature table written by write_artifact.
+    Falls back to the legacy <name>.csv when no Parquet file exists yet.
+    Raises FileNotFoundError if neither exists.
+    """
+    path = artifact_path(name, data_dir)
+    if path.exists():
+        return pd.read_parquet(path, columns=columns)
+    legacy = Path(data_dir) / f"{name}.csv"
+    if legacy.exists():
+        return pd.read_csv(legacy, usecols=columns)
+    raise FileNotFoundError(f"No {name} artifact found in {data_dir}")
+
+
+def artifact_exists(name: str, data_dir: Path = DATA_DIR) -> bool:
+    return artifact_path(name, data_dir).exists() or (Path(data_dir) / f"{name}.csv").exists()
@@ -1,9 +1,11 @@
 from fastapi import FastAPI, Request
 import pandas as pd
-import json
 import os
 import joblib
 
+from agents.ai_model.src import storage
+from agents.ai_model.src.batch_inference import BatchingInferenceEngine
+
 app = FastAPI(title="AI Model Agent", version="1.0.0")
 
 # --- Paths ---
@@ -13,27 +15,16 @@ os.makedirs(MODEL_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # --- Load datasets safely ---
-def safe_load_csv(filename: str) -> pd.DataFrame:
-    path = os.path.join(DATA_DIR, filename)
+def safe_load_artifact(name: str) -> pd.DataFrame:
     try:
-        return pd.read_csv(path)
+        return storage.read_artifact(name, data_dir=DATA_DIR)
     except Exception as e:
-        print(f"WARNING: Could not load {filename}: {e}")
+        print(f"WARNING: Could not load {name}: {e}")
         return pd.DataFrame()
 
-def safe_load_json(filename: str):
-    path = os.path.join(DATA_DIR, filename)
-    try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"WARNING: Could not load {filename}: {e}")
-        return {}
-
-anomaly_df = safe_load_csv("anomaly_results.csv")
-features_df = safe_load_csv("features.csv")
-graph_df = safe_load_csv("graph_features.csv")
-transactions = safe_load_json("transactions.json")
+anomaly_df = safe_load_artifact("anomaly_results")
+features_df = safe_load_artifact("features")
+graph_df = safe_load_artifact("graph_features")
 
 # --- Load trained models ---
 try:
@@ -44,6 +35,10 @@ except Exception as e:
     print(f"WARNING: Could not load models: {e}")
     iso_model, rf_model = None, None
 
+# Separate engines so a risk-model failure doesn't also fail the anomaly flag
+risk_engine = BatchingInferenceEngine(rf_model, None)
+anomaly_engine = BatchingInferenceEngine(None, iso_model)
+
 # --- Health endpoint ---
 @app.get("/health")
 def health():
@@ -66,8 +61,7 @@ async def predict(req: Request):
     # --- Risk score from RandomForest ---
     if rf_model and input_features:
         try:
-            X = pd.DataFrame([input_features])
-            risk_score = int(rf_model.predict(X)[0])
+            risk_score = (await risk_engine.score(input_features))["risk_label"]
             # Map to 0–4 levels for easier interpretation
             result["risk_score"] = risk_score
         except Exception as e:
@@ -89,8 +83,7 @@ async def predict(req: Request):
     # --- Anomaly flag from IsolationForest ---
     if iso_model and input_features:
         try:
-            X = pd.DataFrame([input_features])
-            anomaly_flag = int(iso_model.predict(X)[0])  # -1 = anomaly, 1 = normal
+            anomaly_flag = (await anomaly_engine.score(input_features))["anomaly_flag"]  # -1 = anomaly, 1 = normal
             result["anomaly_flag"] = anomaly_flag
         except Exception as e:
             result["anomaly_flag"] = f"error: {e}"
@@ -0,0 +1,347 @@
+"""
+tree_compiler.py
+Flattened tree ensembles for low-latency scoring.
+- A fitted RandomForestClassifier / IsolationForest is exported to contiguous NumPy
+  arrays (feature, threshold, left, right, value), every tree concatenated, with
+  leaves pointing at themselves so all rows descend in lock-step.
+- The evaluator walks those arrays for all rows x trees at once: no estimator loop,
+  no input validation and no joblib dispatch in the hot path.
+- Results are numerically identical to sklearn: inputs are cast to float32 like the
+  Cython tree code, per-tree values are accumulated in tree order, and IsolationForest
+  path lengths use the same average_path_length normalization as score_samples.
+
+Usage:
+    python -m agents.ai_model.src.tree_compiler            # writes *.npz next to the .pkl models
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from agents.ai_model.src.utils import MODEL_DIR, logger
+
+COMPILED_FILES = {"rf": "randomforest.npz", "iso": "isolationforest.npz"}
+
+
+# -------------------------------
+# Path-length normalization
+# -------------------------------
+
+def average_path_length(n_samples_leaf) -> np.ndarray:
+    """
+    Average path length of an unsuccessful BST search over n samples, c(n):
+    0 for n <= 1, 1 for n == 2, else 2 * (ln(n - 1) + euler_gamma) - 2 * (n - 1) / n.
+    Same formula (and operation order) as sklearn's IsolationForest.
+    """
+    n = np.asarray(n_samples_leaf, dtype=np.float64)
+    shape = n.shape
+    n = n.reshape((1, -1))
+    out = np.zeros(n.shape)
+    mask_1 = n <= 1
+    mask_2 = n == 2
+    not_mask = ~np.logical_or(mask_1, mask_2)
+    out[mask_1] = 0.0
+    out[mask_2] = 1.0
+    out[not_mask] = (
+        2.0 * (np.log(n[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n[not_mask] - 1.0) / n[not_mask]
+    )
+    return out.reshape(shape)
+
+
+def node_depths(tree) -> np.ndarray:
+    """
+    Depth of every node of a sklearn Tree (root = 1).
+    """
+    depths = np.zeros(tree.node_count, dtype=np.int64)
+    depths[0] = 1
+    # Children always have larger ids than their parent
+    for node in range(tree.node_count):
+        left = tree.children_left[node]
+        if left != -1:
+            depths[left] = depths[node] + 1
+            depths[tree.children_right[node]] = depths[node] + 1
+    return depths
+
+
+# -------------------------------
+# Flattened forest
+# -------------------------------
+
+class CompiledForest:
+    """
+    Concatenated node arrays of an ensemble. Node ids are global; roots[t] is the
+    first node of tree t and leaves have left == right == their own id.
+    value holds one row per node (only leaf rows are read).
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, feature_names):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object) if feature_names is not None else None
+        self.n_features_in_ = int(self.feature.max()) + 1 if feature_names is None else len(feature_names)
+        # children[2 * node + go_left]: one gather per level instead of two plus a select
+        self._children = np.ascontiguousarray(np.stack([self.right, self.left], axis=1).ravel())
+        self._is_leaf = self.left == np.arange(len(self.left))
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def _flatten(cls, estimators, features_per_tree, node_values) -> Dict[str, np.ndarray]:
+        """
+        Concatenate the tree_ arrays of estimators. features_per_tree maps each tree's
+        local feature ids to input columns (IsolationForest feature subsampling);
+        node_values(t, tree) returns that tree's per-node value rows.
+        """
+        parts = {k: [] for k in ("feature", "threshold", "left", "right", "missing_left", "value")}
+        roots, offset, max_depth = [], 0, 0
+        for t, est in enumerate(estimators):
+            tree = est.tree_
+            ids = np.arange(tree.node_count) + offset
+            leaf = tree.children_left == -1
+            features = np.asarray(features_per_tree[t]) if features_per_tree is not None else None
+            local = np.where(leaf, 0, tree.feature)
+            parts["feature"].append(features[local] if features is not None else local)
+            parts["threshold"].append(np.where(leaf, 0.0, tree.threshold))
+            parts["left"].append(np.where(leaf, ids, tree.children_left + offset))
+            parts["right"].append(np.where(leaf, ids, tree.children_right + offset))
+            missing = getattr(tree, "missing_go_to_left", None)
+            parts["missing_left"].append(
+                np.asarray(missing, dtype=bool) if missing is not None else np.zeros(tree.node_count, dtype=bool)
+            )
+            parts["value"].append(node_values(t, tree))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+        arrays = {k: np.concatenate(v) for k, v in parts.items()}
+        arrays["roots"] = np.asarray(roots)
+        arrays["max_depth"] = max_depth
+        return arrays
+
+    def _matrix(self, X) -> np.ndarray:
+        names = self.feature_names_in_
+        if names is not None and hasattr(X, "columns"):
+            X = X[list(names)]
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} feature columns, got shape {X.shape}")
+        return X
+
+    def apply(self, X) -> np.ndarray:
+        """
+        Leaf node id reached by every row in every tree, shape (n_rows, n_trees).
+        """
+        X = self._matrix(X)
+        flat = X.ravel()
+        row_base = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, None]
+        has_nan = bool(np.isnan(flat).any())
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).ravel().copy()
+        row_base = np.repeat(row_base.ravel(), self.n_trees)
+        # Only (row, tree) pairs still at an internal node descend another level
+        active = np.flatnonzero(~self._is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            x = flat[row_base[active] + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.missing_left[current], go_left)
+            current = self._children[2 * current + go_left]
+            nodes[active] = current
+            active = active[~self._is_leaf[current]]
+        return nodes.reshape(len(X), self.n_trees)
+
+    def _tree_sum(self, X) -> np.ndarray:
+        """
+        Sum of the per-tree leaf values, accumulated in tree order like sklearn's
+        forest loops (add.accumulate is sequential, unlike np.sum's pairwise reduction).
+        """
+        values = self.value[self.apply(X)]
+        return np.add.accumulate(values, axis=1)[:, -1]
+
+    # Persistence
+    def _meta(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def save(self, path: str) -> str:
+        names = self.feature_names_in_
+        np.savez(
+            path,
+            kind=np.asarray(self.KIND),
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            missing_left=self.missing_left, value=self.value, roots=self.roots,
+            max_depth=np.asarray(self.max_depth),
+            feature_names=np.asarray([str(n) for n in names] if names is not None else [], dtype=str),
+            **self._meta(),
+        )
+        return path
+
+
+class CompiledRandomForest(CompiledForest):
+    """
+    Flattened RandomForestClassifier. value rows are each leaf's class distribution,
+    normalized as in DecisionTreeClassifier.predict_proba.
+    """
+
+    KIND = "random_forest"
+
+    def __init__(self, *args, classes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledRandomForest":
+        n_classes = len(model.classes_)
+
+        def proba(_, tree):
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            return value / normalizer
+
+        arrays = cls._flatten(model.estimators_, None, proba)
+        return cls(**arrays, feature_names=getattr(model, "feature_names_in_", None), classes=model.classes_)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._tree_sum(X) / self.n_trees
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _meta(self):
+        return {"classes": self.classes_}
+
+
+class CompiledIsolationForest(CompiledForest):
+    """
+    Flattened IsolationForest. value rows are the per-leaf path length
+    depth + c(n_node_samples) - 1, so a row's total depth is one gather and a sum.
+    """
+
+    KIND = "isolation_forest"
+
+    def __init__(self, *args, denominator, offset, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.denominator = np.asarray(denominator, dtype=np.float64)
+        self.offset_ = float(offset)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledIsolationForest":
+        subsample = model._max_features != model.n_features_in_
+
+        def path_length(_, tree):
+            return (node_depths(tree) + average_path_length(tree.n_node_samples) - 1.0)[:, None]
+
+        arrays = cls._flatten(model.estimators_, model.estimators_features_ if subsample else None, path_length)
+        max_samples = getattr(model, "_max_samples", model.max_samples_)
+        denominator = len(model.estimators_) * average_path_length([max_samples])
+        return cls(**arrays, feature_names=getattr(model, "feature_names_in_", None),
+                   denominator=denominator, offset=model.offset_)
+
+    def score_samples(self, X) -> np.ndarray:
+        depths = self._tree_sum(X)[:, 0]
+        # A single training sample gives a zero denominator; sklearn scores it 1
+        scores = 2 ** (
+            -np.divide(depths, self.denominator, out=np.ones_like(depths), where=self.denominator != 0)
+        )
+        return -scores
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def _meta(self):
+        return {"denominator": self.denominator, "offset": np.asarray(self.offset_)}
+
+
+# -------------------------------
+# Export / load
+# -------------------------------
+
+def compile_model(model) -> CompiledForest:
+    """
+    Flatten a fitted sklearn RandomForestClassifier or IsolationForest.
+    Raises TypeError for any other estimator.
+    """
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+    if isinstance(model, RandomForestClassifier):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise TypeError("Only single-output RandomForestClassifier models can be compiled")
+        return CompiledRandomForest.from_sklearn(model)
+    if isinstance(model, IsolationForest):
+        return CompiledIsolationForest.from_sklearn(model)
+    raise TypeError(f"Cannot compile {type(model).__name__}")
+
+
+def load_compiled(path: str) -> CompiledForest:
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data["kind"])
+        names = [str(n) for n in data["feature_names"]] or None
+        common = dict(
+            feature=data["feature"], threshold=data["threshold"], left=data["left"], right=data["right"],
+            missing_left=data["missing_left"], value=data["value"], roots=data["roots"],
+            max_depth=int(data["max_depth"]), feature_names=names,
+        )
+        if kind == CompiledRandomForest.KIND:
+            return CompiledRandomForest(**common, classes=data["classes"])
+        if kind == CompiledIsolationForest.KIND:
+            return CompiledIsolationForest(**common, denominator=data["denominator"], offset=float(data["offset"]))
+    raise ValueError(f"Unknown compiled model kind {kind!r} in {path}")
+
+
+def export_models(rf_model, iso_model, model_dir: str = MODEL_DIR) -> Dict[str, str]:
+    """
+    Write the compiled forms of both models next to their pickles.
+    """
+    paths = {}
+    for key, model in (("rf", rf_model), ("iso", iso_model)):
+        if model is None:
+            continue
+        path = os.path.join(model_dir, COMPILED_FILES[key])
+        paths[key] = compile_model(model).save(path)
+        logger.info(f"Compiled {type(model).__name__} -> {path}")
+    return paths
+
+
+def load_compiled_models(model_dir: str = MODEL_DIR) -> Tuple[Optional[CompiledForest], Optional[CompiledForest]]:
+    """
+    (rf, iso) compiled models from model_dir; None where no .npz exists.
+    """
+    out = []
+    for key in ("rf", "iso"):
+        path = os.path.join(model_dir, COMPILED_FILES[key])
+        out.append(load_compiled(path) if os.path.exists(path) else None)
+    return out[0], out[1]
+
+
+def compile_or_none(model) -> Optional[CompiledForest]:
+    """
+    compile_model() that logs and returns None for models it cannot flatten,
+    so callers keep scoring through sklearn.
+    """
+    if model is None:
+        return None
+    try:
+        return compile_model(model)
+    except (TypeError, AttributeError, ValueError) as e:
+        logger.warning(f"Tree compilation skipped for {type(model).__name__}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from agents.ai_model.src.inference import load_models
+
+    rf, iso, _ = load_models()
+    export_models(rf, iso)
@@ -0,0 +1,130 @@
+"""
+tx_cache.py
+Persistent cache of immutable Blockfrost transaction responses.
+- Keyed by (kind, tx_hash), where kind is the endpoint ("details" for /txs/{hash},
+  "utxos" for /txs/{hash}/utxos).
+- SQLite file on disk with an in-process LRU in front of it.
+- Only confirmed transactions are cached, and they never expire: a transaction seen
+  in one wallet scan costs no network calls in any later scan.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agents.ai_model.src import storage
+from agents.ai_model.src.utils import ensure_dir
+
+CACHE_PATH = storage.DATA_DIR / "tx_cache.sqlite"
+DEFAULT_LRU_SIZE = 50_000
+
+DETAILS = "details"
+UTXOS = "utxos"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    kind TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (kind, tx_hash)
+) WITHOUT ROWID;
+"""
+
+
+def _is_confirmed(kind: str, body: Any) -> bool:
+    if kind == DETAILS:
+        return isinstance(body, dict) and body.get("block_height") is not None
+    # UTXO sets are only served for transactions already in a block
+    return isinstance(body, dict)
+
+
+class TxCache:
+    def __init__(self, path: Path = CACHE_PATH, lru_size: int = DEFAULT_LRU_SIZE):
+        self.path = Path(path)
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._con: Optional[sqlite3.Connection] = None
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._con is None:
+            ensure_dir(self.path.parent)
+            self._con = sqlite3.connect(self.path, check_same_thread=False)
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+            self._con.executescript(_SCHEMA)
+        return self._con
+
+    def _remember(self, key: Tuple[str, str], body: Any) -> None:
+        self._lru[key] = body
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # -------------------------------
+    # Lookups
+    # -------------------------------
+
+    def get(self, kind: str, tx_hash: str) -> Optional[Any]:
+        key = (kind, tx_hash)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._lru[key]
+            row = self._connection().execute(
+                "SELECT body FROM responses WHERE kind = ? AND tx_hash = ?", key
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            body = json.loads(row[0])
+            self._remember(key, body)
+            self.stats["disk_hits"] += 1
+            return body
+
+    def put(self, kind: str, tx_hash: str, body: Any) -> None:
+        if not _is_confirmed(kind, body):
+            return
+        key = (kind, tx_hash)
+        with self._lock:
+            con = self._connection()
+            with con:
+                con.execute(
+                    "INSERT OR REPLACE INTO responses (kind, tx_hash, body) VALUES (?, ?, ?)",
+                    (kind, tx_hash, json.dumps(body, separators=(",", ":"))),
+                )
+            self._remember(key, body)
+
+    def get_or_fetch(self, kind: str, tx_hash: str, fetch: Callable[[str], Any]) -> Any:
+        """
+        Cached response for tx_hash, calling fetch(tx_hash) and storing the result on a miss.
+        """
+        body = self.get(kind, tx_hash)
+        if body is None:
+            body = fetch(tx_hash)
+            self.put(kind, tx_hash, body)
+        return body
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+
+_default: Dict[Path, TxCache] = {}
+
+
+def get_default_cache(path: Path = CACHE_PATH) -> TxCache:
+    """
+    Process-wide cache instance for `path`, shared by every fetcher.
+    """
+    path = Path(path)
+    if path not in _default:
+        _default[path] = TxCache(path)
+    return _default[path]
@@ -3,6 +3,9 @@
 """
 Standalone script to fetch Blockfrost data for a wallet.
 Called from Node.js backend.
+
+Usage: fetch_blockfrost.py <project_root> <address>[,<address>...] [max_transactions]
+A comma-separated address list runs one batch scan and prints per-address features.
 """
 import sys
 import os
@@ -65,7 +68,7 @@ try:
     
     try:
         # Import the function (this triggers the "Models loaded successfully" print)
-        from agents.ai_model.src.live_pipeline import fetch_wallet_transactions
+        from agents.ai_model.src.live_pipeline import fetch_wallet_transactions, mock_wallet_transactions, scan_wallets
         
         # Get wallet address from command line
         if len(sys.argv) < 3:
@@ -80,36 +83,18 @@ try:
         
         wallet_address = sys.argv[2]
         max_transactions = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+        wallet_addresses = [a for a in wallet_address.split(',') if a]
         
         # Fetch data
-        result = fetch_wallet_transactions(wallet_address, max_transactions=max_transactions)
+        if len(wallet_addresses) > 1:
+            result = scan_wallets(wallet_addresses, max_transactions=max_transactions)
+        else:
+            result = fetch_wallet_transactions(wallet_address, max_transactions=max_transactions)
         
-        # Check if result has error
-        if result.get('error'):
+        # Check if result has error (mock data only applies to single-wallet fetches)
+        if result.get('error') and len(wallet_addresses) == 1:
             # If API error, generate mock data instead of failing
-            import random
-            from datetime import datetime, timezone
-            
-            # Generate mock transactions
-            mock_txs = []
-            for i in range(15):
-                mock_txs.append({
-                    "tx_hash": f"mock_tx_{i}_{random.randint(1000,9999)}",
-                    "block_time": datetime.now(timezone.utc).isoformat(),
-                    "block_height": 1000000 + i,
-                    "fees": random.randint(150000, 300000),
-                    "size": random.randint(200, 1000),
-                    "inputs": [{"address": wallet_address, "amount": [{"unit": "lovelace", "quantity": str(random.randint(1000000, 5000000))}]}],
-                    "outputs": [{"address": "addr_test_mock_dest", "amount": [{"unit": "lovelace", "quantity": str(random.randint(500000, 2000000))}]}]
-                })
-                
-            result = {
-                "wallet_address": wallet_address,
-                "transaction_count": len(mock_txs),
-                "transactions": mock_txs,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "note": "⚠️ Using MOCK DATA (Blockfrost API Key invalid or expired)"
-            }
+            result = mock_wallet_transactions(wallet_address)
             
     finally:
         # Restore stdout for the final JSON output
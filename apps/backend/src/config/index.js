@@ -20,6 +20,9 @@ export const config = {
   CARDANO_NETWORK: process.env.CARDANO_NETWORK || 'testnet',
   LIVE_PIPELINE_TIMEOUT: parseInt(process.env.LIVE_PIPELINE_TIMEOUT || '300', 10),
   LIVE_PIPELINE_POLL_INTERVAL: parseInt(process.env.LIVE_PIPELINE_POLL_INTERVAL || '2000', 10),
+  FEATURE_SERVICE_URL: process.env.FEATURE_SERVICE_URL || 'http://localhost:8090',
+  FEATURE_SERVICE_TIMEOUT: parseInt(process.env.FEATURE_SERVICE_TIMEOUT || '180000', 10),
+  SCAN_MAX_ADDRESSES: parseInt(process.env.SCAN_MAX_ADDRESSES || '50', 10),
   PAYMENT_REQUIRED: process.env.PAYMENT_REQUIRED === 'true',
   PAYMENT_AMOUNT_ADA: parseFloat(process.env.PAYMENT_AMOUNT_ADA || '2'),
   PAYMENT_ADDRESS: process.env.PAYMENT_ADDRESS || '',
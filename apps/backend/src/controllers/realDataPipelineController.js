@@ -150,6 +150,34 @@ export const getRealPipelineResults = asyncHandler(async (req, res) => {
   return res.json({ success: true, walletAddress, results, count: results.length });
 });
 
+/**
+ * Batch wallet scan: fetch many wallets in one Python run and return per-address features
+ * POST /api/real-pipeline/scan
+ */
+export const scanWallets = asyncHandler(async (req, res) => {
+  const { walletAddresses, maxTransactions } = req.body || {};
+
+  if (!Array.isArray(walletAddresses) || walletAddresses.length === 0) {
+    return res.status(400).json({ success: false, error: 'walletAddresses must be a non-empty array' });
+  }
+
+  const addresses = [...new Set(walletAddresses)];
+  if (addresses.length > config.SCAN_MAX_ADDRESSES) {
+    return res.status(400).json({
+      success: false,
+      error: `At most ${config.SCAN_MAX_ADDRESSES} addresses can be scanned per request`,
+    });
+  }
+
+  const invalid = addresses.filter(a => !isValidCardanoAddress(a));
+  if (invalid.length > 0) {
+    return res.status(400).json({ success: false, error: 'Invalid wallet address format', invalid });
+  }
+
+  const result = await fetchLiveBlockfrostData(addresses, maxTransactions || 100);
+  return res.json({ success: true, ...result });
+});
+
 /**
  * Run real pipeline async:
  * 1. Call Python live_pipeline.py to fetch Blockfrost data
@@ -231,9 +259,55 @@ async function runRealPipelineAsync(jobId, walletAddress) {
 }
 
 /**
- * Call Python live_pipeline.py to fetch Blockfrost data for specific wallet
+ * POST to the long-lived Python feature service (agents/ai_model/src/feature_service.py)
  */
-async function fetchLiveBlockfrostData(walletAddress) {
+async function callFeatureService(route, body, timeoutMs = config.FEATURE_SERVICE_TIMEOUT) {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), timeoutMs);
+  try {
+    const resp = await fetch(`${config.FEATURE_SERVICE_URL}${route}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+      signal: controller.signal,
+    });
+    const data = await resp.json().catch(() => ({}));
+    if (!resp.ok) {
+      const error = new Error(data.detail || `Feature service error: ${resp.status} ${resp.statusText}`);
+      error.status = resp.status;
+      throw error;
+    }
+    return data;
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+/**
+ * Fetch Blockfrost data for a specific wallet (or, given an array of addresses,
+ * one batch scan over all of them) through the feature service. Falls back to the
+ * one-shot fetch_blockfrost.py script when the service is not running.
+ */
+async function fetchLiveBlockfrostData(walletAddress, maxTransactions = 100) {
+  const batch = Array.isArray(walletAddress);
+  try {
+    const result = batch
+      ? await callFeatureService('/wallets/scan', { wallet_addresses: walletAddress, max_transactions: maxTransactions })
+      : await callFeatureService('/wallets/fetch', { wallet_address: walletAddress, max_transactions: maxTransactions });
+    console.log(`✅ Successfully fetched ${result.transaction_count} transactions`);
+    return result;
+  } catch (err) {
+    if (err.status) throw err;
+    console.warn(`⚠️  Feature service unavailable (${err.message}); spawning fetch_blockfrost.py`);
+    return fetchLiveBlockfrostDataSubprocess(walletAddress, maxTransactions);
+  }
+}
+
+/**
+ * Call Python live_pipeline.py in a subprocess to fetch Blockfrost data
+ */
+async function fetchLiveBlockfrostDataSubprocess(walletAddress, maxTransactions = 100) {
+  const addressArg = Array.isArray(walletAddress) ? walletAddress.join(',') : walletAddress;
   return new Promise((resolve, reject) => {
     const pythonPath = process.env.PYTHON_PATH || 'python';
     // Resolve project root - go up from apps/backend/src/controllers to repo root (4 levels)
@@ -267,7 +341,7 @@ async function fetchLiveBlockfrostData(walletAddress) {
 
     // Use standalone Python script instead of inline code
     // Note: Don't use shell:true on Windows as it breaks environment variable passing
-    const proc = spawn(pythonPath, [scriptPath, projectRoot, walletAddress, '100'], {
+    const proc = spawn(pythonPath, [scriptPath, projectRoot, addressArg, String(maxTransactions)], {
       cwd: projectRoot,
       env: env,
       timeout: 180000, // 180 second timeout
@@ -341,97 +415,34 @@ async function fetchLiveBlockfrostData(walletAddress) {
 }
 
 /**
- * Run Python feature_engineering.py to extract 8-dimensional feature vector
+ * Extract the wallet feature vector via the warm Python feature service
+ * (feature_engineering.build_wallet_features)
  */
 async function runFeatureEngineering(liveData, walletAddress) {
-  return new Promise((resolve, reject) => {
-    const pythonPath = process.env.PYTHON_PATH || 'python';
-    const projectRoot = path.resolve(__dirname, '../../..');
-
-    // Generate mock features as fallback
-    const mockFeatures = {
-      tx_count_24h: Math.floor(Math.random() * 100) + 10,
-      total_value_24h: Math.floor(Math.random() * 50000000) + 1000000,
-      largest_value_24h: Math.floor(Math.random() * 20000000) + 500000,
-      std_value_24h: Math.floor(Math.random() * 5000000) + 100000,
-      unique_counterparts_24h: Math.floor(Math.random() * 40) + 5,
-      entropy_of_destinations: Math.random() * 5,
-      share_of_daily_volume: Math.random() * 0.5,
-      relative_max_vs_global: Math.random() * 0.8,
-    };
-
-    const liveDataJson = JSON.stringify(liveData).replace(/"/g, '\\"');
-
-    const pythonScript = `
-import sys
-import os
-import json
-sys.path.insert(0, r'${projectRoot}')
-
-try:
-    from agents.ai_model.src.feature_engineering import build_wallet_features
-    
-    live_data = ${JSON.stringify(liveData)}
-    features = build_wallet_features('${walletAddress}', live_data)
-    print(json.dumps(features))
-    
-except ImportError as e:
-    print(json.dumps({'error': f'Import error: {str(e)}'}), file=sys.stderr)
-    # Use mock features
-    print(json.dumps(${JSON.stringify(mockFeatures)}))
-except Exception as e:
-    print(f"Feature engineering error: {str(e)}", file=sys.stderr)
-    # Use mock features on error
-    print(json.dumps(${JSON.stringify(mockFeatures)}))
-`;
-
-    console.log(`\n🔧 Starting Python subprocess for feature engineering`);
-
-    const proc = spawn(pythonPath, ['-c', pythonScript], {
-      cwd: projectRoot,
-      env: {
-        ...process.env,
-        PYTHONUNBUFFERED: '1',
-        PYTHONPATH: projectRoot
-      },
-      timeout: 30000, // 30 second timeout
-    });
-
-    let stdout = '';
-    let stderr = '';
-
-    proc.stdout.on('data', (data) => {
-      stdout += data.toString();
-      console.log(`  [Python stdout] ${data.toString().trim()}`);
-    });
-
-    proc.stderr.on('data', (data) => {
-      stderr += data.toString();
-      console.log(`  [Python stderr] ${data.toString().trim()}`);
-    });
-
-    proc.on('error', (error) => {
-      console.error(`❌ Python process error: ${error.message}`);
-      console.log(`  Using mock features as fallback`);
-      resolve(mockFeatures);
-    });
-
-    proc.on('close', (code) => {
-      console.log(`✅ Feature engineering process closed with code: ${code}`);
+  // Generate mock features as fallback
+  const mockFeatures = {
+    tx_count_24h: Math.floor(Math.random() * 100) + 10,
+    total_value_24h: Math.floor(Math.random() * 50000000) + 1000000,
+    largest_value_24h: Math.floor(Math.random() * 20000000) + 500000,
+    std_value_24h: Math.floor(Math.random() * 5000000) + 100000,
+    unique_counterparts_24h: Math.floor(Math.random() * 40) + 5,
+    entropy_of_destinations: Math.random() * 5,
+    share_of_daily_volume: Math.random() * 0.5,
+    relative_max_vs_global: Math.random() * 0.8,
+  };
 
-      try {
-        const result = JSON.parse(stdout);
-        console.log(`✅ Features extracted successfully`);
-        resolve(result);
-      } catch (e) {
-        if (stderr) {
-          console.error(`stderr: ${stderr}`);
-        }
-        console.log(`  Falling back to mock features`);
-        resolve(mockFeatures);
-      }
+  try {
+    const result = await callFeatureService('/features/wallet', {
+      wallet_address: walletAddress,
+      live_data: liveData,
     });
-  });
+    console.log(`✅ Features extracted in ${result.elapsed_ms} ms`);
+    return result.features;
+  } catch (err) {
+    console.error(`❌ Feature service error: ${err.message}`);
+    console.log(`  Falling back to mock features`);
+    return mockFeatures;
+  }
 }
 
 /**
@@ -534,4 +545,5 @@ export default {
   startRealPipeline,
   getRealPipelineStatus,
   getRealPipelineResults,
+  scanWallets,
 };
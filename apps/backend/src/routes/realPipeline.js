@@ -3,6 +3,7 @@ import {
   startRealPipeline,
   getRealPipelineStatus,
   getRealPipelineResults,
+  scanWallets,
 } from '../controllers/realDataPipelineController.js';
 
 const router = express.Router();
@@ -16,4 +17,7 @@ router.get('/status/:jobId', getRealPipelineStatus);
 // Get all real pipeline results for wallet
 router.get('/results/:walletAddress', getRealPipelineResults);
 
+// Scan many wallets in one request (per-address features)
+router.post('/scan', scanWallets);
+
 export default router;
@@ -60,7 +60,8 @@ app.get('/api', (req, res) => {
       realPipeline: {
         start: 'POST /api/real-pipeline/start',
         status: 'GET /api/real-pipeline/status/:jobId',
-        results: 'GET /api/real-pipeline/results/:walletAddress'
+        results: 'GET /api/real-pipeline/results/:walletAddress',
+        scan: 'POST /api/real-pipeline/scan'
       }
     }
   });
@@ -11,6 +11,8 @@ import random
 import sys
 import io
 
+from agents.ai_model.src import storage
+
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -19,7 +21,7 @@ print("SHAP EXPLANATION FOR RANDOM BLOCKCHAIN TRANSACTION DATA")
 print("=" * 90)
 
 # Load actual training data to understand structure
-df_train = pd.read_csv('agents/ai_model/data/anomaly_results.csv')
+df_train = storage.read_artifact("anomaly_results")
 
 print("\nTRAINING DATA INFORMATION:")
 print(f"  Total Records in Training Set: {len(df_train)}")
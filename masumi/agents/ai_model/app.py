@@ -3,20 +3,21 @@ import pandas as pd
 import json
 import os
 
+from agents.ai_model.src import io_cache, storage
+
 app = FastAPI(title="AI Model Agent", version="1.0.0")
 
 # --- Paths ---
-DATA_DIR = os.path.join("aurevguard", "agents", "ai_model", "data")
+DATA_DIR = str(storage.DATA_DIR)
 
-# --- Load datasets ---
+# --- Load datasets (feature artifacts, IO cache and transactions from the shared store) ---
 try:
-    anomaly_df = pd.read_csv(os.path.join(DATA_DIR, "anomaly_results.csv"))
-    daily_df = pd.read_csv(os.path.join(DATA_DIR, "daily_features.csv"))
-    features_df = pd.read_csv(os.path.join(DATA_DIR, "features.csv"))
-    graph_df = pd.read_csv(os.path.join(DATA_DIR, "graph_features.csv"))
-    io_cache_df = pd.read_csv(os.path.join(DATA_DIR, "io_cache.csv"))
-    with open(os.path.join(DATA_DIR, "transactions.json"), "r") as f:
-        transactions = json.load(f)
+    anomaly_df = storage.read_artifact("anomaly_results")
+    daily_df = storage.read_artifact("daily_features")
+    features_df = storage.read_artifact("features")
+    graph_df = storage.read_artifact("graph_features")
+    io_cache_df = io_cache.load_io()
+    transactions = storage.read_transactions(decode=False)
 except Exception as e:
     print(f"Error loading data: {e}")
     anomaly_df = pd.DataFrame()
@@ -24,7 +25,7 @@ except Exception as e:
     features_df = pd.DataFrame()
     graph_df = pd.DataFrame()
     io_cache_df = pd.DataFrame()
-    transactions = {}
+    transactions = pd.DataFrame()
 
 # --- Health endpoint ---
 @app.get("/health")
@@ -1,35 +1,32 @@
 from fastapi import FastAPI, Request
 import pandas as pd
-import json
-from pathlib import Path
+
+from agents.ai_model.src import storage
 
 app = FastAPI(title="Compliance Agent", version="1.0.0")
 
-# --- Resolve data directory relative to this file ---
-DATA_DIR = Path(__file__).resolve().parent.parent / "ai_model" / "data"
+# --- Feature artifacts and transactions come from the shared store (see storage.py) ---
+DATA_DIR = storage.DATA_DIR
 
-def safe_load_csv(filename: str) -> pd.DataFrame:
-    path = DATA_DIR / filename
+def safe_load_artifact(name: str) -> pd.DataFrame:
     try:
-        return pd.read_csv(path)
+        return storage.read_artifact(name, data_dir=DATA_DIR)
     except FileNotFoundError:
-        print(f"Warning: {filename} not found in {DATA_DIR}")
+        print(f"Warning: {name} artifact not found in {DATA_DIR}")
         return pd.DataFrame()
 
-def safe_load_json(filename: str):
-    path = DATA_DIR / filename
+def safe_load_transactions() -> pd.DataFrame:
     try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Warning: {filename} not found in {DATA_DIR}")
-        return {}
+        return storage.read_transactions(decode=False)
+    except Exception as e:
+        print(f"Warning: could not read transactions from {storage.TRANSACTIONS_DIR}: {e}")
+        return pd.DataFrame()
 
 # --- Load datasets safely ---
-anomaly_df = safe_load_csv("anomaly_results.csv")
-features_df = safe_load_csv("features.csv")
-graph_df = safe_load_csv("graph_features.csv")
-transactions = safe_load_json("transactions.json")
+anomaly_df = safe_load_artifact("anomaly_results")
+features_df = safe_load_artifact("features")
+graph_df = safe_load_artifact("graph_features")
+transactions = safe_load_transactions()
 
 @app.get("/health")
 def health():
@@ -8,11 +8,15 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+import asyncio
 import json
 import os
 import logging
 
-from agents.ai_model.src.inference import load_models, detect_anomaly, predict_risk, explain_prediction
+from agents.ai_model.src.inference import load_models
+from agents.ai_model.src.batch_inference import BatchingInferenceEngine, EngineOverloaded
+from agents.ai_model.src.batch_endpoint import make_batch_router
+from agents.ai_model.src.explanation_engine import ExplanationEngine, plot_path, render_force_plot, top_drivers
 from agents.ai_model.src.data_pipeline import build_features_from_addresses
 from agents.ai_model.src.feature_engineering import load_transactions
 from agents.ai_model.src.shap_explain import run_shap_pipeline
@@ -57,6 +61,7 @@ def health():
             model_cache["rf"] = rf_model
             model_cache["iso"] = iso_model
             model_cache["explainer"] = explainer
+            model_cache["models"] = True
         
         return {
             "status": "ready",
@@ -86,6 +91,7 @@ class PredictRequest(BaseModel):
     features: Dict[str, Any]
     include_explanation: bool = True
     include_shap: bool = True
+    include_plot: bool = False  # render a SHAP force plot in the background
 
 
 class PredictResponse(BaseModel):
@@ -100,8 +106,41 @@ class PredictResponse(BaseModel):
     inference_time_ms: float
 
 
+def get_engine() -> BatchingInferenceEngine:
+    """Shared batching engine over the cached models (loads them on first use)."""
+    if "models" not in model_cache:
+        rf_model, iso_model, explainer = load_models()
+        model_cache["rf"] = rf_model
+        model_cache["iso"] = iso_model
+        model_cache["explainer"] = explainer
+        model_cache["models"] = True
+    if "engine" not in model_cache:
+        engine_params = AITrainingConfig(created_at=datetime.now(), updated_at=datetime.now()).inference_engine
+        model_cache["engine"] = BatchingInferenceEngine.from_params(
+            model_cache["rf"], model_cache["iso"], engine_params
+        )
+    return model_cache["engine"]
+
+
+def get_explanation_engine() -> Optional[ExplanationEngine]:
+    """Warm, cached SHAP explainer over the cached risk model (None without an explainer)."""
+    get_engine()
+    if "explanation_engine" not in model_cache:
+        explainer = model_cache.get("explainer")
+        try:
+            model_cache["explanation_engine"] = ExplanationEngine.from_explainer(explainer, model=model_cache["rf"]) if explainer else None
+        except Exception as e:
+            logger.warning(f"Explanation engine unavailable: {e}")
+            model_cache["explanation_engine"] = None
+    return model_cache["explanation_engine"]
+
+
+# Bulk scoring: POST /predict/batch (NDJSON or Arrow IPC)
+app.include_router(make_batch_router(get_engine))
+
+
 @app.post("/predict")
-async def predict(req: PredictRequest):
+async def predict(req: PredictRequest, background_tasks: BackgroundTasks):
     """
     Run prediction using both Isolation Forest (anomaly detection)
     and Random Forest (risk scoring) models.
@@ -110,55 +149,45 @@ async def predict(req: PredictRequest):
     - risk_score: 0-1 probability from Random Forest
     - anomaly_score: decision score from Isolation Forest (-inf to +inf)
     - anomaly_flag: -1 (anomaly) or 1 (normal) from Isolation Forest
-    - explanation: SHAP explanation if requested
+    - explanation: SHAP explanation if requested (cached per feature vector;
+      include_plot renders the force plot after the response)
     """
     try:
         import time
         start_time = time.time()
         
         # Load models if not cached
-        if "models" not in model_cache:
-            rf_model, iso_model, explainer = load_models()
-            model_cache["rf"] = rf_model
-            model_cache["iso"] = iso_model
-            model_cache["explainer"] = explainer
-        
-        rf_model = model_cache.get("rf")
-        iso_model = model_cache.get("iso")
-        explainer = model_cache.get("explainer")
-        
-        # Convert features to DataFrame
-        import pandas as pd
-        features_df = pd.DataFrame([req.features])
+        engine = get_engine()
+        explanation_engine = get_explanation_engine()
         
-        # Run predictions
-        anomaly_score, anomaly_flag = detect_anomaly(iso_model, features_df)
-        risk_pred, risk_prob = predict_risk(rf_model, features_df)
+        # Run predictions (micro-batched with concurrent requests)
+        scores = await engine.score(req.features)
+        anomaly_score, anomaly_flag = scores["anomaly_score"], int(scores["is_anomaly"])
+        risk_pred, risk_prob = scores["risk_label"], scores["risk_probability"]
         
-        # Generate explanation if requested
+        # One SHAP computation (or cache hit) serves both the explanation and the raw values
         explanation = None
-        if req.include_explanation and explainer:
-            try:
-                explanation = explain_prediction(explainer, features_df)
-            except Exception as e:
-                logger.warning(f"Could not generate explanation: {e}")
-        
-        # Generate SHAP values if requested
         shap_values = None
-        if req.include_shap and explainer:
+        if (req.include_explanation or req.include_shap or req.include_plot) and explanation_engine:
             try:
-                shap_vals = explainer.shap_values(features_df[[col for col in features_df.columns if col in [
-                    "tx_count_24h", "total_value_24h", "largest_value_24h", "std_value_24h",
-                    "unique_counterparts_24h", "entropy_of_destinations", "share_of_daily_volume"
-                ]]])
-                if isinstance(shap_vals, list):
-                    shap_vals = shap_vals[1]  # Get class 1 (risk) SHAP values
-                shap_values = {
-                    "values": shap_vals.tolist() if hasattr(shap_vals, 'tolist') else shap_vals,
-                    "base_value": float(explainer.expected_value) if hasattr(explainer, 'expected_value') else 0.0,
-                }
+                shap_result = (await asyncio.to_thread(explanation_engine.explain_rows, [req.features]))[0]
+                if req.include_explanation:
+                    explanation = {
+                        "top_risk_drivers": top_drivers(shap_result),
+                        "base_value": shap_result["base_value"],
+                    }
+                if req.include_shap:
+                    shap_values = {
+                        "values": [list(shap_result["values"].values())],
+                        "feature_names": list(shap_result["values"]),
+                        "base_value": shap_result["base_value"],
+                    }
+                if req.include_plot:
+                    path = plot_path(req.transaction_id or req.wallet_address)
+                    background_tasks.add_task(render_force_plot, shap_result, path)
+                    explanation = {**(explanation or {}), "plot_path": path}
             except Exception as e:
-                logger.warning(f"Could not compute SHAP values: {e}")
+                logger.warning(f"Could not generate explanation: {e}")
         
         elapsed = time.time() - start_time
         
@@ -176,6 +205,8 @@ async def predict(req: PredictRequest):
             },
             inference_time_ms=elapsed * 1000,
         )
+    except EngineOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -15,7 +15,7 @@ from datetime import datetime
 
 class TransactionDataParams(BaseModel):
     """Parameters for loading transaction data"""
-    source: str = "agents/ai_model/data/transactions.json"
+    source: str = "agents/ai_model/data/transactions"  # Parquet dataset partitioned by day
     blockfrost_api_key: Optional[str] = None
     blockfrost_project: str = "mainnet"  # mainnet, testnet, preview
     max_blocks: int = 500
@@ -26,8 +26,8 @@ class TransactionDataParams(BaseModel):
 
 class DataIOParams(BaseModel):
     """Parameters for I/O caching and loading"""
-    io_cache_path: str = "agents/ai_model/data/io_cache.csv"
-    raw_json_path: str = "agents/ai_model/data/transactions.json"
+    io_path: str = "agents/ai_model/data/io"  # exploded IO Parquet dataset
+    raw_transactions_path: str = "agents/ai_model/data/transactions"
     ensure_cache: bool = True
     min_tx_per_address: int = 15
     pad_with_synthetic: bool = True
@@ -54,7 +54,7 @@ class EntropyFeatureParams(BaseModel):
 
 class DailyAggregationParams(BaseModel):
     """Parameters for daily feature aggregation"""
-    daily_features_path: str = "agents/ai_model/data/daily_features.csv"
+    daily_features_path: str = "agents/ai_model/data/daily_features.parquet"
     include_rolling_stats: bool = True
     rolling_window_days: int = 7
     compute_volatility: bool = True
@@ -66,10 +66,13 @@ class DailyAggregationParams(BaseModel):
 
 class GraphBuildParams(BaseModel):
     """Parameters for building transaction graph"""
-    graph_features_path: str = "agents/ai_model/data/graph_features.csv"
+    graph_features_path: str = "agents/ai_model/data/graph_features.parquet"
     edge_weight_method: str = "frequency"  # frequency, amount, time_decay
     time_decay_factor: float = 0.95
     min_edge_weight: int = 1
+    projection: str = "star"  # clique, star (large txs through a tx node), bipartite
+    clique_max_addresses: int = 16  # star: larger txs become a tx node
+    max_tx_addresses: int = 0  # txs with more addresses are dropped; 0 keeps all
 
 
 class GraphMetricsParams(BaseModel):
@@ -80,6 +83,8 @@ class GraphMetricsParams(BaseModel):
     compute_centrality: List[str] = ["betweenness", "closeness", "eigenvector"]
     centrality_approximation: bool = True
     k_neighbors_for_approximation: int = 100
+    refresh_batches: int = 24  # incremental updates: centralities / communities recomputed every N pulls
+    refresh_growth: float = 0.1  # ... or once the edge count grew by this fraction
 
 
 class CommunityDetectionParams(BaseModel):
@@ -245,10 +250,12 @@ class DataExportParams(BaseModel):
 class LivePipelineParams(BaseModel):
     """Parameters for live inference pipeline"""
     update_frequency_seconds: int = 3600  # 1 hour
+    incremental_features: bool = True  # update only addresses touched by new blocks
     batch_inference: bool = True
     batch_size: int = 100
     cache_predictions: bool = True
     cache_ttl_seconds: int = 86400  # 24 hours
+    cache_max_entries: int = 10000  # LRU bound of the orchestrator prediction cache
     alert_on_anomaly: bool = True
     alert_threshold: float = 0.85
 
@@ -275,7 +282,10 @@ class InferenceEngineParams(BaseModel):
     cache_models: bool = True
     async_inference: bool = True
     batch_processing: bool = True
+    max_batch_size: int = 64  # rows scored per model call
+    max_wait_ms: float = 2.0  # how long a batch waits to fill
     max_queue_size: int = 1000
+    compiled_trees: bool = True  # score from flattened tree arrays (tree_compiler)
 
 
 # =====================================
@@ -5,7 +5,6 @@ Wallet analysis endpoint was moved below app definition to ensure imports and ap
 
  
 import yaml
-import httpx
 import logging
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from typing import Dict, Any, Optional
@@ -14,12 +13,13 @@ from datetime import datetime
 
 # ✅ Import AgentRegistry and AgentDescriptor from registry
 from .registry import AgentRegistry, AgentDescriptor
+from .health import HealthCheckParams, HealthProber
 # ✅ Router logic
-from .router import route_request
-# ✅ Relative import for correlation_id
-from ..common.typing import correlation_id
+from .router import build_workflow_engine, route_request
+from .clients import agent_clients
+from .prediction_cache import prediction_cache
 # ✅ Import training config
-from .ai_training_params import AITrainingConfig
+from .ai_training_params import AITrainingConfig, LivePipelineParams
 # ✅ Import fetch_data router from sibling file
 from . import fetch_data
 
@@ -30,6 +30,9 @@ logger = logging.getLogger(__name__)
 # --- FastAPI app ---
 app = FastAPI(title="Masumi Orchestrator", version="1.0.0")
 registry = AgentRegistry()
+health_prober = HealthProber(registry, agent_clients)
+# Workflows compiled from config.yaml at startup
+workflow_engine = build_workflow_engine({})
 
 # --- Load config ---
 def load_config(path: Path = None) -> Dict[str, Any]:
@@ -44,9 +47,27 @@ def load_config(path: Path = None) -> Dict[str, Any]:
 def seed_agents():
     """Register agents from config.yaml at startup."""
     cfg = load_config()
+    registry.configure_health(HealthCheckParams(**((cfg.get("monitoring") or {}).get("health_checks") or {})))
     for a in cfg.get("agents", []):
         registry.register(AgentDescriptor(**a))
-    logger.info(f"✅ Registered {len(registry.list())} agents")
+    global workflow_engine
+    workflow_engine = build_workflow_engine(cfg.get("workflows") or {})
+    live = (cfg.get("training") or {}).get("live_pipeline") or {}
+    ai_model = next((a for a in registry.list() if a.name == "ai_model"), None)
+    prediction_cache.configure(LivePipelineParams(**live), model_version=ai_model.version if ai_model else None)
+    logger.info(f"✅ Registered {len(registry.list())} agents, {len(workflow_engine.names())} workflows")
+
+@app.on_event("startup")
+async def start_health_prober():
+    """Probe agent health in the background (feeds the circuit breakers)."""
+    if registry.health_params.enabled:
+        health_prober.start()
+
+@app.on_event("shutdown")
+async def close_agent_clients():
+    """Stop the health prober and close the pooled agent connections."""
+    await health_prober.stop()
+    await agent_clients.aclose()
 
 # --- Health endpoint for orchestrator ---
 @app.get("/masumi/health")
@@ -58,6 +79,7 @@ def orchestrator_health():
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
         "agents_registered": len(registry.list()),
+        "agents_healthy": sum(registry.healthy(a.name) for a in registry.list()),
     }
 
 # --- List all agents ---
@@ -65,7 +87,7 @@ def orchestrator_health():
 def list_agents():
     """List all registered agents with capabilities"""
     return {
-        "agents": [agent.to_dict() for agent in registry.list()],
+        "agents": [{**agent.to_dict(), "health": registry.health_snapshot(agent.name)} for agent in registry.list()],
         "total": len(registry.list()),
     }
 
@@ -81,27 +103,46 @@ def get_agent_details(name: str):
 
 # --- Proxy health check to specific agent ---
 @app.get("/masumi/agents/{name}/health")
-def agent_health(name: str):
-    """Check health of a specific agent"""
+async def agent_health(name: str, refresh: bool = False):
+    """
+    Health of a specific agent from the background prober (refresh=true probes now).
+    Includes per-endpoint circuit breaker state, latency EWMA and outstanding calls.
+    """
     try:
         agent = registry.get(name)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    headers = {"X-Correlation-ID": correlation_id(), "X-Agent-Version": agent.version}
+    replicas = registry.replicas(name)
+    if refresh or any(r.health.last_probe is None for r in replicas):
+        await health_prober.probe(name)
+    reachable = [r for r in replicas if r.health.last_probe["ok"]]
+    if not reachable:
+        raise HTTPException(
+            status_code=502, detail=f"Agent health unreachable: {replicas[0].health.last_probe['error']}"
+        )
+    data = dict(reachable[0].health.last_probe["response"])
+    data["_meta"] = {
+        "endpoint": agent.endpoint,
+        "version": agent.version,
+        "enabled": agent.enabled,
+        "balancing": agent.balancing,
+        **registry.health_snapshot(name),
+    }
+    return data
+
+# --- Drain / undrain one endpoint of an agent ---
+@app.post("/masumi/agents/{name}/endpoints/drain")
+def drain_agent_endpoint(name: str, url: str, draining: bool = True):
+    """
+    Stop (or resume) sending new calls to one replica; in-flight calls finish.
+    """
     try:
-        with httpx.Client(timeout=5.0) as client:
-            resp = client.get(f"{agent.endpoint}/health", headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        data["_meta"] = {
-            "endpoint": agent.endpoint,
-            "version": agent.version,
-            "enabled": agent.enabled,
-        }
-        return data
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Agent health unreachable: {e}")
+        replica = registry.set_draining(name, url, draining)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    logger.info(f"{'🚧 Draining' if draining else '✅ Undrained'} {name} endpoint {url}")
+    return {"agent": name, **replica.snapshot()}
 
 # --- Route workflow requests ---
 @app.post("/masumi/route")
@@ -111,14 +152,18 @@ async def route(req: Request):
     Supported workflows:
     - settle: Payment settlement with risk assessment
     - ai_predict: AI prediction only
+    - ai_predict_batch: Bulk AI scoring (NDJSON stream to the agent)
     - ai_train: Initialize training pipeline
     - ai_train_run: Execute training pipeline
     - ai_config: Get/update training config
     - data_quality: Assess data quality
+    Workflows are defined in config.yaml (`workflows:`) and compiled at startup.
     """
     try:
         body = await req.json()
-        return route_request(registry, body)
+        return await route_request(registry, body, workflow_engine)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Routing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -143,7 +188,7 @@ def get_training_config():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/masumi/training/config/apply")
-def apply_training_config(config_dict: Dict[str, Any]):
+async def apply_training_config(config_dict: Dict[str, Any]):
     """
     Apply training configuration to AI model agent
     """
@@ -163,7 +208,7 @@ def apply_training_config(config_dict: Dict[str, Any]):
             }
         }
         
-        result = route_request(registry, payload)
+        result = await route_request(registry, payload, workflow_engine)
         return {
             "status": "applied",
             "config_version": config.config_version,
@@ -194,7 +239,7 @@ async def initialize_training(config: Optional[Dict[str, Any]] = None):
             "config": config or {},
         }
     }
-    return route_request(registry, payload)
+    return await route_request(registry, payload, workflow_engine)
 
 @app.post("/masumi/training/run/{pipeline_id}")
 async def run_training(pipeline_id: str, background_tasks: BackgroundTasks):
@@ -205,7 +250,7 @@ async def run_training(pipeline_id: str, background_tasks: BackgroundTasks):
             "pipeline_id": pipeline_id,
         }
     }
-    return route_request(registry, payload)
+    return await route_request(registry, payload, workflow_engine)
 
 @app.get("/masumi/training/pipeline/{pipeline_id}")
 async def get_pipeline_status(pipeline_id: str):
@@ -217,7 +262,7 @@ async def get_pipeline_status(pipeline_id: str):
             "action": "status",
         }
     }
-    return route_request(registry, payload)
+    return await route_request(registry, payload, workflow_engine)
 
 # --- AI Prediction Endpoints ---
 
@@ -242,7 +287,7 @@ async def predict_risk(
             "include_shap": include_shap,
         }
     }
-    return route_request(registry, payload)
+    return await route_request(registry, payload, workflow_engine)
 
 
 @app.post("/masumi/analyze-wallet")
@@ -281,7 +326,7 @@ async def analyze_wallet(req: Request):
         }
 
         # Route to AI model through route_request
-        result = route_request(registry, ai_payload)
+        result = await route_request(registry, ai_payload, workflow_engine)
 
         # Extract AI response
         ai_response = result.get("prediction", {}).get("response", {})
@@ -298,6 +343,24 @@ async def analyze_wallet(req: Request):
         logger.error(f"Wallet analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Prediction Cache ---
+
+@app.get("/masumi/cache/stats")
+def prediction_cache_stats():
+    """Hit/miss counters of the orchestrator prediction cache"""
+    return prediction_cache.stats()
+
+
+@app.post("/masumi/cache/invalidate")
+def invalidate_prediction_cache(model_version: Optional[str] = None):
+    """
+    Drop cached predictions, e.g. after new models are deployed (pass their version so
+    later predictions are keyed on it).
+    """
+    dropped = prediction_cache.invalidate(model_version)
+    logger.info(f"🧹 Prediction cache invalidated: {dropped} entries, model_version={prediction_cache.model_version}")
+    return {"status": "success", "dropped": dropped, "model_version": prediction_cache.model_version}
+
 # --- Data Quality Assessment ---
 
 @app.post("/masumi/data/quality")
@@ -307,7 +370,7 @@ async def assess_data_quality(data: Dict[str, Any]):
         "workflow": "data_quality",
         "payload": data,
     }
-    return route_request(registry, payload)
+    return await route_request(registry, payload, workflow_engine)
 
 # --- Orchestrator Statistics ---
 
@@ -321,6 +384,7 @@ def get_orchestrator_stats():
             {
                 "name": agent.name,
                 "endpoint": agent.endpoint,
+                "endpoints": [e.url for e in agent.endpoints],
                 "capabilities": agent.capabilities,
                 "version": agent.version,
                 "enabled": agent.enabled,
@@ -329,6 +393,7 @@ def get_orchestrator_stats():
         ],
         "workflows_configured": list(cfg.get("workflows", {}).keys()),
         "training_enabled": cfg.get("training", {}).get("enabled", False),
+        "prediction_cache": prediction_cache.stats(),
     }
 
 # --- Include fetch_data router ---
@@ -0,0 +1,59 @@
+"""
+clients.py
+Pooled async HTTP clients for orchestrator -> agent calls.
+- One httpx.AsyncClient per agent endpoint, reused for every call so connections stay
+  alive between requests (no TCP/TLS setup per call).
+- Clients are created lazily on first use and closed at orchestrator shutdown.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+import httpx
+
+DEFAULT_TIMEOUT = 30.0
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+
+class AgentClientPool:
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+    ):
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, endpoint: str) -> httpx.AsyncClient:
+        """
+        Shared client for an agent endpoint (base URL).
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Clients are bound to the loop that opened their connections
+            self._clients = {}
+            self._loop = loop
+        client = self._clients.get(endpoint)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(base_url=endpoint, timeout=self.timeout, limits=self.limits)
+            self._clients[endpoint] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+# Shared by the router and the orchestrator app
+agent_clients = AgentClientPool()
@@ -7,7 +7,7 @@ router = APIRouter()
 def fetch_data():
     """
     Trigger live pipeline to pull latest blockchain transactions
-    and save them into agents/ai_model/data/transactions.json.
+    and append them to the Parquet store (agents/ai_model/data/transactions/, see storage.py).
     """
     try:
         live_pipeline.build_live_data(max_blocks=50)  # adjust block count as needed
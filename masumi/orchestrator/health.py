@@ -0,0 +1,235 @@
+"""
+health.py
+Live agent health for the orchestrator registry.
+- CircuitBreaker: error-rate breaker (closed -> open -> half_open -> closed). While
+  open, calls to the endpoint fail immediately instead of waiting for a timeout.
+- AgentHealth: breaker + latency EWMA + the last /health probe result, one per agent
+  endpoint (registry Replica).
+- HealthProber: background task probing every endpoint of every enabled agent, so the
+  health API answers from memory and a dead agent is detected without real traffic.
+Configured from the `monitoring.health_checks` section of config.yaml.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel
+
+from ..common.typing import correlation_id
+
+if TYPE_CHECKING:
+    from .clients import AgentClientPool
+    from .registry import AgentRegistry, Replica
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class HealthCheckParams(BaseModel):
+    """Parameters for agent health probes and circuit breakers"""
+    enabled: bool = True
+    interval_seconds: float = 10.0
+    timeout_seconds: float = 2.0
+    window_size: int = 20  # recent calls considered for the error rate
+    min_calls: int = 5  # calls in the window before the breaker may open
+    error_rate_threshold: float = 0.5
+    open_seconds: float = 30.0  # cooldown before a half-open trial call
+    probe_failures_to_open: int = 2  # consecutive failed probes open the breaker
+    ewma_alpha: float = 0.2
+
+
+# -------------------------------
+# Circuit breaker
+# -------------------------------
+
+class CircuitBreaker:
+    def __init__(self, params: HealthCheckParams, clock: Callable[[], float] = time.monotonic):
+        self.params = params
+        self._clock = clock
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self._outcomes: Deque[bool] = deque(maxlen=params.window_size)
+        self._trial_in_flight = False
+
+    @property
+    def error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def available(self) -> bool:
+        """
+        Whether allow() would let a call through, without reserving the half-open trial.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self._clock() - self.opened_at >= self.params.open_seconds
+        return not self._trial_in_flight
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through. After the open cooldown one trial call is let
+        through (half_open); its outcome closes or re-opens the breaker.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self._clock() - self.opened_at < self.params.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record(self, ok: bool) -> None:
+        if self.state == CLOSED:
+            self._outcomes.append(ok)
+            if len(self._outcomes) >= self.params.min_calls and self.error_rate >= self.params.error_rate_threshold:
+                self.trip()
+        elif ok:
+            # A successful trial call closes the breaker with a clean window
+            self.state = CLOSED
+            self.opened_at = None
+            self._outcomes.clear()
+            self._trial_in_flight = False
+        else:
+            self.trip()
+
+    def trip(self) -> None:
+        """
+        Open the breaker regardless of the error rate (e.g. the agent fails its probes).
+        """
+        self.state = OPEN
+        self.opened_at = self._clock()
+        self._trial_in_flight = False
+
+
+# -------------------------------
+# Per-agent health
+# -------------------------------
+
+class AgentHealth:
+    def __init__(self, params: HealthCheckParams):
+        self.params = params
+        self.breaker = CircuitBreaker(params)
+        self.latency_ewma_ms: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.probe_failures = 0  # consecutive
+        self.last_probe: Optional[Dict[str, Any]] = None
+
+    def record(self, ok: bool, latency_ms: Optional[float] = None) -> None:
+        self.calls += 1
+        self.failures += not ok
+        if ok and latency_ms is not None:
+            alpha = self.params.ewma_alpha
+            self.latency_ewma_ms = (
+                latency_ms if self.latency_ewma_ms is None
+                else alpha * latency_ms + (1 - alpha) * self.latency_ewma_ms
+            )
+        self.breaker.record(ok)
+
+    def record_probe(self, probe: Dict[str, Any]) -> None:
+        """
+        Keep the probe result. Probes never reach breaker.record(): only real calls close a
+        breaker (via the half-open trial); consecutive failed probes can only open it.
+        """
+        self.last_probe = probe
+        self.probe_failures = 0 if probe["ok"] else self.probe_failures + 1
+        if self.probe_failures >= self.params.probe_failures_to_open and self.breaker.state == CLOSED:
+            self.breaker.trip()
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state == CLOSED and (self.last_probe is None or self.last_probe["ok"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "error_rate": round(self.breaker.error_rate, 4),
+            "latency_ewma_ms": round(self.latency_ewma_ms, 2) if self.latency_ewma_ms is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "last_probe": self.last_probe,
+        }
+
+
+# -------------------------------
+# Background prober
+# -------------------------------
+
+class HealthProber:
+    """
+    Probes GET /health on every endpoint of every enabled agent each interval_seconds:
+
+        prober = HealthProber(registry, agent_clients)
+        prober.start()   # at startup, inside the event loop
+        await prober.stop()
+    """
+
+    def __init__(self, registry: "AgentRegistry", clients: "AgentClientPool"):
+        self.registry = registry
+        self.clients = clients
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Probe every endpoint of one agent now; results are recorded on its replicas
+        and returned in endpoint order.
+        """
+        agent = self.registry.get(name)
+        return list(await asyncio.gather(*(self._probe(agent, r) for r in self.registry.replicas(name))))
+
+    async def _probe(self, agent, replica: "Replica") -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            client = self.clients.get(replica.url)
+            resp = await client.get(
+                "/health",
+                headers={"X-Correlation-ID": correlation_id(), "X-Agent-Version": agent.version},
+                timeout=self.registry.health_params.timeout_seconds,
+            )
+            resp.raise_for_status()
+            probe = {"ok": True, "response": resp.json()}
+        except (httpx.HTTPError, ValueError) as e:
+            probe = {"ok": False, "error": str(e) or type(e).__name__}
+        probe.update(
+            latency_ms=round((time.perf_counter() - started) * 1000, 2),
+            checked_at=datetime.now().isoformat(),
+        )
+        replica.health.record_probe(probe)
+        return probe
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self.probe(a.name) for a in self.registry.list() if a.enabled))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {e}")
+            await asyncio.sleep(self.registry.health_params.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
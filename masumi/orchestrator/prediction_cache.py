@@ -0,0 +1,157 @@
+"""
+prediction_cache.py
+TTL + LRU cache of AI agent predictions in the orchestrator.
+- Keyed on common.typing.canonical_hash of the request (capability, identifiers,
+  features and flags) plus the current model version, so a UI polling the same wallet
+  is served from memory instead of re-scoring.
+- Single flight: concurrent identical requests share one in-flight agent call.
+- invalidate() drops every entry (optionally switching the model version) when new
+  models are deployed; stats() exposes hit/miss counters.
+Configured from LivePipelineParams (cache_predictions, cache_ttl_seconds, cache_max_entries).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..common.typing import canonical_hash
+
+DEFAULT_TTL_SECONDS = 86400
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        model_version: str = "unversioned",
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.model_version = model_version
+        self.enabled = enabled
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters: Dict[str, int] = {
+            "hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evicted": 0, "invalidated": 0,
+        }
+
+    def configure(self, params, model_version: Optional[str] = None) -> None:
+        """
+        Apply LivePipelineParams-like settings; missing attributes keep the current ones.
+        """
+        self.enabled = getattr(params, "cache_predictions", self.enabled)
+        self.ttl_seconds = getattr(params, "cache_ttl_seconds", self.ttl_seconds)
+        self.max_entries = getattr(params, "cache_max_entries", self.max_entries)
+        if model_version is not None:
+            self.model_version = model_version
+
+    def key(self, request: Dict[str, Any]) -> str:
+        return f"{self.model_version}:{canonical_hash(request)}"
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evicted"] += 1
+
+    async def get_or_compute(
+        self,
+        request: Dict[str, Any],
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        cacheable: Callable[[Dict[str, Any]], bool] = lambda result: True,
+    ) -> Dict[str, Any]:
+        """
+        Cached result for request, else compute() once for all concurrent callers.
+        Only results accepted by cacheable() are stored. Returns a shallow copy with
+        "cached": True when served from the cache or an in-flight call.
+        """
+        if not self.enabled:
+            return await compute()
+        key = self.key(request)
+        value = self._get(key)
+        if value is not None:
+            self._counters["hits"] += 1
+            return {**value, "cached": True}
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                value = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The leading call was cancelled (e.g. its step timed out), not this one
+                if not inflight.cancelled():
+                    raise
+            else:
+                self._counters["coalesced"] += 1
+                return {**value, "cached": True}
+            return await self.get_or_compute(request, compute, cacheable)
+
+        self._counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so an exception without waiters is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            if cacheable(value):
+                self._put(key, value)
+            future.set_result(value)
+            return dict(value)
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, model_version: Optional[str] = None) -> int:
+        """
+        Drop every cached prediction; switch to model_version if given. Returns the
+        number of entries dropped.
+        """
+        dropped = len(self._entries)
+        self._entries.clear()
+        self._counters["invalidated"] += dropped
+        if model_version is not None:
+            self.model_version = model_version
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["hits"] + self._counters["coalesced"] + self._counters["misses"]
+        served = self._counters["hits"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hit_rate": served / lookups if lookups else 0.0,
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "model_version": self.model_version,
+        }
+
+
+# Shared by the router's cached_call executor and the orchestrator app
+prediction_cache = PredictionCache()
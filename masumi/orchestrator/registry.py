@@ -1,11 +1,27 @@
-from typing import List, Dict, Any
-from pydantic import BaseModel
+import random
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field
+
+from .health import AgentHealth, HealthCheckParams
+
+# Replica selection strategies (AgentDescriptor.balancing)
+LEAST_OUTSTANDING = "least_outstanding"
+POWER_OF_TWO = "p2c"
+
+
+class AgentEndpoint(BaseModel):
+    url: str
+    weight: float = 1.0
+    draining: bool = False  # finish in-flight calls, take no new ones
 
 
 class AgentDescriptor(BaseModel):
     name: str
     capabilities: List[str]
-    endpoint: str
+    # Single endpoint, or `endpoints` for several replicas of the same agent
+    endpoint: Optional[str] = None
+    endpoints: List[AgentEndpoint] = Field(default_factory=list)
+    balancing: str = LEAST_OUTSTANDING  # least_outstanding | p2c
     auth: Dict[str, Any]
     version: str
     enabled: bool
@@ -19,12 +35,50 @@ class AgentDescriptor(BaseModel):
         return self.dict()                # Pydantic v1
 
 
+class Replica:
+    """
+    One endpoint of an agent: its live health and in-flight call count.
+    """
+
+    def __init__(self, endpoint: AgentEndpoint, health: AgentHealth):
+        self.endpoint = endpoint
+        self.health = health
+        self.outstanding = 0
+
+    @property
+    def url(self) -> str:
+        return self.endpoint.url
+
+    @property
+    def load(self) -> float:
+        return (self.outstanding + 1) / max(self.endpoint.weight, 1e-9)
+
+    def release(self, ok: bool, latency_ms: Optional[float] = None) -> None:
+        """
+        End a call started by AgentRegistry.acquire and record its outcome.
+        """
+        self.outstanding -= 1
+        self.health.record(ok, latency_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.endpoint.model_dump(), "outstanding": self.outstanding, **self.health.snapshot()}
+
+
 class AgentRegistry:
-    def __init__(self):
+    def __init__(self, health_params: Optional[HealthCheckParams] = None):
         self._agents: Dict[str, AgentDescriptor] = {}
+        self._replicas: Dict[str, List[Replica]] = {}
+        self.health_params = health_params or HealthCheckParams()
 
     def register(self, agent: AgentDescriptor):
+        if not agent.endpoints:
+            if not agent.endpoint:
+                raise ValueError(f"Agent '{agent.name}' needs an endpoint or endpoints")
+            agent.endpoints = [AgentEndpoint(url=agent.endpoint)]
+        # `endpoint` stays the primary URL for display and older callers
+        agent.endpoint = agent.endpoints[0].url
         self._agents[agent.name] = agent
+        self._replicas[agent.name] = [Replica(e, AgentHealth(self.health_params)) for e in agent.endpoints]
 
     def get(self, name: str) -> AgentDescriptor:
         if name not in self._agents:
@@ -32,4 +86,70 @@ class AgentRegistry:
         return self._agents[name]
 
     def list(self) -> List[AgentDescriptor]:
-        return list(self._agents.values())
\ No newline at end of file
+        return list(self._agents.values())
+
+    def configure_health(self, params: HealthCheckParams) -> None:
+        """
+        Replace the health settings; breakers and latency stats start over.
+        """
+        self.health_params = params
+        for replicas in self._replicas.values():
+            for replica in replicas:
+                replica.health = AgentHealth(params)
+
+    # -------------------------------
+    # Replicas and load balancing
+    # -------------------------------
+
+    def replicas(self, name: str) -> List[Replica]:
+        self.get(name)
+        return self._replicas[name]
+
+    def replica(self, name: str, url: str) -> Replica:
+        for replica in self.replicas(name):
+            if replica.url == url:
+                return replica
+        raise KeyError(f"Agent '{name}' has no endpoint {url}")
+
+    def set_draining(self, name: str, url: str, draining: bool = True) -> Replica:
+        replica = self.replica(name, url)
+        replica.endpoint.draining = draining
+        return replica
+
+    def acquire(self, name: str) -> Optional[Replica]:
+        """
+        Pick a replica for one call (least outstanding requests per unit of weight, or
+        the better of two weighted random picks for p2c). Draining replicas and replicas
+        with an open circuit breaker are skipped; None means every replica is
+        unavailable and the caller should fail fast. Pair with Replica.release.
+        """
+        agent = self.get(name)
+        check = self.health_params.enabled
+        candidates = [
+            r for r in self._replicas[name]
+            if not r.endpoint.draining and r.endpoint.weight > 0 and (not check or r.health.breaker.available())
+        ]
+        if not candidates:
+            return None
+        if agent.balancing == POWER_OF_TWO and len(candidates) > 2:
+            weights = [r.endpoint.weight for r in candidates]
+            candidates = random.choices(candidates, weights=weights, k=2)
+        low = min(r.load for r in candidates)
+        replica = random.choice([r for r in candidates if r.load == low])
+        if check and not replica.health.breaker.allow():
+            return None
+        replica.outstanding += 1
+        return replica
+
+    # -------------------------------
+    # Live health
+    # -------------------------------
+
+    def healthy(self, name: str) -> bool:
+        return any(r.health.healthy and not r.endpoint.draining for r in self.replicas(name))
+
+    def health_snapshot(self, name: str) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy(name),
+            "replicas": [r.snapshot() for r in self.replicas(name)],
+        }
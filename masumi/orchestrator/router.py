@@ -1,18 +1,40 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
+import asyncio
+import json
+import time
 import httpx
 from fastapi import HTTPException
 import logging
 
+from .clients import agent_clients
+from .prediction_cache import prediction_cache
 from .registry import AgentRegistry
-from .ai_training_params import AITrainingConfig
+from .workflow_engine import StepExecutor, WorkflowEngine, WorkflowStep
+from .ai_training_params import AITrainingConfig, LivePipelineParams
 from ..common.typing import correlation_id
 
 logger = logging.getLogger(__name__)
 
+# Concurrent per-row predict calls when ai_predict_batch runs without batch inference
+ROW_CONCURRENCY = 16
 
-def call_agent(registry: AgentRegistry, agent_name: str, capability: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+
+def _timeout(timeout: Optional[float]):
+    return timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+
+
+async def call_agent(
+    registry: AgentRegistry,
+    agent_name: str,
+    capability: str,
+    payload: Dict[str, Any],
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
     """
-    Helper to call a registered agent by name and capability.
+    Helper to call a registered agent by name and capability over its pooled
+    keep-alive client (timeout overrides the client's 30s default).
+    The endpoint is picked by the registry's load balancer; fails fast without a
+    request when every endpoint is draining or has an open circuit breaker.
     Includes correlation tracking and error handling.
     """
     try:
@@ -25,175 +47,280 @@ def call_agent(registry: AgentRegistry, agent_name: str, capability: str, payloa
         "X-Agent-Version": agent.version,
     }
 
+    replica = registry.acquire(agent.name)
+    if replica is None:
+        error = f"Agent '{agent_name}' has no available endpoint (circuit open or draining)"
+        logger.warning(error)
+        return _agent_failure(agent.name, capability, payload, error)
+
+    started = time.perf_counter()
+    ok, latency_ms = False, None
     try:
-        with httpx.Client(timeout=30.0) as client:
-            resp = client.post(f"{agent.endpoint}/{capability}", json=payload, headers=headers)
+        client = agent_clients.get(replica.url)
+        resp = await client.post(f"/{capability}", json=payload, headers=headers, timeout=_timeout(timeout))
         resp.raise_for_status()
+        data = resp.json()
+        ok, latency_ms = True, (time.perf_counter() - started) * 1000
+    except httpx.HTTPError as e:
+        logger.error(f"Agent '{agent_name}' call failed ({replica.url}): {e}")
+        ok = _is_client_error(e)
+        return _agent_failure(agent.name, capability, payload, str(e))
+    finally:
+        # Cancellation by a step/workflow deadline counts against the endpoint
+        replica.release(ok, latency_ms)
+
+    return {
+        "agent": agent.name,
+        "capability": capability,
+        "status": "success",
+        "response": data,
+        "endpoint": replica.url,
+    }
+
+
+def _is_client_error(e: httpx.HTTPError) -> bool:
+    """
+    4xx responses mean the request was wrong, not that the agent is unhealthy.
+    """
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
+
+
+def _agent_failure(agent_name: str, capability: str, payload: Any, error: str) -> Dict[str, Any]:
+    # Fallback: if AI agent is unavailable, return a lightweight mock prediction
+    if agent_name == "ai_model":
+        logger.warning("Returning mock AI prediction due to agent call failure")
+        # build a mock response consistent with ai_predict expectations
+        features = payload.get("features") if isinstance(payload, dict) else {}
+        mock_prediction = {
+            "risk_score": 0.5,
+            "risk_label": "MEDIUM",
+            "anomaly_score": 0.1,
+            "is_anomaly": False,
+            "confidence": 0.75,
+            "feature_importance": {k: 1.0 / max(1, len(features)) for k in (features.keys() or [])},
+            "top_risk_drivers": [],
+            "narrative": "Mock prediction returned because AI agent was unreachable.",
+        }
         return {
-            "agent": agent.name,
+            "agent": agent_name,
             "capability": capability,
             "status": "success",
-            "response": resp.json(),
+            "response": mock_prediction,
+            "fallback": True,
         }
-    except httpx.HTTPError as e:
-        logger.error(f"Agent '{agent_name}' call failed: {e}")
-        # Fallback: if AI agent is unavailable, return a lightweight mock prediction
-        if agent.name == "ai_model":
-            logger.warning("Returning mock AI prediction due to agent call failure")
-            # build a mock response consistent with ai_predict expectations
-            features = payload.get("features") if isinstance(payload, dict) else {}
-            mock_prediction = {
-                "risk_score": 0.5,
-                "risk_label": "MEDIUM",
-                "anomaly_score": 0.1,
-                "is_anomaly": False,
-                "confidence": 0.75,
-                "feature_importance": {k: 1.0 / max(1, len(features)) for k in (features.keys() or [])},
-                "top_risk_drivers": [],
-                "narrative": "Mock prediction returned because AI agent was unreachable.",
-            }
-            return {
-                "agent": agent.name,
-                "capability": capability,
-                "status": "success",
-                "response": mock_prediction,
-            }
 
+    return {
+        "agent": agent_name,
+        "capability": capability,
+        "status": "error",
+        "error": error,
+    }
+
+
+# Stored feature tables a batch workflow may score (agents/ai_model/src/storage.py artifacts)
+BATCH_ARTIFACTS = ("features", "daily_features", "graph_features", "anomaly_results")
+
+
+def _artifact_model_inputs(name: str) -> List[Dict[str, Any]]:
+    """
+    Project a stored artifact onto the models' 24h inputs: the artifacts hold lifetime /
+    daily aggregates (tx_count, total_received, ...), so the inputs of every address in
+    it are recomputed from the stored IO (feature_engineering.assemble_model_inputs).
+    """
+    from agents.ai_model.src import feature_engineering, storage
+    addresses = storage.read_artifact(name, columns=["address"])["address"]
+    frame = feature_engineering.assemble_model_inputs(feature_engineering.load_io(), addresses)
+    return frame.to_dict(orient="records")
+
+
+async def _load_rows(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Feature rows for a batch workflow: inline `rows` (already model inputs), or the
+    addresses of a stored feature `artifact` (one of BATCH_ARTIFACTS), projected onto
+    the model inputs off the event loop.
+    """
+    if payload.get("rows") is not None:
+        return list(payload["rows"])
+    name = payload.get("artifact")
+    if not name:
+        raise HTTPException(status_code=400, detail="rows or artifact required for ai_predict_batch")
+    if name not in BATCH_ARTIFACTS:
+        raise HTTPException(status_code=400, detail=f"Unknown artifact {name!r}; expected one of {list(BATCH_ARTIFACTS)}")
+    try:
+        return await asyncio.to_thread(_artifact_model_inputs, name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+async def stream_agent_batch(
+    registry: AgentRegistry,
+    agent_name: str,
+    rows: List[Dict[str, Any]],
+    chunk_rows: int,
+    timeout: float = 300.0,
+) -> Dict[str, Any]:
+    """
+    Score many feature rows with one streaming NDJSON call to the agent's predict/batch.
+    """
+    try:
+        agent = registry.get(agent_name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    headers = {
+        "X-Correlation-ID": correlation_id(),
+        "X-Agent-Version": agent.version,
+        "Content-Type": "application/x-ndjson",
+    }
+
+    async def body() -> AsyncIterator[bytes]:
+        for row in rows:
+            yield (json.dumps(row, default=str) + "\n").encode("utf-8")
+
+    results: List[Dict[str, Any]] = []
+    replica = registry.acquire(agent.name)
+    if replica is None:
         return {
             "agent": agent.name,
-            "capability": capability,
+            "capability": "predict/batch",
+            "status": "error",
+            "error": f"Agent '{agent_name}' has no available endpoint (circuit open or draining)",
+            "results": results,
+        }
+    started = time.perf_counter()
+    ok, latency_ms = False, None
+    try:
+        client = agent_clients.get(replica.url)
+        async with client.stream(
+            "POST", "/predict/batch",
+            params={"chunk_rows": chunk_rows}, content=body(), headers=headers, timeout=timeout,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    results.append(json.loads(line))
+        ok, latency_ms = True, (time.perf_counter() - started) * 1000
+    except httpx.HTTPError as e:
+        logger.error(f"Agent '{agent_name}' batch call failed ({replica.url}): {e}")
+        ok = _is_client_error(e)
+        return {
+            "agent": agent.name,
+            "capability": "predict/batch",
             "status": "error",
             "error": str(e),
+            "results": results,
         }
+    finally:
+        replica.release(ok, latency_ms)
 
+    return {
+        "agent": agent.name,
+        "capability": "predict/batch",
+        "status": "success",
+        "results": results,
+        "endpoint": replica.url,
+    }
 
-def route_request(registry: AgentRegistry, body: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Orchestrator routing logic: decides which agents to call for a workflow.
-    Supports payment settlement, AI training, and predictions.
-    """
-    workflow = body.get("workflow")
-    payload = body.get("payload", {})
-    steps: List[Dict[str, Any]] = []
-
-    if workflow == "settle":
-        # Workflow: Payment Settlement with Risk Scoring
-        # Step 1: AI model prediction (risk assessment)
-        ai_step = call_agent(registry, "ai_model", "predict", {
-            "wallet_address": payload.get("wallet_address"),
-            "transaction_id": payload.get("transaction_id"),
-            "features": payload.get("features", {}),
-            "include_explanation": True,
-            "include_shap": True,
-        })
-        steps.append(ai_step)
-
-        # Extract risk score
-        risk_score = None
-        if ai_step.get("status") == "success":
-            risk_score = ai_step.get("response", {}).get("risk_score")
-
-        # Step 2: Compliance scoring (conditional on risk)
-        if risk_score is None or risk_score > 0.5:
-            compliance_step = call_agent(registry, "compliance", "score_payment", payload)
-            steps.append(compliance_step)
-
-        # Step 3: Payment validation
-        payment_step = call_agent(registry, "payment", "validate_settle", payload)
-        steps.append(payment_step)
-
-        # Final decision
-        all_successful = all(step.get("status") == "success" for step in steps)
-        final_decision = {
-            "approved": all_successful,
-            "workflow": workflow,
-            "subject_id": body.get("subject_id"),
-            "actor_roles": body.get("actor_roles", []),
-            "risk_score": risk_score,
-            "steps_completed": len([s for s in steps if s.get("status") == "success"]),
-        }
-        
-        return {
-            "steps": steps,
-            "final_decision": final_decision,
-            "correlation_id": body.get("correlation_id"),
-        }
 
-    elif workflow == "ai_predict":
-        # Workflow: AI Prediction Only (Anomaly Detection + Risk Scoring)
-        ai_step = call_agent(registry, "ai_model", "predict", {
-            "wallet_address": payload.get("wallet_address"),
-            "transaction_id": payload.get("transaction_id"),
-            "features": payload.get("features", {}),
-            "include_explanation": payload.get("include_explanation", True),
-            "include_shap": payload.get("include_shap", True),
-        })
-        steps.append(ai_step)
+# -------------------------------
+# Workflow step executors
+# -------------------------------
 
-        return {
-            "workflow": workflow,
-            "prediction": ai_step.get("response"),
-            "status": ai_step.get("status"),
-            "correlation_id": body.get("correlation_id"),
-        }
+async def _call_step(
+    registry: AgentRegistry, step: WorkflowStep, capability: str, payload: Any, timeout: Optional[float]
+) -> Dict[str, Any]:
+    return await call_agent(registry, step.agent, capability, payload, timeout=timeout)
 
-    elif workflow == "ai_train":
-        # Workflow: AI Model Training Pipeline
-        # Initialize training pipeline with all parameters
-        config_dict = payload.get("config")
-        ai_step = call_agent(registry, "ai_model", "train/initialize", {
-            "pipeline_name": payload.get("pipeline_name", "aurev-guard-training"),
-            "config": config_dict,
-        })
-        steps.append(ai_step)
 
-        return {
-            "workflow": workflow,
-            "training_initialization": ai_step.get("response"),
-            "status": ai_step.get("status"),
-            "correlation_id": body.get("correlation_id"),
-        }
+async def _cached_call_step(
+    registry: AgentRegistry, step: WorkflowStep, capability: str, payload: Any, timeout: Optional[float]
+) -> Dict[str, Any]:
+    """
+    call_agent through the prediction cache: the same request (identifiers, features and
+    flags) against the same model version is scored once. Identifiers stay in the key
+    because the agent echoes them (wallet_address, plot paths) in its response.
+    Mock fallbacks and errors, including agent-level errors returned with HTTP 200,
+    are never cached.
+    """
+    request = {"agent": step.agent, "capability": capability, "payload": payload}
+    return await prediction_cache.get_or_compute(
+        request,
+        lambda: call_agent(registry, step.agent, capability, payload, timeout=timeout),
+        cacheable=_cacheable,
+    )
 
-    elif workflow == "ai_train_run":
-        # Workflow: Run AI Training Pipeline
-        pipeline_id = payload.get("pipeline_id")
-        if not pipeline_id:
-            raise HTTPException(status_code=400, detail="pipeline_id required for ai_train_run")
 
-        ai_step = call_agent(registry, "ai_model", f"train/run/{pipeline_id}", payload)
-        steps.append(ai_step)
+def _cacheable(result: Dict[str, Any]) -> bool:
+    response = result.get("response")
+    return (
+        result.get("status") == "success"
+        and not result.get("fallback")
+        and not (isinstance(response, dict) and response.get("status") == "error")
+    )
 
-        return {
-            "workflow": workflow,
-            "pipeline_id": pipeline_id,
-            "status": ai_step.get("status"),
-            "correlation_id": body.get("correlation_id"),
-        }
 
-    elif workflow == "ai_config":
-        # Workflow: Get/Update AI Training Configuration
-        ai_step = call_agent(registry, "ai_model", "config/training", payload)
-        steps.append(ai_step)
+async def _predict_batch_step(
+    registry: AgentRegistry, step: WorkflowStep, capability: str, payload: Any, timeout: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Bulk scoring (e.g. nightly rescoring of the features population): one NDJSON stream
+    to the agent's predict/batch, or one predict call per row when batch_inference is off.
+    """
+    params = LivePipelineParams(**{
+        k: payload[k] for k in ("batch_inference", "batch_size") if k in payload
+    })
+    rows = await _load_rows(payload)
 
-        return {
-            "workflow": workflow,
-            "config": ai_step.get("response"),
-            "status": ai_step.get("status"),
-            "correlation_id": body.get("correlation_id"),
-        }
+    if params.batch_inference:
+        ai_step = await stream_agent_batch(
+            registry, step.agent, rows, chunk_rows=params.batch_size, timeout=timeout or 300.0
+        )
+        results = ai_step.get("results", [])
+    else:
+        # Batching disabled: one predict call per row, ROW_CONCURRENCY at a time
+        semaphore = asyncio.Semaphore(ROW_CONCURRENCY)
 
-    elif workflow == "data_quality":
-        # Workflow: Assess data quality
-        ai_step = call_agent(registry, "ai_model", "data/quality", payload)
-        steps.append(ai_step)
+        async def predict_row(row: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                row_step = await call_agent(registry, step.agent, "predict", {
+                    "wallet_address": row.get("wallet_address") or row.get("address"),
+                    "features": row,
+                    "include_explanation": False,
+                    "include_shap": False,
+                }, timeout=timeout)
+            return row_step.get("response") or {"error": row_step.get("error")}
 
-        return {
-            "workflow": workflow,
-            "quality_assessment": ai_step.get("response"),
-            "status": ai_step.get("status"),
-            "correlation_id": body.get("correlation_id"),
+        results = list(await asyncio.gather(*(predict_row(row) for row in rows)))
+        ai_step = {
+            "agent": step.agent,
+            "capability": "predict",
+            "status": "success" if all("error" not in r for r in results) else "error",
+            "results": results,
         }
 
-    else:
-        logger.warning(f"Unknown workflow: {workflow}")
-        raise HTTPException(status_code=400, detail=f"Unknown workflow: {workflow}. Supported: settle, ai_predict, ai_train, ai_train_run, ai_config, data_quality")
\ No newline at end of file
+    ai_step["count"] = len(results)
+    ai_step["errors"] = sum(1 for r in results if "error" in r)
+    return ai_step
+
+
+# Referenced by `executor:` in config.yaml workflow steps (default "call")
+STEP_EXECUTORS: Dict[str, StepExecutor] = {
+    "call": _call_step,
+    "cached_call": _cached_call_step,
+    "predict_batch": _predict_batch_step,
+}
+
+
+def build_workflow_engine(workflows: Dict[str, Any]) -> WorkflowEngine:
+    """
+    Compile the config.yaml `workflows:` section (raises WorkflowConfigError if invalid).
+    """
+    return WorkflowEngine(workflows, STEP_EXECUTORS)
+
+
+async def route_request(registry: AgentRegistry, body: Dict[str, Any], engine: WorkflowEngine) -> Dict[str, Any]:
+    """
+    Orchestrator routing logic: runs the workflow named in body["workflow"] as compiled
+    from config.yaml (payment settlement, AI training, predictions, ...).
+    """
+    return await engine.run(registry, body)
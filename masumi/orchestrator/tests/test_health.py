@@ -0,0 +1,80 @@
+from masumi.orchestrator.health import CLOSED, HALF_OPEN, OPEN, AgentHealth, CircuitBreaker, HealthCheckParams
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def params(**overrides):
+    return HealthCheckParams(**{"window_size": 10, "min_calls": 4, "error_rate_threshold": 0.5,
+                                "open_seconds": 30.0, "probe_failures_to_open": 2, **overrides})
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(params(), clock=clock)
+    for _ in range(4):
+        breaker.record(False)
+    return breaker
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = CircuitBreaker(params(), clock=FakeClock())
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == CLOSED  # below min_calls
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_open_half_open_closed():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+
+    clock.now = 29
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one trial call at a time
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.error_rate == 0.0
+
+
+def test_failed_trial_reopens():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    clock.now = 30
+    assert breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.opened_at == 30
+
+
+def test_consecutive_failed_probes_trip_the_breaker():
+    health = AgentHealth(params())
+    health.record_probe({"ok": False, "latency_ms": 1.0})
+    assert health.breaker.state == CLOSED
+    health.record_probe({"ok": False, "latency_ms": 1.0})
+    assert health.breaker.state == OPEN
+    assert not health.healthy
+
+
+def test_successful_probe_does_not_close_an_open_breaker():
+    health = AgentHealth(params())
+    for _ in range(4):
+        health.record(False)
+    assert health.breaker.state == OPEN
+
+    health.record_probe({"ok": True, "latency_ms": 1.0})
+
+    assert health.breaker.state == OPEN
+    assert health.last_probe["ok"] is True
+    assert health.calls == 4  # probes are not counted as calls
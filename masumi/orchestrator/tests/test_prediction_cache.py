@@ -0,0 +1,126 @@
+import asyncio
+
+from masumi.orchestrator.prediction_cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_agent(delay=0.0, result=None):
+    """Fake agent call: counts invocations and returns result after delay seconds."""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return dict(result or {"status": "success", "risk": 0.1})
+
+    return compute, calls
+
+
+def test_coalesced_callers_share_one_call():
+    cache = PredictionCache()
+    compute, calls = counting_agent(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute({"features": {"a": 1}}, compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(r["risk"] == 0.1 for r in results)
+    assert cache.stats()["coalesced"] == 4
+    assert cache.stats()["inflight"] == 0
+
+
+def test_hit_after_miss_and_ttl_expiry():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_seconds=10, clock=clock)
+    compute, calls = counting_agent()
+    request = {"features": {"a": 1}}
+
+    asyncio.run(cache.get_or_compute(request, compute))
+    hit = asyncio.run(cache.get_or_compute(request, compute))
+    assert hit["cached"] is True
+    assert len(calls) == 1
+
+    clock.now = 11
+    asyncio.run(cache.get_or_compute(request, compute))
+    assert len(calls) == 2
+    assert cache.stats()["expired"] == 1
+
+
+def test_uncacheable_results_are_not_stored():
+    cache = PredictionCache()
+    compute, calls = counting_agent(result={"status": "error"})
+    request = {"features": {"a": 1}}
+
+    for _ in range(2):
+        asyncio.run(cache.get_or_compute(request, compute, cacheable=lambda r: r["status"] == "success"))
+
+    assert len(calls) == 2
+
+
+def test_lru_eviction_and_invalidate():
+    cache = PredictionCache(max_entries=2)
+    compute, calls = counting_agent()
+    for i in range(3):
+        asyncio.run(cache.get_or_compute({"features": {"i": i}}, compute))
+
+    assert cache.stats()["evicted"] == 1
+    assert cache.invalidate(model_version="v2") == 2
+    assert cache.model_version == "v2"
+    assert cache.stats()["size"] == 0
+
+
+def test_cached_call_step_keeps_wallets_apart(monkeypatch):
+    from masumi.orchestrator import router
+    from masumi.orchestrator.workflow_engine import WorkflowStep
+
+    calls = []
+
+    async def fake_call_agent(registry, agent, capability, payload, timeout=None):
+        calls.append(payload["wallet_address"])
+        return {"status": "success", "response": {"status": "success", "data": {"wallet_address": payload["wallet_address"]}}}
+
+    monkeypatch.setattr(router, "call_agent", fake_call_agent)
+    monkeypatch.setattr(router, "prediction_cache", PredictionCache())
+    step = WorkflowStep(agent="ai_model", capability="predict")
+
+    async def scenario():
+        return [
+            await router._cached_call_step(None, step, "predict", {"wallet_address": w, "features": {}}, None)
+            for w in ("addr1", "addr2", "addr1")
+        ]
+
+    first, second, again = asyncio.run(scenario())
+
+    assert calls == ["addr1", "addr2"]
+    assert second["response"]["data"]["wallet_address"] == "addr2"
+    assert again["cached"] is True
+
+
+def test_agent_level_errors_are_not_cached(monkeypatch):
+    from masumi.orchestrator import router
+    from masumi.orchestrator.workflow_engine import WorkflowStep
+
+    calls = []
+
+    async def fake_call_agent(registry, agent, capability, payload, timeout=None):
+        calls.append(1)
+        return {"status": "success", "response": {"status": "error", "error": "Models not loaded"}}
+
+    monkeypatch.setattr(router, "call_agent", fake_call_agent)
+    monkeypatch.setattr(router, "prediction_cache", PredictionCache())
+    step = WorkflowStep(agent="ai_model", capability="predict")
+    payload = {"wallet_address": "addr1", "features": {}}
+
+    for _ in range(2):
+        asyncio.run(router._cached_call_step(None, step, "predict", payload, None))
+
+    assert len(calls) == 2
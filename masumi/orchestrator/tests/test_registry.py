@@ -0,0 +1,61 @@
+from masumi.orchestrator.health import HealthCheckParams
+from masumi.orchestrator.registry import AgentDescriptor, AgentRegistry
+
+
+def make_registry(urls, **health):
+    registry = AgentRegistry(HealthCheckParams(**health))
+    registry.register(AgentDescriptor(
+        name="ai_model",
+        capabilities=["predict"],
+        endpoints=[{"url": url} for url in urls],
+        auth={},
+        version="1.0",
+        enabled=True,
+    ))
+    return registry
+
+
+def test_single_endpoint_becomes_a_replica():
+    registry = AgentRegistry()
+    registry.register(AgentDescriptor(
+        name="compliance", capabilities=["score"], endpoint="http://c:8000", auth={}, version="1.0", enabled=True,
+    ))
+    assert [r.url for r in registry.replicas("compliance")] == ["http://c:8000"]
+
+
+def test_draining_replicas_are_skipped():
+    registry = make_registry(["http://a", "http://b"])
+    registry.set_draining("ai_model", "http://a")
+
+    picked = {registry.acquire("ai_model").url for _ in range(20)}
+
+    assert picked == {"http://b"}
+
+
+def test_all_draining_fails_fast():
+    registry = make_registry(["http://a"])
+    registry.set_draining("ai_model", "http://a")
+
+    assert registry.acquire("ai_model") is None
+    assert not registry.healthy("ai_model")
+
+
+def test_least_outstanding_spreads_calls():
+    registry = make_registry(["http://a", "http://b"])
+
+    first = registry.acquire("ai_model")
+    second = registry.acquire("ai_model")
+
+    assert {first.url, second.url} == {"http://a", "http://b"}
+    first.release(True, 5.0)
+    assert first.outstanding == 0
+    assert first.health.calls == 1
+
+
+def test_open_breaker_replicas_are_skipped():
+    registry = make_registry(["http://a", "http://b"], min_calls=1, open_seconds=60)
+    registry.replica("ai_model", "http://a").health.breaker.trip()
+
+    picked = {registry.acquire("ai_model").url for _ in range(20)}
+
+    assert picked == {"http://b"}
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from masumi.orchestrator.registry import AgentRegistry
+from masumi.orchestrator.workflow_engine import WorkflowConfigError, WorkflowEngine, compile_workflow
+
+
+def sleeping_executor(delays):
+    """Fake executor: sleeps delays[step.key] seconds and records start/end times."""
+    calls = {}
+
+    async def execute(registry, step, capability, payload, timeout):
+        started = time.perf_counter()
+        await asyncio.sleep(delays.get(step.key, 0))
+        calls[step.key] = (started, time.perf_counter())
+        return {"agent": step.agent, "capability": capability, "status": "success", "payload": payload}
+
+    return execute, calls
+
+
+def run(engine, workflow, payload=None):
+    return asyncio.run(engine.run(AgentRegistry(), {"workflow": workflow, "payload": payload or {}}))
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(WorkflowConfigError, match="cycle"):
+        compile_workflow("loop", {"steps": [
+            {"agent": "a", "capability": "x", "id": "a", "depends_on": ["b"]},
+            {"agent": "b", "capability": "x", "id": "b", "depends_on": ["a"]},
+        ]})
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(WorkflowConfigError, match="unknown"):
+        compile_workflow("broken", {"steps": [{"agent": "a", "capability": "x", "depends_on": ["nope"]}]})
+
+
+def test_order_follows_dependencies():
+    spec = compile_workflow("chain", {"steps": [
+        {"agent": "c", "capability": "x", "id": "c", "depends_on": ["b"]},
+        {"agent": "b", "capability": "x", "id": "b", "depends_on": ["a"]},
+        {"agent": "a", "capability": "x", "id": "a"},
+    ]})
+    assert spec.order == ["a", "b", "c"]
+
+
+def test_independent_steps_run_in_parallel():
+    execute, calls = sleeping_executor({"a": 0.2, "b": 0.2, "c": 0.0})
+    engine = WorkflowEngine({"fan": {"steps": [
+        {"agent": "a", "capability": "x", "id": "a"},
+        {"agent": "b", "capability": "x", "id": "b"},
+        {"agent": "c", "capability": "x", "id": "c", "depends_on": ["a", "b"]},
+    ]}}, executors={"call": execute})
+
+    started = time.perf_counter()
+    result = run(engine, "fan")
+    elapsed = time.perf_counter() - started
+
+    assert result["status"] == "success"
+    assert elapsed < 0.35  # a and b overlap instead of taking 0.4s back to back
+    assert calls["c"][0] >= max(calls["a"][1], calls["b"][1])
+
+
+def test_step_timeout_reports_timeout_status():
+    execute, _ = sleeping_executor({"slow": 1.0})
+    engine = WorkflowEngine({"wf": {"steps": [
+        {"agent": "slow", "capability": "x", "id": "slow", "timeout_seconds": 0.05},
+    ]}}, executors={"call": execute})
+
+    result = run(engine, "wf")
+
+    step = result["steps"][0]
+    assert step["status"] == "timeout"
+    assert result["status"] == "error"
+    assert step["latency_ms"] < 500
+
+
+def test_unknown_executor_is_rejected():
+    with pytest.raises(WorkflowConfigError, match="executor"):
+        WorkflowEngine({"wf": {"steps": [{"agent": "a", "capability": "x", "executor": "nope"}]}}, executors={})
+
+
+def test_payload_templates_and_outputs_are_resolved():
+    execute, _ = sleeping_executor({})
+    engine = WorkflowEngine({"wf": {
+        "steps": [{"agent": "a", "capability": "x", "id": "a", "payload": {"wallet": "$payload.wallet", "n": "$payload.n|3"}}],
+        "output": {"sent": "$steps.a.payload"},
+    }}, executors={"call": execute})
+
+    result = run(engine, "wf", {"wallet": "addr1"})
+
+    assert result["sent"] == {"wallet": "addr1", "n": 3}
@@ -0,0 +1,272 @@
+"""
+workflow_engine.py
+Config-driven workflow execution for the orchestrator.
+- The `workflows:` section of config.yaml is compiled once into DAGs: each step is a
+  node, `depends_on` lists its incoming edges (cycles and unknown ids are rejected).
+- Steps run as soon as their dependencies finish, so independent steps run in parallel.
+- `required: conditional` steps run only when policies.apply_policies lists them
+  ("agent:capability") in required_steps for the context built so far.
+- Per-step `timeout_seconds` and the workflow `timeout_seconds` are enforced; every
+  step reports its latency.
+
+Step payloads and workflow outputs are YAML templates: "$payload.key|default",
+"$payload", "$steps.<step id>.<path>" and "$ctx.<key>" are resolved at run time.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+import yaml
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from .policies import apply_policies
+from .registry import AgentRegistry
+
+# -------------------------------
+# Specs
+# -------------------------------
+
+
+class WorkflowStep(BaseModel):
+    agent: str
+    capability: str
+    id: Optional[str] = None  # defaults to "agent:capability"
+    required: Union[bool, str] = True  # true | false | conditional
+    depends_on: List[str] = Field(default_factory=list)
+    payload: Any = "$payload"
+    exports: Dict[str, str] = Field(default_factory=dict)  # ctx key -> path in the step result
+    executor: str = "call"
+    timeout_seconds: Optional[float] = None
+
+    @property
+    def key(self) -> str:
+        return self.id or f"{self.agent}:{self.capability}"
+
+    @property
+    def conditional(self) -> bool:
+        return self.required == "conditional"
+
+
+class WorkflowSpec(BaseModel):
+    name: str
+    description: str = ""
+    steps: List[WorkflowStep]
+    timeout_seconds: Optional[float] = None
+    output: Dict[str, Any] = Field(default_factory=dict)
+    decision: bool = False  # add a final_decision block (settle-style workflows)
+    # Filled in by compile_workflow: step ids in a valid execution order
+    order: List[str] = Field(default_factory=list)
+
+
+class WorkflowConfigError(ValueError):
+    """Raised when the workflows section of config.yaml does not describe a valid DAG."""
+
+
+def compile_workflow(name: str, cfg: Dict[str, Any]) -> WorkflowSpec:
+    spec = WorkflowSpec(name=name, **cfg)
+    steps = {}
+    for step in spec.steps:
+        if step.key in steps:
+            raise WorkflowConfigError(f"Workflow '{name}': duplicate step id '{step.key}'")
+        steps[step.key] = step
+    for step in spec.steps:
+        unknown = [d for d in step.depends_on if d not in steps]
+        if unknown:
+            raise WorkflowConfigError(f"Workflow '{name}': step '{step.key}' depends on unknown {unknown}")
+
+    # Kahn's algorithm, keeping config order among ready steps
+    remaining = {key: set(step.depends_on) for key, step in steps.items()}
+    order: List[str] = []
+    while remaining:
+        ready = [key for key, deps in remaining.items() if not deps]
+        if not ready:
+            raise WorkflowConfigError(f"Workflow '{name}': dependency cycle among {sorted(remaining)}")
+        for key in ready:
+            order.append(key)
+            del remaining[key]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    spec.order = order
+    return spec
+
+
+def compile_workflows(workflows: Dict[str, Any]) -> Dict[str, WorkflowSpec]:
+    return {name: compile_workflow(name, cfg or {}) for name, cfg in (workflows or {}).items()}
+
+
+# -------------------------------
+# Templates
+# -------------------------------
+
+_MISSING = object()
+
+
+def _lookup(value: Any, path: List[str]) -> Any:
+    for part in path:
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def resolve(template: Any, scope: Dict[str, Any]) -> Any:
+    """
+    Substitute "$root.path|default" strings in a (nested) template. scope maps the
+    roots (payload, steps, ctx) to their values; a missing path yields the default
+    (parsed as YAML) or None.
+    """
+    if isinstance(template, dict):
+        return {k: resolve(v, scope) for k, v in template.items()}
+    if isinstance(template, list):
+        return [resolve(v, scope) for v in template]
+    if not isinstance(template, str) or not template.startswith("$"):
+        return template
+    ref, _, default = template[1:].partition("|")
+    # Step ids contain ':' and '/' but never '.'
+    root, *path = ref.split(".")
+    value = _lookup(scope.get(root, {}), path) if root in scope else _MISSING
+    if value is _MISSING or value is None:
+        return yaml.safe_load(default) if default else None
+    return value
+
+
+# -------------------------------
+# Execution
+# -------------------------------
+
+# (registry, step, capability, resolved payload, timeout) -> step result with at least "status"
+StepExecutor = Callable[[AgentRegistry, WorkflowStep, str, Any, Optional[float]], Awaitable[Dict[str, Any]]]
+
+
+class WorkflowEngine:
+    """
+    Runs compiled workflows:
+
+        engine = WorkflowEngine(config["workflows"], executors={"call": ...})
+        result = await engine.run(registry, {"workflow": "settle", "payload": {...}})
+    """
+
+    def __init__(self, workflows: Dict[str, Any], executors: Dict[str, StepExecutor]):
+        self.workflows = compile_workflows(workflows)
+        self.executors = executors
+        for spec in self.workflows.values():
+            for step in spec.steps:
+                if step.executor not in executors:
+                    raise WorkflowConfigError(
+                        f"Workflow '{spec.name}': step '{step.key}' uses unknown executor '{step.executor}'"
+                    )
+
+    def names(self) -> List[str]:
+        return list(self.workflows)
+
+    async def run(self, registry: AgentRegistry, body: Dict[str, Any]) -> Dict[str, Any]:
+        name = body.get("workflow")
+        spec = self.workflows.get(name)
+        if spec is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown workflow: {name}. Supported: {', '.join(self.workflows)}",
+            )
+        try:
+            return await asyncio.wait_for(self._run(registry, spec, body), spec.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504, detail=f"Workflow '{name}' timed out after {spec.timeout_seconds}s"
+            )
+
+    async def _run(self, registry: AgentRegistry, spec: WorkflowSpec, body: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        deadline = start + spec.timeout_seconds if spec.timeout_seconds else None
+        payload = body.get("payload", {}) or {}
+        ctx: Dict[str, Any] = {
+            "workflow": spec.name,
+            "subject_id": body.get("subject_id"),
+            "actor_roles": body.get("actor_roles", []),
+        }
+        results: Dict[str, Dict[str, Any]] = {}
+        scope = {"payload": payload, "steps": results, "ctx": ctx}
+        steps = {step.key: step for step in spec.steps}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: WorkflowStep) -> None:
+            if step.depends_on:
+                await asyncio.gather(*(tasks[d] for d in step.depends_on))
+            if step.conditional:
+                required = apply_policies(ctx).get("required_steps", [])
+                if step.key not in required and f"{step.agent}:{step.capability}" not in required:
+                    results[step.key] = {"id": step.key, "status": "skipped"}
+                    return
+            results[step.key] = await self._execute(registry, spec, step, scope, deadline)
+            for key, path in step.exports.items():
+                value = _lookup(results[step.key], path.split("."))
+                if value is not _MISSING:
+                    ctx[key] = value
+
+        # Tasks are created in topological order so every dependency already has one
+        try:
+            for key in spec.order:
+                tasks[key] = asyncio.ensure_future(run_step(steps[key]))
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        executed = [results[s.key] for s in spec.steps if results[s.key]["status"] != "skipped"]
+        failed_required = [
+            s.key for s in spec.steps
+            if s.required is True and results[s.key]["status"] not in ("success", "skipped")
+        ]
+        out: Dict[str, Any] = {
+            "workflow": spec.name,
+            "status": "error" if failed_required else "success",
+            "steps": executed,
+            "skipped_steps": [s.key for s in spec.steps if results[s.key]["status"] == "skipped"],
+            "step_latency_ms": {r["id"]: r["latency_ms"] for r in executed},
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            "correlation_id": body.get("correlation_id"),
+        }
+        out.update(resolve(spec.output, scope))
+        if spec.decision:
+            out["final_decision"] = {
+                "approved": all(r.get("status") == "success" for r in executed),
+                "workflow": spec.name,
+                "subject_id": ctx["subject_id"],
+                "actor_roles": ctx["actor_roles"],
+                "risk_score": ctx.get("risk_score"),
+                "steps_completed": sum(1 for r in executed if r.get("status") == "success"),
+            }
+        return out
+
+    async def _execute(
+        self,
+        registry: AgentRegistry,
+        spec: WorkflowSpec,
+        step: WorkflowStep,
+        scope: Dict[str, Any],
+        deadline: Optional[float],
+    ) -> Dict[str, Any]:
+        timeouts = [t for t in (step.timeout_seconds, deadline and deadline - time.perf_counter()) if t]
+        timeout = max(min(timeouts), 0.0) if timeouts else None
+        started = time.perf_counter()
+        try:
+            capability = step.capability.format(**scope["payload"])
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"{e.args[0]} required for {spec.name}")
+        try:
+            result = await asyncio.wait_for(
+                self.executors[step.executor](registry, step, capability, resolve(step.payload, scope), timeout),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            result = {
+                "agent": step.agent,
+                "capability": capability,
+                "status": "timeout",
+                "error": f"Step exceeded {timeout:.3f}s",
+            }
+        result["id"] = step.key
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
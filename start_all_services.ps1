@@ -60,6 +60,16 @@ Start-Service -Name "Orchestrator" `
     -Command "python -m uvicorn masumi.orchestrator.app:app --reload --port 8080" `
     -Port 8080
 
+# 1b. Start Feature Service (warm Python worker used by the backend)
+Write-Host ""
+Write-Host "=" * 60
+Write-Host "1️⃣b Starting Feature Service (FastAPI)" -ForegroundColor Yellow
+Write-Host "=" * 60
+Start-Service -Name "Feature Service" `
+    -WorkingDirectory $workspace `
+    -Command "python -m uvicorn agents.ai_model.src.feature_service:app --port 8090" `
+    -Port 8090
+
 # 2. Start Backend
 Write-Host ""
 Write-Host "=" * 60
@@ -89,6 +99,7 @@ Write-Host "📡 Service URLs:" -ForegroundColor Cyan
 Write-Host "  Frontend:   http://localhost:5173" -ForegroundColor White
 Write-Host "  Backend:    http://localhost:5000/health" -ForegroundColor White
 Write-Host "  Orchestrator: http://localhost:8080/masumi/health" -ForegroundColor White
+Write-Host "  Features:   http://localhost:8090/health" -ForegroundColor White
 Write-Host ""
 Write-Host "🧪 Quick Tests:" -ForegroundColor Cyan
 Write-Host '  powershell -Command "Invoke-WebRequest -UseBasicParsing http://localhost:5000/health"' -ForegroundColor White